@@ -0,0 +1,52 @@
+"""add ingestion_jobs and knowledge_docs.ingestion_job_id
+
+Revision ID: 0c7e2a9d4b61
+Revises: f6d4a9b05c34
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0c7e2a9d4b61'
+down_revision = 'f6d4a9b05c34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ingestion_jobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('tenant_id', sa.UUID(), nullable=False),
+        sa.Column('department_id', sa.UUID(), nullable=False),
+        sa.Column('created_by', sa.UUID(), nullable=True),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('source_name', sa.String(length=500), nullable=True),
+        sa.Column('total_docs', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('skipped', postgresql.JSONB(), server_default=sa.text("'[]'::jsonb"), nullable=False),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_ingestion_jobs_tenant_id'), 'ingestion_jobs', ['tenant_id'], unique=False)
+    op.create_index(op.f('ix_ingestion_jobs_department_id'), 'ingestion_jobs', ['department_id'], unique=False)
+
+    op.add_column('knowledge_docs', sa.Column('ingestion_job_id', sa.UUID(), nullable=True))
+    op.create_foreign_key(
+        'fk_knowledge_docs_ingestion_job_id', 'knowledge_docs', 'ingestion_jobs',
+        ['ingestion_job_id'], ['id'], ondelete='SET NULL',
+    )
+    op.create_index(op.f('ix_knowledge_docs_ingestion_job_id'), 'knowledge_docs', ['ingestion_job_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_knowledge_docs_ingestion_job_id'), table_name='knowledge_docs')
+    op.drop_constraint('fk_knowledge_docs_ingestion_job_id', 'knowledge_docs', type_='foreignkey')
+    op.drop_column('knowledge_docs', 'ingestion_job_id')
+    op.drop_index(op.f('ix_ingestion_jobs_department_id'), table_name='ingestion_jobs')
+    op.drop_index(op.f('ix_ingestion_jobs_tenant_id'), table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
@@ -0,0 +1,49 @@
+"""add reindex_jobs
+
+Revision ID: 7d3f1b8e2a40
+Revises: 0c7e2a9d4b61
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '7d3f1b8e2a40'
+down_revision = '0c7e2a9d4b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('reindex_jobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_by', sa.UUID(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('embedding_model', sa.String(length=255), nullable=False),
+        sa.Column('vector_size', sa.Integer(), nullable=True),
+        sa.Column('source_collection', sa.String(length=255), nullable=True),
+        sa.Column('target_collection', sa.String(length=255), nullable=False),
+        sa.Column('total_chunks', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('processed_chunks', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('cursor', sa.String(length=64), nullable=True),
+        sa.Column('chunks_per_second', sa.Float(), nullable=False, server_default=sa.text('0')),
+        sa.Column('snapshot_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('swapped_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('finished_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_reindex_jobs_status'), 'reindex_jobs', ['status'], unique=False)
+    # Catch-up passes select the documents changed since a watermark.
+    op.create_index(op.f('ix_knowledge_docs_updated_at'), 'knowledge_docs', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_knowledge_docs_updated_at'), table_name='knowledge_docs')
+    op.drop_index(op.f('ix_reindex_jobs_status'), table_name='reindex_jobs')
+    op.drop_table('reindex_jobs')
@@ -0,0 +1,25 @@
+"""add rolling summary to conversations
+
+Revision ID: a8f2c6d41e97
+Revises: 7d3f1b8e2a40
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a8f2c6d41e97'
+down_revision = '7d3f1b8e2a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_through_id', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'summary_through_id')
+    op.drop_column('conversations', 'summary')
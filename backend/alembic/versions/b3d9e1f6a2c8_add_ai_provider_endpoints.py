@@ -0,0 +1,24 @@
+"""add endpoints to ai_providers
+
+Revision ID: b3d9e1f6a2c8
+Revises: a8f2c6d41e97
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'b3d9e1f6a2c8'
+down_revision = 'a8f2c6d41e97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_providers', sa.Column('endpoints', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('ai_providers', 'endpoints')
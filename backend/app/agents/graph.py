@@ -1,12 +1,21 @@
 import time
 import asyncio
+import functools
+import inspect
 import logging
-from typing import TypedDict
+import threading
+from collections.abc import Awaitable
+from typing import Any, TypedDict
 from uuid import UUID
 
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 
 from app.core.config import settings
+from app.core.exceptions import LLMOverloadedError
+from app.services.llm.prompt_templates import build_rag_prompt
+from app.services.llm.registry import get_llm
+from app.services.llm.scheduler import llm_slot
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +35,14 @@ class QueryState(TypedDict):
     provider_type: str | None  # "ollama" or "openai_compatible"
     provider_base_url: str | None
     provider_api_key: str | None
+    provider_endpoints: list[str]  # further Ollama hosts, load-balanced with provider_base_url
+    plan_tier: str  # the tenant's, for fair LLM scheduling
+    # Conversation memory (see conversation_memory.load_memory)
+    history: list[dict]
+    history_summary: str
+    # Time budget: epoch seconds the answer is due by (None: unbounded), and what was cut to meet it
+    deadline: float | None
+    degradations: list[str]
     # Vision
     image_description: str | None
     # RAG results
@@ -47,12 +64,109 @@ class QueryState(TypedDict):
     error: str | None
 
 
-def receive_query(state: QueryState) -> dict:
+class QueryDeps:
+    """Long-lived clients shared by every run of the query graph.
+
+    Nodes receive it through ``config["configurable"]["deps"]`` instead of
+    building their own retriever and LLM client per query. LLM clients come
+    from the process-wide registry (``get_llm``) unless one is passed in.
+    """
+
+    def __init__(self, retriever: Any = None, ollama: Any = None, vision: Any = None) -> None:
+        self._retriever = retriever
+        self._retriever_lock = threading.Lock()
+        self._ollama = ollama
+        self._vision = vision
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def ollama(self):
+        """The default Ollama server's client: the one passed in, else the registry's."""
+        return self._ollama if self._ollama is not None else get_llm()
+
+    @property
+    def retriever(self):
+        # Built on first use (it talks to Qdrant), from a worker thread.
+        with self._retriever_lock:
+            if self._retriever is None:
+                from app.services.rag.retriever import RAGRetriever
+                self._retriever = RAGRetriever()
+            return self._retriever
+
+    @property
+    def vision(self):
+        if self._vision is None:
+            from ml.vision.image_processor import ImageProcessor
+            self._vision = ImageProcessor()
+        return self._vision
+
+    async def aclose(self) -> None:
+        # Registry clients are closed with the registry (close_llm_clients).
+        if self._ollama is not None:
+            await self._ollama.close()
+
+
+_deps: QueryDeps | None = None
+
+
+def get_query_deps() -> QueryDeps:
+    """Return the process-wide dependencies for the running event loop."""
+    global _deps
+    loop = asyncio.get_running_loop()
+    if _deps is None or _deps.loop is not loop:
+        _deps = QueryDeps()
+        _deps.loop = loop
+    return _deps
+
+
+async def close_query_deps() -> None:
+    global _deps
+    if _deps is not None:
+        await _deps.aclose()
+        _deps = None
+
+
+def _deps_from(config: RunnableConfig | None) -> QueryDeps:
+    deps = (config or {}).get("configurable", {}).get("deps")
+    return deps if deps is not None else get_query_deps()
+
+
+async def _emit(config: RunnableConfig | None, event: str, data: dict) -> None:
+    """Forward a progress event to the caller's ``configurable["emit"]`` sink, if any (SSE mode)."""
+    emit = (config or {}).get("configurable", {}).get("emit")
+    if emit is not None:
+        await emit(event, data)
+
+
+def _remaining(state: QueryState) -> float | None:
+    """Seconds left before the request's deadline, or None when it has none."""
+    deadline = state.get("deadline")
+    return None if deadline is None else deadline - time.time()
+
+
+def _context_tokens(state: QueryState) -> int:
+    remaining = _remaining(state)
+    if remaining is not None and remaining < settings.QUERY_DEADLINE_FULL_ANSWER_SECONDS:
+        return settings.QUERY_DEADLINE_REDUCED_CONTEXT_TOKENS
+    return 2000
+
+
+async def _before(seconds: float | None, work: Awaitable[dict], on_timeout: dict) -> dict:
+    """*work*'s result, or *on_timeout* if it takes longer than *seconds*."""
+    if seconds is None:
+        return await work
+    try:
+        return await asyncio.wait_for(work, max(seconds, 0.0))
+    except asyncio.TimeoutError:
+        return on_timeout
+
+
+async def receive_query(state: QueryState) -> dict:
     """Parse and validate the incoming query."""
     return {"error": None, "image_description": None, "approval_id": None}
 
 
-def route_department(state: QueryState) -> dict:
+async def route_department(state: QueryState) -> dict:
     """Load department configuration."""
     config = state.get("department_config", {})
     return {
@@ -65,48 +179,37 @@ def route_department(state: QueryState) -> dict:
     }
 
 
-def process_vision(state: QueryState) -> dict:
+async def process_vision(state: QueryState, config: RunnableConfig | None = None) -> dict:
     """Process image through vision pipeline if image is attached."""
     image_path = state.get("image_path")
     if not image_path:
         return {"image_description": None}
 
     try:
-        from ml.vision.image_processor import ImageProcessor
-        processor = ImageProcessor()
-
-        loop = asyncio.new_event_loop()
-        try:
-            description = loop.run_until_complete(
-                processor.analyze_screenshot(image_path, state["query"])
-            )
-        finally:
-            loop.close()
-
+        processor = _deps_from(config).vision
+        description = await processor.analyze_screenshot(image_path, state["query"])
         return {"image_description": description}
     except Exception as e:
         logger.warning(f"Vision processing failed: {e}")
         return {"image_description": f"[Image attached but could not be processed: {e}]"}
 
 
-def rag_search(state: QueryState) -> dict:
-    """Execute RAG retrieval (synchronous wrapper)."""
-    from app.services.rag.retriever import RAGRetriever
+def _retrieve(state: QueryState, deps: QueryDeps) -> tuple[list[dict], str]:
+    """Blocking part of RAG search: query embedding (CPU) and the Qdrant round trip."""
+    retriever = deps.retriever
+    results = retriever.retrieve(
+        query=state["query"],
+        tenant_id=state["tenant_id"],
+        department_id=state["department_id"],
+        top_k=5,
+    )
+    return results, retriever.build_context(results, max_tokens=_context_tokens(state))
 
-    try:
-        retriever = RAGRetriever()
-        results = retriever.retrieve(
-            query=state["query"],
-            tenant_id=state["tenant_id"],
-            department_id=state["department_id"],
-            top_k=5,
-        )
-        context = retriever.build_context(results, max_tokens=2000)
 
-        # Append vision description to context if available
-        image_desc = state.get("image_description")
-        if image_desc:
-            context += f"\n\n[Image Analysis]\n{image_desc}"
+async def rag_search(state: QueryState, config: RunnableConfig | None = None) -> dict:
+    """Execute RAG retrieval in a worker thread so the event loop keeps serving other queries."""
+    try:
+        results, context = await asyncio.to_thread(_retrieve, state, _deps_from(config))
 
         sources = [
             {
@@ -119,48 +222,151 @@ def rag_search(state: QueryState) -> dict:
         ]
         has_verified = any(r.get("source_type") == "verified_answer" for r in results)
         logger.info(f"RAG search returned {len(results)} results (verified={has_verified}) for query: {state['query'][:50]}")
+        await _emit(config, "sources", {"sources": sources})
         return {"rag_results": results, "context": context, "sources": sources, "has_verified_answers": has_verified}
     except Exception as e:
         logger.error(f"RAG search failed: {e}", exc_info=True)
         return {"rag_results": [], "context": "", "sources": [], "has_verified_answers": False, "error": str(e)}
 
 
-def _create_llm_client(state: QueryState):
-    """Create the appropriate LLM client based on provider config in state."""
-    provider_type = state.get("provider_type")
-
-    if provider_type == "openai_compatible":
-        from app.services.llm.openai_client import OpenAICompatibleClient
-        return OpenAICompatibleClient(
-            base_url=state.get("provider_base_url", ""),
-            api_key=state.get("provider_api_key"),
+async def gather_context(state: QueryState, config: RunnableConfig) -> dict:
+    """Run vision analysis and RAG retrieval concurrently, then merge them into the context.
+
+    Retrieval only needs the query text, so a screenshot query waits for the
+    slower of the two instead of their sum. Sources are streamed as soon as
+    retrieval finishes, while the vision model may still be running.
+
+    Under a deadline both must finish QUERY_DEADLINE_ANSWER_RESERVE_SECONDS
+    before it, leaving time to generate; whatever is late is dropped. Vision
+    is skipped outright, and the context shortened, when little time is left.
+    """
+    remaining = _remaining(state)
+    degradations = list(state.get("degradations") or [])
+    budget = None if remaining is None else remaining - settings.QUERY_DEADLINE_ANSWER_RESERVE_SECONDS
+
+    vision_state = state
+    if state.get("image_path") and remaining is not None and remaining < settings.QUERY_DEADLINE_VISION_MIN_SECONDS:
+        vision_state = {**state, "image_path": None}
+        degradations.append("skipped_vision")
+    if _context_tokens(state) < 2000:
+        degradations.append("reduced_context")
+
+    timed_out = {"timed_out": True}
+    vision, rag = await asyncio.gather(
+        _before(budget, process_vision(vision_state, config), timed_out),
+        _before(budget, rag_search(state, config), timed_out),
+    )
+    if vision is timed_out:
+        vision = {"image_description": None}
+        degradations.append("vision_timeout")
+    if rag is timed_out:
+        # The worker thread finishes on its own; its results are not waited for.
+        rag = {"rag_results": [], "context": "", "sources": [], "has_verified_answers": False}
+        degradations.append("retrieval_timeout")
+
+    image_desc = vision.get("image_description")
+    if image_desc:
+        rag["context"] += f"\n\n[Image Analysis]\n{image_desc}"
+    return {**vision, **rag, "degradations": degradations}
+
+
+def _llm_client(state: QueryState, deps: QueryDeps):
+    """The shared, pooled LLM client for the provider in state."""
+    if state.get("provider_base_url"):
+        return get_llm(
+            state.get("provider_type"),
+            state.get("provider_base_url"),
+            state.get("provider_api_key"),
+            state.get("provider_endpoints"),
         )
+    return deps.ollama
+
+
+def sources_only(state: QueryState, degradations: list[str]) -> dict:
+    """Stand-in answer when there is no time left to generate one."""
+    lines = [f"- {s.get('title', 'Unknown')}" for s in state.get("sources", [])]
+    answer = "There was not enough time to generate an answer."
+    if lines:
+        answer += " These knowledge base articles look relevant:\n" + "\n".join(lines)
+    return {
+        "answer": answer,
+        "model_used": state.get("model_name", settings.OLLAMA_MODEL),
+        "degradations": [*degradations, "sources_only"],
+    }
 
-    from app.services.llm.ollama_client import OllamaClient
-    return OllamaClient()
 
+async def generate_answer(state: QueryState, config: RunnableConfig) -> dict:
+    """Call LLM with RAG context to generate answer.
 
-def generate_answer(state: QueryState) -> dict:
-    """Call LLM with RAG context to generate answer."""
-    from app.services.llm.prompt_templates import build_rag_prompt
+    Under a deadline the answer is shortened when time is short, and only
+    the retrieved sources are returned when it runs out.
+    """
+    remaining = _remaining(state)
+    degradations = list(state.get("degradations") or [])
+    if remaining is not None and remaining < settings.QUERY_DEADLINE_MIN_ANSWER_SECONDS:
+        return sources_only(state, degradations)
+    max_tokens = 2048
+    if remaining is not None and remaining < settings.QUERY_DEADLINE_FULL_ANSWER_SECONDS:
+        max_tokens = settings.QUERY_DEADLINE_REDUCED_MAX_TOKENS
+        degradations.append("reduced_max_tokens")
 
     messages = build_rag_prompt(
         query=state["query"],
         context=state.get("context", ""),
         system_prompt=state.get("system_prompt", "You are a helpful AI assistant."),
         has_verified_answers=state.get("has_verified_answers", False),
+        history=state.get("history"),
+        history_summary=state.get("history_summary", ""),
     )
 
     model = state.get("model_name", settings.OLLAMA_MODEL)
-    client = _create_llm_client(state)
+    client = _llm_client(state, _deps_from(config))
 
     start = time.perf_counter()
+    answer = ""
+    usage = None
+
+    configurable = (config or {}).get("configurable", {})
+    slot = llm_slot(
+        state.get("provider_type"),
+        state.get("provider_base_url"),
+        model,
+        state.get("tenant_id"),
+        state.get("plan_tier"),
+        lane=configurable.get("lane", "interactive"),
+        endpoints=state.get("provider_endpoints"),
+    )
+
+    async def complete() -> None:
+        nonlocal answer, usage
+        # Queueing for a slot counts against the deadline too.
+        async with slot:
+            if configurable.get("emit") is not None:
+                stream = await client.chat(messages, model=model, stream=True, max_tokens=max_tokens)
+                try:
+                    async for token in stream:
+                        answer += token
+                        await _emit(config, "token", {"content": token})
+                finally:
+                    # Aborts the upstream generation when the deadline cuts it short.
+                    await stream.aclose()
+                usage = getattr(stream, "usage", None)
+            else:
+                answer = await client.chat(messages, model=model, max_tokens=max_tokens)
+
     try:
-        loop = asyncio.new_event_loop()
-        try:
-            answer = loop.run_until_complete(client.chat(messages, model=model))
-        finally:
-            loop.close()
+        await asyncio.wait_for(complete(), _remaining(state))
+    except LLMOverloadedError as e:
+        logger.warning(f"LLM generation not admitted (model={model}): {e.message}")
+        return {
+            **sources_only(state, [*degradations, "llm_overloaded"]),
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        }
+    except asyncio.TimeoutError:
+        logger.warning(f"LLM generation hit the request deadline (model={model})")
+        if not answer:
+            return {**sources_only(state, degradations), "latency_ms": (time.perf_counter() - start) * 1000}
+        degradations.append("truncated_answer")
     except Exception as e:
         logger.error(f"LLM generation failed (model={model}): {e}", exc_info=True)
         return {
@@ -172,19 +378,23 @@ def generate_answer(state: QueryState) -> dict:
         }
 
     latency_ms = (time.perf_counter() - start) * 1000
-    tokens_input = sum(len(m.get("content", "").split()) for m in messages)
-    tokens_output = len(answer.split())
+    if usage is not None:
+        tokens_input, tokens_output = usage.prompt_tokens, usage.completion_tokens
+    else:
+        tokens_input = int(sum(len(m.get("content", "").split()) for m in messages) * 1.3)
+        tokens_output = int(len(answer.split()) * 1.3)
 
     return {
         "answer": answer,
         "model_used": model,
-        "tokens_input": int(tokens_input * 1.3),
-        "tokens_output": int(tokens_output * 1.3),
+        "tokens_input": tokens_input,
+        "tokens_output": tokens_output,
         "latency_ms": latency_ms,
+        "degradations": degradations,
     }
 
 
-def confidence_check(state: QueryState) -> dict:
+async def confidence_check(state: QueryState) -> dict:
     """Evaluate answer confidence and determine if approval is needed."""
     threshold = state.get("confidence_threshold", 0.85)
 
@@ -217,7 +427,7 @@ def confidence_check(state: QueryState) -> dict:
     }
 
 
-def escalate_to_human(state: QueryState) -> dict:
+async def escalate_to_human(state: QueryState) -> dict:
     """Create an approval ticket when confidence is below threshold."""
     # The actual approval creation is handled by query_service when it detects needs_approval
     logger.info(
@@ -227,60 +437,99 @@ def escalate_to_human(state: QueryState) -> dict:
     return {"needs_approval": True}
 
 
-def return_answer(state: QueryState) -> dict:
+async def return_answer(state: QueryState) -> dict:
     """Format and return the final response."""
     return state
 
 
 # --- Edge conditions ---
 
-def should_process_vision(state: QueryState) -> str:
-    if state.get("image_path"):
-        return "has_image"
-    return "text_only"
-
-
 def should_approve(state: QueryState) -> str:
     if state.get("needs_approval", False):
         return "needs_approval"
     return "auto_approved"
 
 
-def create_query_graph() -> StateGraph:
-    """Create and return the compiled query processing graph."""
-    workflow = StateGraph(QueryState)
-
-    # Add nodes
-    workflow.add_node("receive_query", receive_query)
-    workflow.add_node("route_department", route_department)
-    workflow.add_node("process_vision", process_vision)
-    workflow.add_node("rag_search", rag_search)
-    workflow.add_node("generate_answer", generate_answer)
-    workflow.add_node("confidence_check", confidence_check)
-    workflow.add_node("escalate_to_human", escalate_to_human)
-    workflow.add_node("return_answer", return_answer)
-
-    # Add edges
-    workflow.set_entry_point("receive_query")
-    workflow.add_edge("receive_query", "route_department")
-
-    # Conditional: vision or skip
-    workflow.add_conditional_edges(
-        "route_department",
-        should_process_vision,
-        {"has_image": "process_vision", "text_only": "rag_search"},
-    )
-    workflow.add_edge("process_vision", "rag_search")
-    workflow.add_edge("rag_search", "generate_answer")
-    workflow.add_edge("generate_answer", "confidence_check")
-
+# --- Graph ---
+
+_ENTRY = "receive_query"
+
+_NODES = {
+    "receive_query": receive_query,
+    "route_department": route_department,
+    # Vision (when an image is attached) and retrieval run side by side in one node.
+    "gather_context": gather_context,
+    "generate_answer": generate_answer,
+    "confidence_check": confidence_check,
+    "escalate_to_human": escalate_to_human,
+    "return_answer": return_answer,
+}
+
+# Node -> next node, or (condition, {condition result: next node}). The one
+# routing table for both the compiled graph and ``run_query_pipeline``.
+_EDGES = {
+    "receive_query": "route_department",
+    "route_department": "gather_context",
+    "gather_context": "generate_answer",
+    "generate_answer": "confidence_check",
     # Conditional: approval or direct return
-    workflow.add_conditional_edges(
-        "confidence_check",
+    "confidence_check": (
         should_approve,
         {"needs_approval": "escalate_to_human", "auto_approved": "return_answer"},
-    )
-    workflow.add_edge("escalate_to_human", "return_answer")
-    workflow.add_edge("return_answer", END)
+    ),
+    "escalate_to_human": "return_answer",
+    "return_answer": END,
+}
+
+# Nodes that take the run's config (deps, lane, emit) as well as the state.
+_TAKES_CONFIG = {name for name, fn in _NODES.items() if "config" in inspect.signature(fn).parameters}
 
+
+def create_query_graph() -> StateGraph:
+    """Create and return the compiled query processing graph.
+
+    All nodes are coroutines: run the graph with ``ainvoke``. Blocking work
+    (embedding, the Qdrant client) is pushed to worker threads inside the
+    nodes, so a slow LLM answer never holds up the event loop. Callers should
+    use the shared instance from ``get_query_graph``.
+    """
+    workflow = StateGraph(QueryState)
+    for name, node in _NODES.items():
+        workflow.add_node(name, node)
+    workflow.set_entry_point(_ENTRY)
+    for name, edge in _EDGES.items():
+        if isinstance(edge, tuple):
+            workflow.add_conditional_edges(name, *edge)
+        else:
+            workflow.add_edge(name, edge)
     return workflow.compile()
+
+
+@functools.cache
+def get_query_graph():
+    """The compiled query graph, built once per process.
+
+    Compiled graphs hold no per-request state, so one instance serves
+    concurrent runs; pass shared clients as
+    ``config={"configurable": {"deps": QueryDeps(...)}}`` (defaults to
+    ``get_query_deps()``).
+    """
+    return create_query_graph()
+
+
+async def run_query_pipeline(state: QueryState, config: RunnableConfig | None = None) -> dict:
+    """Walk the graph's nodes and routing (``_EDGES``) without the LangGraph runtime.
+
+    For bulk runs (``POST /query/batch``): the runtime's per-run bookkeeping
+    (langchain_core serializes every node for its callbacks) costs more CPU
+    than the nodes themselves.
+    """
+    state = dict(state)
+    name = _ENTRY
+    while name != END:
+        node = _NODES[name]
+        update = await (node(state, config) if name in _TAKES_CONFIG else node(state))
+        state.update(update or {})
+        edge = _EDGES[name]
+        name = edge[1][edge[0](state)] if isinstance(edge, tuple) else edge
+    return state
@@ -3,6 +3,9 @@
 import logging
 from typing import Optional
 
+from app.services.llm.registry import get_llm
+from app.services.llm.scheduler import llm_slot
+
 logger = logging.getLogger(__name__)
 
 
@@ -11,9 +14,7 @@ class AnalyzerAgent:
 
     async def analyze(self, query: str, context: str, error_logs: str | None = None) -> str:
         """Perform deep analysis on complex issues."""
-        from app.services.llm.ollama_client import OllamaClient
-
-        client = OllamaClient()
+        client = get_llm()
         system_prompt = """You are an expert analyzer agent. Your job is to:
 1. Break down complex problems into smaller components
 2. Analyze root causes step by step
@@ -31,7 +32,8 @@ Format your response with clear sections: Analysis, Root Cause, Solution, Preven
             messages.append({"role": "user", "content": f"Error Logs:\n{error_logs}"})
 
         try:
-            response = await client.chat(messages, model="mistral:7b")
+            async with llm_slot(None, None, "mistral:7b", None, lane="background"):
+                response = await client.chat(messages, model="mistral:7b")
             return response
         except Exception as e:
             logger.error(f"Analyzer agent failed: {e}")
@@ -43,9 +45,7 @@ class ResearcherAgent:
 
     async def research(self, query: str, sources: list[str] | None = None) -> str:
         """Research a topic using available knowledge."""
-        from app.services.llm.ollama_client import OllamaClient
-
-        client = OllamaClient()
+        client = get_llm()
         system_prompt = """You are a research agent. Your job is to:
 1. Provide comprehensive information about the topic
 2. Reference relevant documentation and best practices
@@ -64,7 +64,8 @@ Be thorough but concise."""
         ]
 
         try:
-            response = await client.chat(messages, model="mistral:7b")
+            async with llm_slot(None, None, "mistral:7b", None, lane="background"):
+                response = await client.chat(messages, model="mistral:7b")
             return response
         except Exception as e:
             logger.error(f"Researcher agent failed: {e}")
@@ -76,9 +77,7 @@ class CodeReviewAgent:
 
     async def analyze_code(self, code: str, language: str = "auto", query: str = "") -> dict:
         """Analyze code snippet for bugs, security issues, and improvements."""
-        from app.services.llm.ollama_client import OllamaClient
-
-        client = OllamaClient()
+        client = get_llm()
         system_prompt = """You are an expert code reviewer. Analyze the provided code and respond with JSON format:
 {
     "language": "detected language",
@@ -96,7 +95,8 @@ class CodeReviewAgent:
         ]
 
         try:
-            response = await client.chat(messages, model="mistral:7b")
+            async with llm_slot(None, None, "mistral:7b", None, lane="background"):
+                response = await client.chat(messages, model="mistral:7b")
             # Try to parse as JSON, fall back to raw text
             import json
             try:
@@ -5,6 +5,7 @@ from fastapi import Depends, Request
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.exceptions import ForbiddenError, UnauthorizedError
 from app.core.security import check_role_permission, decode_jwt
 from app.db.session import SessionLocal
@@ -57,6 +58,14 @@ def require_role(min_role: str):
     return _check
 
 
+async def require_platform_admin(user: User = Depends(get_current_user)) -> User:
+    """A platform operator (``PLATFORM_ADMIN_EMAILS``); no tenant role grants this."""
+    admins = {email.strip().lower() for email in settings.PLATFORM_ADMIN_EMAILS}
+    if user.email.lower() not in admins:
+        raise ForbiddenError("Requires a platform administrator")
+    return user
+
+
 async def set_tenant_rls(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -12,6 +12,7 @@ from app.models.conversation import Message
 from app.models.user import User
 from app.schemas.approval import ApprovalResponse, ApproveAction, RejectAction
 from app.schemas.common import PaginatedResponse, PaginationParams, build_paginated_response
+from app.services.query_coalescer import bump_knowledge_version
 
 logger = logging.getLogger(__name__)
 
@@ -116,8 +117,8 @@ async def approve(
                 from app.services.rag.embeddings import EmbeddingService
                 from app.services.rag.vector_store import VectorStore
 
-                embedder = EmbeddingService()
                 vector_store = VectorStore()
+                embedder = EmbeddingService(vector_store.embedding_model)
 
                 question_text = user_message.content
                 answer_text = approval.approved_answer or approval.original_answer
@@ -137,6 +138,7 @@ async def approve(
                     "source_type": "verified_answer",
                 }])
                 logger.info(f"Stored verified answer in Qdrant: {verified_doc_id}")
+                await bump_knowledge_version(str(approval.department_id))
         except Exception as e:
             logger.warning(f"Failed to store verified answer in Qdrant: {e}")
 
@@ -191,6 +193,7 @@ async def reject(
             verified_doc_id = f"verified_{approval.id}"
             vector_store.delete_by_document(verified_doc_id)
             logger.info(f"Removed verified answer from Qdrant: {verified_doc_id}")
+            await bump_knowledge_version(str(approval.department_id))
         except Exception as e:
             logger.warning(f"Failed to remove verified answer from Qdrant: {e}")
 
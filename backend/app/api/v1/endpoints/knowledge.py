@@ -4,8 +4,12 @@ from fastapi import APIRouter, Depends, File, Form, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user, get_db
+from app.core.config import settings
 from app.models.user import User
 from app.schemas.common import PaginatedResponse, PaginationParams, build_paginated_response
+from app.services.batch_ingestion_service import BatchIngestionService
+from app.services.ingestion_progress import IngestionProgress
+from app.services.ingestion_scheduler import IngestionScheduler
 from app.services.knowledge_service import KnowledgeService
 
 router = APIRouter()
@@ -16,7 +20,7 @@ class KnowledgeDocResponse:
     pass
 
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 
 
@@ -36,6 +40,21 @@ class KnowledgeDocResponse(BaseModel):
     updated_at: datetime
 
 
+class IngestionProgressResponse(BaseModel):
+    stage: str
+    done: int
+    total: int
+    updated_at: float
+
+
+class KnowledgeDocStatusResponse(BaseModel):
+    id: UUID
+    status: str
+    chunk_count: int
+    error: str | None = None
+    progress: IngestionProgressResponse | None = None
+
+
 @router.post("/{dept_id}/upload", response_model=KnowledgeDocResponse, status_code=201)
 async def upload_document(
     dept_id: UUID,
@@ -44,13 +63,12 @@ async def upload_document(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    content = await file.read()
     service = KnowledgeService(db)
     doc = await service.upload_document(
         tenant_id=user.tenant_id,
         department_id=dept_id,
         user_id=user.id,
-        file_content=content,
+        file=file.file,
         filename=file.filename or "unknown",
         title=title,
         mime_type=file.content_type or "application/octet-stream",
@@ -58,6 +76,110 @@ async def upload_document(
     return doc
 
 
+class BatchManifestRequest(BaseModel):
+    object_keys: list[str] = Field(..., min_length=1)
+
+
+class IngestionJobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    source: str
+    source_name: str | None = None
+    total_docs: int
+    skipped: list[dict]
+    created_at: datetime
+
+
+class IngestionJobProgressResponse(BaseModel):
+    id: UUID
+    status: str
+    source: str
+    source_name: str | None = None
+    total_docs: int
+    counts: dict[str, int]
+    chunks_indexed: int
+    docs_per_second: float
+    chunks_per_second: float
+    skipped: list[dict]
+    failures: list[dict]
+    created_at: datetime
+    finished_at: datetime | None = None
+
+
+@router.post("/{dept_id}/batch", response_model=IngestionJobResponse, status_code=202)
+async def upload_batch(
+    dept_id: UUID,
+    archive: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Ingest every document in a zip/tar archive as one job."""
+    service = BatchIngestionService(db)
+    return await service.create_from_archive(
+        tenant_id=user.tenant_id,
+        department_id=dept_id,
+        user_id=user.id,
+        archive=archive.file,
+        filename=archive.filename or "archive",
+    )
+
+
+@router.post("/{dept_id}/batch/manifest", response_model=IngestionJobResponse, status_code=202)
+async def ingest_manifest(
+    dept_id: UUID,
+    body: BatchManifestRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Ingest objects already uploaded to the knowledge bucket as one job."""
+    service = BatchIngestionService(db)
+    return await service.create_from_manifest(
+        tenant_id=user.tenant_id,
+        department_id=dept_id,
+        user_id=user.id,
+        object_keys=body.object_keys,
+    )
+
+
+@router.get("/{dept_id}/jobs/{job_id}", response_model=IngestionJobProgressResponse)
+async def get_ingestion_job(
+    dept_id: UUID,
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    service = BatchIngestionService(db)
+    return await service.get_job_progress(user.tenant_id, job_id)
+
+
+class IngestionWaitStats(BaseModel):
+    count: int
+    avg: float
+    max: float
+    p50_recent: float
+    p95_recent: float
+
+
+class IngestionQueueStatsResponse(BaseModel):
+    queued: dict[str, int]
+    in_flight: int
+    in_flight_cap: int
+    wait_seconds: IngestionWaitStats
+
+
+@router.get("/queue/stats", response_model=IngestionQueueStatsResponse)
+async def get_ingestion_queue_stats(
+    user: User = Depends(get_current_user),
+):
+    """The tenant's ingestion backlog per lane, in-flight documents and queue wait times."""
+    scheduler = IngestionScheduler.from_settings()
+    try:
+        return await scheduler.tenant_stats(str(user.tenant_id))
+    finally:
+        await scheduler.close()
+
+
 @router.get("/{dept_id}", response_model=PaginatedResponse[KnowledgeDocResponse])
 async def list_documents(
     dept_id: UUID,
@@ -72,6 +194,26 @@ async def list_documents(
     return build_paginated_response(items, total, pagination, KnowledgeDocResponse)
 
 
+class DedupeReportResponse(BaseModel):
+    documents: int
+    duplicates: int
+    points_saved: int
+    bytes_saved: int
+    mode: str
+    threshold: float
+
+
+@router.get("/{dept_id}/dedupe-report", response_model=DedupeReportResponse)
+async def get_dedupe_report(
+    dept_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Chunks and bytes saved by near-duplicate suppression in this department."""
+    service = KnowledgeService(db)
+    return await service.dedupe_report(user.tenant_id, dept_id)
+
+
 @router.get("/{dept_id}/{doc_id}", response_model=KnowledgeDocResponse)
 async def get_document(
     dept_id: UUID,
@@ -83,6 +225,30 @@ async def get_document(
     return await service.get_document(doc_id)
 
 
+@router.get("/{dept_id}/{doc_id}/status", response_model=KnowledgeDocStatusResponse)
+async def get_document_status(
+    dept_id: UUID,
+    doc_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Ingestion status, with live stage/chunk progress while a worker is on it."""
+    service = KnowledgeService(db)
+    doc = await service.get_document(doc_id)
+    progress = IngestionProgress(settings.REDIS_URL)
+    try:
+        current = await progress.get(str(doc_id))
+    finally:
+        await progress.close()
+    return KnowledgeDocStatusResponse(
+        id=doc.id,
+        status=doc.status,
+        chunk_count=doc.chunk_count,
+        error=(doc.metadata_ or {}).get("error"),
+        progress=current,
+    )
+
+
 @router.delete("/{dept_id}/{doc_id}", status_code=204)
 async def delete_document(
     dept_id: UUID,
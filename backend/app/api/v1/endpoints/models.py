@@ -13,6 +13,8 @@ from app.api.deps import get_current_user, get_db, require_role
 from app.models.ai_provider import AIProvider
 from app.models.allowed_model import AllowedModel
 from app.models.user import User
+from app.services.llm.ollama_pool import OllamaPool
+from app.services.llm.registry import get_llm
 
 router = APIRouter()
 
@@ -29,6 +31,7 @@ class ProviderCreate(BaseModel):
     provider_type: str  # "ollama" or "openai_compatible"
     base_url: str
     api_key: str | None = None
+    endpoints: list[str] = []  # further Ollama hosts to load-balance with base_url
 
 
 # --- Provider endpoints ---
@@ -52,6 +55,7 @@ async def list_providers(
                 "name": p.name,
                 "provider_type": p.provider_type,
                 "base_url": p.base_url,
+                "endpoints": p.endpoints or [],
                 "has_api_key": bool(p.api_key),
                 "is_active": p.is_active,
                 "created_at": str(p.created_at),
@@ -83,6 +87,7 @@ async def add_provider(
         provider_type=body.provider_type,
         base_url=body.base_url,
         api_key=body.api_key,
+        endpoints=body.endpoints or None,
     )
     db.add(provider)
     await db.flush()
@@ -93,6 +98,7 @@ async def add_provider(
         "name": provider.name,
         "provider_type": provider.provider_type,
         "base_url": provider.base_url,
+        "endpoints": provider.endpoints or [],
         "has_api_key": bool(provider.api_key),
         "is_active": provider.is_active,
         "created_at": str(provider.created_at),
@@ -138,20 +144,12 @@ async def list_provider_models(
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
 
-    if provider.provider_type == "ollama":
-        from app.services.llm.ollama_client import OllamaClient
-        client = OllamaClient(base_url=provider.base_url)
-    else:
-        from app.services.llm.openai_client import OpenAICompatibleClient
-        client = OpenAICompatibleClient(base_url=provider.base_url, api_key=provider.api_key)
-
+    client = get_llm(provider.provider_type, provider.base_url, provider.api_key, provider.endpoints)
     try:
         models = await client.list_models()
         return {"data": models}
     except Exception:
         return {"data": []}
-    finally:
-        await client.close()
 
 
 # --- Available / Allowed model endpoints ---
@@ -184,10 +182,8 @@ async def list_available_models(
         }
 
     # Fallback: return all Ollama models
-    from app.services.llm.ollama_client import OllamaClient
-    client = OllamaClient()
     try:
-        models = await client.list_models()
+        models = await get_llm().list_models()
         return {
             "data": [
                 {"name": m.get("name", ""), "size": m.get("size", 0), "is_default": False, "provider_name": "Ollama"}
@@ -196,8 +192,6 @@ async def list_available_models(
         }
     except Exception:
         return {"data": []}
-    finally:
-        await client.close()
 
 
 @router.get("/ollama")
@@ -205,10 +199,8 @@ async def list_ollama_models(
     user: User = Depends(require_role("admin")),
 ):
     """List all models from default Ollama server (admin only)."""
-    from app.services.llm.ollama_client import OllamaClient
-    client = OllamaClient()
     try:
-        models = await client.list_models()
+        models = await get_llm().list_models()
         return {
             "data": [
                 {"name": m.get("name", ""), "size": m.get("size", 0)}
@@ -217,8 +209,17 @@ async def list_ollama_models(
         }
     except Exception:
         return {"data": []}
-    finally:
-        await client.close()
+
+
+@router.get("/ollama/hosts")
+async def list_ollama_hosts(
+    user: User = Depends(require_role("admin")),
+):
+    """Health and load of each default Ollama host (admin only)."""
+    client = get_llm()
+    if isinstance(client, OllamaPool):
+        return {"data": client.status()}
+    return {"data": [{"url": client.base_url}]}
 
 
 @router.get("/allowed")
@@ -1,21 +1,95 @@
-from fastapi import APIRouter, Depends
+import json
+from collections.abc import AsyncIterator
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import get_current_user, get_db, require_role
+from app.core.config import settings
+from app.core.exceptions import BadRequestError
 from app.models.user import User
 from app.schemas.query import QueryRequest, QueryResponse
+from app.services.batch_query_service import BatchQueryService
+from app.services.llm.scheduler import get_llm_scheduler
+from app.services.query_coalescer import QueryCoalescer
 from app.services.query_service import QueryService
 
 router = APIRouter()
 
 
-@router.post("", response_model=QueryResponse)
+class BatchQueryItem(BaseModel):
+    id: str | None = Field(None, max_length=255)  # echoed back, e.g. the evaluation set's question ID
+    text: str = Field(..., min_length=1, max_length=5000)
+
+
+class BatchQueryRequest(BaseModel):
+    department_id: UUID
+    queries: list[BatchQueryItem] = Field(..., min_length=1)
+    model_name: str | None = None
+    persist: bool = True  # False: answer only, no conversations, messages or approvals
+    concurrency: int | None = Field(None, gt=0)  # generations at once; the provider cap still applies
+
+
+class CoalescingStatsResponse(BaseModel):
+    queries: int
+    leader: int  # ran the graph themselves
+    local: int  # reused an in-flight answer in the same API process
+    remote: int  # reused an answer published by another worker
+    fallback: int  # waited on an identical query, then ran the graph themselves
+    bypass: int  # Redis unavailable
+    coalesced: int
+    coalescing_ratio: float
+
+
+async def _sse(events: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        if event == "done":
+            data = QueryResponse(**data).model_dump(mode="json")
+        yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post(
+    "",
+    response_model=QueryResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
 async def execute_query(
     body: QueryRequest,
+    request: Request,
+    timeout: float | None = Header(None, alias="X-Query-Timeout", gt=0),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
+    """Answer a question.
+
+    With ``stream: true`` (or ``Accept: text/event-stream``) the response is
+    server-sent events: ``sources``, ``token`` per LLM chunk, then ``done``
+    carrying the usual response body (confidence, message_id, approval_id).
+
+    ``X-Query-Timeout`` (seconds) overrides the department's time budget.
+    Steps that would overrun it are cut short; ``degradations`` lists them.
+    """
     service = QueryService(db)
+    if body.stream or "text/event-stream" in request.headers.get("accept", ""):
+        # Errors such as an unknown department are raised here, before the stream starts.
+        conversation, initial_state = await service.prepare_query(
+            tenant_id=user.tenant_id,
+            department_id=body.department_id,
+            user_id=user.id,
+            query_text=body.text,
+            conversation_id=body.conversation_id,
+            model_name=body.model_name,
+            timeout=timeout,
+        )
+        return StreamingResponse(
+            _sse(service.stream_query(conversation, initial_state)),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     result = await service.execute_query(
         tenant_id=user.tenant_id,
         department_id=body.department_id,
@@ -23,5 +97,56 @@ async def execute_query(
         query_text=body.text,
         conversation_id=body.conversation_id,
         model_name=body.model_name,
+        timeout=timeout,
     )
     return QueryResponse(**result)
+
+
+@router.get("/coalescing", response_model=CoalescingStatsResponse)
+async def get_coalescing_stats(
+    user: User = Depends(require_role("admin")),
+):
+    """How many of the tenant's queries were answered by an identical in-flight query."""
+    coalescer = QueryCoalescer.from_settings()
+    try:
+        return await coalescer.tenant_stats(str(user.tenant_id))
+    finally:
+        await coalescer.close()
+
+
+@router.get("/llm-scheduler")
+async def get_llm_scheduler_stats(
+    user: User = Depends(require_role("owner")),
+):
+    """LLM admission control in this API process: slots in use, queues, rejections and wait times per endpoint."""
+    return {"data": get_llm_scheduler().stats()}
+
+
+@router.post("/batch")
+async def execute_batch_query(
+    body: BatchQueryRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role("admin")),
+):
+    """Answer many questions for one department; results stream back as NDJSON.
+
+    One line per question as it completes (``index`` is its position in the
+    request), then a final ``{"summary": ...}`` line.
+    """
+    if len(body.queries) > settings.QUERY_BATCH_MAX_QUERIES:
+        raise BadRequestError(f"At most {settings.QUERY_BATCH_MAX_QUERIES} queries per batch")
+
+    service = BatchQueryService(db)
+    template = await service.prepare(user.tenant_id, body.department_id, user.id, body.model_name)
+    rows = service.run(
+        template,
+        [q.model_dump() for q in body.queries],
+        persist=body.persist,
+        concurrency=body.concurrency,
+    )
+
+    async def ndjson() -> AsyncIterator[str]:
+        async for row in rows:
+            yield json.dumps(row, default=str) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
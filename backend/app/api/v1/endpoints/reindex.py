@@ -0,0 +1,117 @@
+"""Blue/green re-indexing of the knowledge vector collection.
+
+The collection is shared by every tenant, so these endpoints are for
+platform operators (``PLATFORM_ADMIN_EMAILS``) only, never a tenant role.
+"""
+
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, require_platform_admin
+from app.models.user import User
+from app.services.reindex_service import ReindexService
+
+router = APIRouter()
+
+
+class ReindexRequest(BaseModel):
+    embedding_model: str = Field(..., min_length=1, max_length=255)
+    vector_size: int | None = Field(None, gt=0)  # probed from the model when omitted
+
+
+class ReindexJobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    status: str
+    embedding_model: str
+    vector_size: int | None
+    source_collection: str | None
+    target_collection: str
+    error: str | None
+    created_at: datetime
+
+
+class ReindexProgressResponse(BaseModel):
+    id: UUID
+    status: str
+    embedding_model: str
+    vector_size: int | None
+    source_collection: str | None
+    target_collection: str
+    total_chunks: int
+    processed_chunks: int
+    percent: float
+    chunks_per_second: float
+    eta_seconds: float | None
+    error: str | None
+    created_at: datetime
+    swapped_at: datetime | None
+    finished_at: datetime | None
+
+
+@router.post("", response_model=ReindexJobResponse, status_code=202)
+async def start_reindex(
+    body: ReindexRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_platform_admin),
+):
+    """Build a new collection with *embedding_model*; the alias swaps when it is complete."""
+    service = ReindexService(db)
+    return await service.start(body.embedding_model, body.vector_size, user.id)
+
+
+@router.get("", response_model=list[ReindexJobResponse])
+async def list_reindex_jobs(
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_platform_admin),
+):
+    service = ReindexService(db)
+    return await service.list_jobs()
+
+
+@router.get("/{job_id}", response_model=ReindexProgressResponse)
+async def get_reindex_progress(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_platform_admin),
+):
+    service = ReindexService(db)
+    return await service.get_progress(job_id)
+
+
+@router.post("/{job_id}/resume", response_model=ReindexJobResponse, status_code=202)
+async def resume_reindex(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_platform_admin),
+):
+    """Continue an interrupted job from its last committed checkpoint."""
+    service = ReindexService(db)
+    return await service.resume(job_id)
+
+
+@router.post("/{job_id}/rollback", response_model=ReindexJobResponse, status_code=202)
+async def rollback_reindex(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_platform_admin),
+):
+    """Point the alias back at the previous collection (after syncing recent changes into it)."""
+    service = ReindexService(db)
+    return await service.rollback(job_id)
+
+
+@router.post("/{job_id}/finalize", response_model=ReindexJobResponse)
+async def finalize_reindex(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_platform_admin),
+):
+    """Drop the previous collection. The job can no longer be rolled back."""
+    service = ReindexService(db)
+    return await service.finalize(job_id)
@@ -1,18 +1,52 @@
+import asyncio
 import json
 from uuid import UUID
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from app.core.security import decode_jwt
-from app.services.llm.ollama_client import OllamaClient
+from app.db.session import SessionLocal
 from app.services.llm.prompt_templates import build_rag_prompt
+from app.services.llm.registry import get_llm
+from app.services.llm.scheduler import llm_slot
+from app.services.query_service import QueryService
 from app.services.rag.retriever import RAGRetriever
 
 router = APIRouter()
 
 
+async def _stream_answer(websocket: WebSocket, messages: list[dict], provider: dict, tenant_id, plan_tier: str) -> dict:
+    """Stream tokens from the tenant's provider to the socket; cancelling this aborts the generation."""
+    llm = get_llm(
+        provider["provider_type"],
+        provider["provider_base_url"],
+        provider["provider_api_key"],
+        provider["provider_endpoints"],
+    )
+    model = provider["model_name"]
+    full_response = ""
+    async with llm_slot(
+        provider["provider_type"], provider["provider_base_url"], model, tenant_id, plan_tier,
+        endpoints=provider["provider_endpoints"],
+    ):
+        async with await llm.chat(messages, model=model, stream=True) as stream:
+            async for token in stream:
+                full_response += token
+                await websocket.send_json({"type": "token", "content": token})
+
+    usage = None
+    if stream.usage is not None:
+        usage = {"tokens_input": stream.usage.prompt_tokens, "tokens_output": stream.usage.completion_tokens}
+    return {"full_response": full_response, "model_used": model, "usage": usage}
+
+
 @router.websocket("/chat/{dept_id}")
 async def websocket_chat(websocket: WebSocket, dept_id: UUID):
+    """Chat over a WebSocket, streaming answers from the tenant's provider for the requested model.
+
+    Client messages are ``{"text": ..., "model_name": ...}``; ``{"type": "cancel"}``
+    (or disconnecting) while an answer streams stops its generation.
+    """
     # Validate token from query params
     token = websocket.query_params.get("token")
     if not token:
@@ -29,10 +63,15 @@ async def websocket_chat(websocket: WebSocket, dept_id: UUID):
 
     await websocket.accept()
 
+    # A message received while an answer was streaming, still to be handled.
+    next_message: asyncio.Task | None = None
     try:
         while True:
-            data = await websocket.receive_text()
+            data = await next_message if next_message is not None else await websocket.receive_text()
+            next_message = None
             message = json.loads(data)
+            if message.get("type") == "cancel":
+                continue  # nothing streaming
             query_text = message.get("text", "")
 
             if not query_text:
@@ -43,6 +82,11 @@ async def websocket_chat(websocket: WebSocket, dept_id: UUID):
             await websocket.send_json({"type": "start"})
 
             try:
+                async with SessionLocal() as db:
+                    service = QueryService(db)
+                    provider = await service.resolve_provider(UUID(tenant_id), message.get("model_name"))
+                    plan_tier = await service.get_plan_tier(UUID(tenant_id))
+
                 # RAG retrieval
                 retriever = RAGRetriever()
                 results = retriever.retrieve(
@@ -68,25 +112,27 @@ async def websocket_chat(websocket: WebSocket, dept_id: UUID):
                     system_prompt="You are a helpful AI assistant.",
                 )
 
-                client = OllamaClient()
-                stream = await client.chat(messages, stream=True)
-
-                full_response = ""
-                async for token in stream:
-                    full_response += token
-                    await websocket.send_json({"type": "token", "content": token})
-
-                await client.close()
+                generation = asyncio.create_task(_stream_answer(websocket, messages, provider, tenant_id, plan_tier))
+                next_message = asyncio.create_task(websocket.receive_text())
+                await asyncio.wait({generation, next_message}, return_when=asyncio.FIRST_COMPLETED)
+                if not generation.done():
+                    # The client left or sent something mid-answer.
+                    cancelled = next_message.exception() is not None or _is_cancel(next_message.result())
+                    if cancelled:
+                        generation.cancel()
+                        await asyncio.gather(generation, return_exceptions=True)
+                        if next_message.exception() is not None:
+                            raise next_message.exception()
+                        next_message = None
+                        await websocket.send_json({"type": "cancelled"})
+                        continue
+                result = await generation
 
                 # Signal end
-                await websocket.send_json(
-                    {
-                        "type": "end",
-                        "sources": sources,
-                        "full_response": full_response,
-                    }
-                )
+                await websocket.send_json({"type": "end", "sources": sources, **result})
 
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 await websocket.send_json(
                     {"type": "error", "message": f"Error: {e}"}
@@ -94,3 +140,13 @@ async def websocket_chat(websocket: WebSocket, dept_id: UUID):
 
     except WebSocketDisconnect:
         pass
+    finally:
+        if next_message is not None:
+            next_message.cancel()
+
+
+def _is_cancel(data: str) -> bool:
+    try:
+        return json.loads(data).get("type") == "cancel"
+    except (ValueError, AttributeError):
+        return False
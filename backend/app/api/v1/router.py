@@ -17,6 +17,7 @@ from app.api.v1.endpoints import (
     plugins,
     training,
     query,
+    reindex,
     stripe_webhooks,
     tenants,
     users,
@@ -31,6 +32,7 @@ api_router.include_router(tenants.router, prefix="/tenants", tags=["tenants"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(departments.router, prefix="/departments", tags=["departments"])
 api_router.include_router(knowledge.router, prefix="/knowledge", tags=["knowledge"])
+api_router.include_router(reindex.router, prefix="/reindex", tags=["reindex"])
 api_router.include_router(query.router, prefix="/query", tags=["query"])
 api_router.include_router(conversations.router, prefix="/conversations", tags=["conversations"])
 api_router.include_router(approvals.router, prefix="/approvals", tags=["approvals"])
@@ -34,7 +34,7 @@ class Settings(BaseSettings):
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = []
 
-    @validator("BACKEND_CORS_ORIGINS", pre=True)
+    @validator("BACKEND_CORS_ORIGINS", "OLLAMA_URLS", "PLATFORM_ADMIN_EMAILS", pre=True)
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
         if isinstance(v, str) and not v.startswith("["):
             return [i.strip() for i in v.split(",")]
@@ -45,6 +45,9 @@ class Settings(BaseSettings):
     # Auth
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days (for dev)
+    # Operators of the whole deployment, not of a tenant: only they may run
+    # platform-wide operations such as re-indexing the shared vector collection.
+    PLATFORM_ADMIN_EMAILS: List[str] = []
 
     # Keycloak
     KEYCLOAK_URL: str
@@ -59,10 +62,92 @@ class Settings(BaseSettings):
 
     # Qdrant
     QDRANT_URL: str
+    VECTOR_PROFILE_CACHE_SECONDS: float = 10.0  # how long a process trusts the live collection's embedding model
+
+    # Query answering
+    QUERY_COALESCE_ENABLED: bool = True  # identical in-flight questions share one graph run
+    QUERY_COALESCE_WAIT_SECONDS: float = 120.0  # followers answer on their own after this
+    QUERY_BATCH_MAX_QUERIES: int = 5000
+    QUERY_BATCH_RETRIEVE_SIZE: int = 256  # questions per embedding batch / batched Qdrant search
+    QUERY_BATCH_OLLAMA_CONCURRENCY: int = 4  # concurrent batch generations on the Ollama server
+    QUERY_BATCH_PROVIDER_CONCURRENCY: int = 16  # per OpenAI-compatible provider
+    QUERY_BATCH_PERSIST_SIZE: int = 100  # answers saved per commit
+    QUERY_LOOKUP_CACHE_SECONDS: float = 30.0  # department/model lookups reused per process
+    CONVERSATION_MEMORY_TOKEN_BUDGET: int = 1500  # recent turns sent with a follow-up question
+    CONVERSATION_MEMORY_MAX_MESSAGES: int = 20  # recent turns read per question
+    CONVERSATION_SUMMARY_MAX_TOKENS: int = 400  # rolling summary of older turns
+    # Per-request time budget: department config "deadline_seconds" or the X-Query-Timeout header override it
+    QUERY_DEADLINE_SECONDS: float = 60.0
+    QUERY_DEADLINE_MAX_SECONDS: float = 300.0
+    QUERY_DEADLINE_ANSWER_RESERVE_SECONDS: float = 10.0  # retrieval and vision must finish this long before it
+    QUERY_DEADLINE_VISION_MIN_SECONDS: float = 20.0  # skip image analysis with less left
+    QUERY_DEADLINE_FULL_ANSWER_SECONDS: float = 30.0  # with less left, shorter context and answer
+    QUERY_DEADLINE_REDUCED_CONTEXT_TOKENS: int = 800
+    QUERY_DEADLINE_REDUCED_MAX_TOKENS: int = 512
+    QUERY_DEADLINE_MIN_ANSWER_SECONDS: float = 3.0  # with less left, return the sources only
+
+    # LLM connection pools (one pooled client per provider, see services/llm/registry.py)
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_SECONDS: float = 60.0
+    LLM_HTTP2: bool = True  # for https providers, when the h2 package is installed
+    # LLM admission control, per API process (see services/llm/scheduler.py)
+    LLM_OLLAMA_CONCURRENCY: int = 4  # generations at once per Ollama host
+    LLM_PROVIDER_CONCURRENCY: int = 32  # per OpenAI-compatible base URL
+    LLM_CONCURRENCY_OVERRIDES: dict[str, int] = {}  # base URL or model name -> cap
+    LLM_QUEUE_MAX: int = 200  # waiting generations per endpoint before new ones are rejected
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 60.0
 
     # Ollama
     OLLAMA_URL: str
     OLLAMA_MODEL: str
+    OLLAMA_URLS: List[str] = []  # several hosts load-balanced for the default model server; OLLAMA_URL when empty
+    OLLAMA_HEALTH_INTERVAL_SECONDS: float = 10.0
+    OLLAMA_EJECT_AFTER_FAILURES: int = 3  # consecutive failed probes or requests
+    OLLAMA_EJECT_SECONDS: float = 30.0  # before an ejected host is probed again
+
+    # MinIO
+    MINIO_ENDPOINT: str = "localhost:9000"
+    MINIO_ACCESS_KEY: str = "minioadmin"
+    MINIO_SECRET_KEY: str = "minioadmin"
+    MINIO_SECURE: bool = False
+
+    # Ingestion
+    INGESTION_ASYNC: bool = True  # False = ingest inside the upload request (no worker needed)
+    INGESTION_LOCK_TTL_SECONDS: int = 300  # lease on a running document, renewed every third of it
+    INGESTION_TENANT_CONCURRENCY: int = 4  # documents per tenant ingested at once; 0 = unlimited
+    INGEST_SCHEDULER_CAPACITY: int = 8  # bulk-lane documents handed to workers at once
+    INGEST_PRIORITY_CAPACITY: int = 4  # small-document lane, served by its own workers
+    INGEST_SMALL_DOC_BYTES: int = 2 * 1024 ** 2
+    INGEST_SCHEDULER_TICK_SECONDS: float = 30.0  # beat re-dispatch (recovers expired leases)
+    BATCH_INGEST_MAX_FILES: int = 10000
+    BATCH_INGEST_MAX_FILE_BYTES: int = 512 * 1024 ** 2
+    PDF_EXTRACT_WORKERS: int = 0  # 0 = one worker per available core
+    PDF_PAGE_TIMEOUT_SECONDS: float = 60.0
+    PDF_PARALLEL_MIN_PAGES: int = 16  # smaller PDFs are extracted in-process
+    CSV_ROW_GROUP_CHARS: int = 1800  # fits one default-sized chunk (512 tokens)
+    HTML_SECTION_CHARS: int = 64 * 1024
+    EXTRACTION_CACHE_BACKEND: str = "local"  # local, minio, none
+    EXTRACTION_CACHE_DIR: str = "/tmp/extraction_cache"
+    EXTRACTION_CACHE_BUCKET: str = "extraction-cache"
+    EXTRACTION_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    EXTRACTION_CACHE_MAX_ENTRY_BYTES: int = 64 * 1024 ** 2  # larger extractions are not cached
+    INGEST_BATCH_SIZE: int = 64  # chunks per embed/upsert/insert batch
+    INGEST_QUEUE_SIZE: int = 4  # batches buffered between pipeline stages
+    INGEST_UPSERT_WORKERS: int = 2
+    INGEST_CHECKPOINT_CHUNKS: int = 1000  # commit a resume point at least this often
+    DEDUP_MODE: str = "link"  # off, skip (drop near-duplicate chunks), link (row points at the canonical vector)
+    DEDUP_THRESHOLD: float = 0.9  # estimated Jaccard similarity of word shingles
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_SHINGLE_SIZE: int = 5
+    CHUNK_WRITE_BATCH_SIZE: int = 500
+    CHUNK_WRITE_METHOD: str = "copy"  # copy (asyncpg COPY, Core INSERT on other drivers), insert
+
+    # Re-indexing (blue/green rebuild of the vector collection)
+    REINDEX_BATCH_SIZE: int = 128  # chunks per embed/upsert batch
+    REINDEX_EMBED_WORKERS: int = 2
+    REINDEX_WINDOW_BATCHES: int = 8  # batches between committed progress checkpoints
+    REINDEX_MAX_CHUNKS_PER_SECOND: float = 0  # throttle; 0 = unthrottled
 
     # Training / ML
     TRAINING_DEFAULT_BASE_MODEL: str = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
@@ -49,6 +49,12 @@ class RateLimitExceededError(AppException):
         self.retry_after = retry_after
 
 
+class LLMOverloadedError(RateLimitExceededError):
+    def __init__(self, message: str = "The language model is overloaded", retry_after: int = 5):
+        super().__init__(message=message, retry_after=retry_after)
+        self.code = "LLM_OVERLOADED"
+
+
 def _build_error_body(exc: AppException, request_id: str | None = None) -> dict:
     body: dict = {
         "error": {
@@ -23,8 +23,21 @@ async def lifespan(app: FastAPI):
         logger.warning("Embedding model NOT loaded — using random vectors (search will not work correctly)")
     else:
         logger.info("Embedding model ready")
+
+    from app.services.object_storage import ensure_buckets
+    try:
+        ensure_buckets()
+    except Exception as exc:
+        logger.warning("Could not verify MinIO buckets at startup: {}", exc)
     yield
 
+    from app.agents.graph import close_query_deps
+    from app.services.llm.registry import close_llm_clients
+    from app.services.query_coalescer import close_query_coalescer
+    await close_query_deps()
+    await close_llm_clients()
+    await close_query_coalescer()
+
 
 app = FastAPI(
     lifespan=lifespan,
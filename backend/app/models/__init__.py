@@ -2,6 +2,8 @@ from .tenant import Tenant
 from .user import User
 from .department import Department, DepartmentMember
 from .knowledge import KnowledgeDoc, KnowledgeChunk
+from .ingestion_job import IngestionJob
+from .reindex_job import ReindexJob
 from .conversation import Conversation, Message
 from .approval import Approval
 from .audit_log import AuditLog
@@ -3,7 +3,7 @@ from uuid import uuid4
 
 from sqlalchemy import Boolean, String, TIMESTAMP, ForeignKey, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID, TEXT
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID, TEXT
 
 from app.db.base_class import Base
 
@@ -19,6 +19,7 @@ class AIProvider(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     provider_type: Mapped[str] = mapped_column(String(50), nullable=False)  # ollama, openai_compatible
     base_url: Mapped[str] = mapped_column(String(500), nullable=False)
+    endpoints: Mapped[list[str] | None] = mapped_column(JSONB, nullable=True)  # more Ollama hosts, load-balanced with base_url
     api_key: Mapped[str | None] = mapped_column(TEXT, nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
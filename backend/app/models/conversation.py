@@ -21,6 +21,9 @@ class Conversation(Base):
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="active")  # active, closed, archived
     message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     last_message_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    # Rolling summary of the turns up to and including summary_through_id (see conversation_memory)
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summary_through_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import ForeignKey, Integer, String, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.db.base_class import Base
+
+
+class IngestionJob(Base):
+    """A batch of knowledge documents uploaded together (archive or MinIO manifest)."""
+
+    __tablename__ = "ingestion_jobs"
+
+    id: Mapped[uuid4] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
+    tenant_id: Mapped[uuid4] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
+    department_id: Mapped[uuid4] = mapped_column(ForeignKey("departments.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_by: Mapped[Optional[uuid4]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    source: Mapped[str] = mapped_column(String(20), nullable=False)  # archive, manifest
+    source_name: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)  # archive filename
+    total_docs: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    skipped: Mapped[list] = mapped_column(JSONB, default=list, nullable=False)  # [{"name", "reason"}]
+
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    # Relationships
+    tenant: Mapped["Tenant"] = relationship()
+    creator: Mapped[Optional["User"]] = relationship()
@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import Float, ForeignKey, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.db.base_class import Base
+
+
+class ReindexJob(Base):
+    """A blue/green rebuild of the vector collection from knowledge_chunks text."""
+
+    __tablename__ = "reindex_jobs"
+
+    id: Mapped[uuid4] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
+    created_by: Mapped[Optional[uuid4]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    # pending, building, catching_up, swapping, active, rolling_back, rolled_back, finalized
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending", index=True)
+    embedding_model: Mapped[str] = mapped_column(String(255), nullable=False)
+    vector_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # probed from the model if unset
+    source_collection: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # alias target when started
+    target_collection: Mapped[str] = mapped_column(String(255), nullable=False)
+
+    total_chunks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processed_chunks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cursor: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # last knowledge_chunks.id copied
+    chunks_per_second: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    snapshot_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True), nullable=True)  # catch-up watermark
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    swapped_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+
+    # Relationships
+    creator: Mapped[Optional["User"]] = relationship()
@@ -9,6 +9,7 @@ class QueryRequest(BaseModel):
     department_id: UUID
     conversation_id: UUID | None = None
     model_name: str | None = None
+    stream: bool = False  # server-sent events; also chosen by "Accept: text/event-stream"
 
 
 class SourceItem(BaseModel):
@@ -26,6 +27,7 @@ class QueryResponse(BaseModel):
     tokens_input: int = 0
     tokens_output: int = 0
     latency_ms: float = 0
+    degradations: list[str] = []  # what was cut to meet the deadline, e.g. "skipped_vision", "sources_only"
     conversation_id: UUID
     message_id: int
     needs_approval: bool = False
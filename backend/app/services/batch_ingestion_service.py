@@ -0,0 +1,293 @@
+"""Batch ingestion: many knowledge documents from one archive or MinIO manifest."""
+
+import asyncio
+import logging
+import mimetypes
+import posixpath
+import tarfile
+import zipfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO
+from uuid import UUID, uuid4
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import BadRequestError, NotFoundError
+from app.models.ingestion_job import IngestionJob
+from app.models.knowledge import KnowledgeDoc
+from app.services.knowledge_service import source_type_for
+from app.services.object_storage import KNOWLEDGE_BUCKET, get_minio_client, put_stream
+from app.services.tasks import dispatch_ingestion_job_task
+
+logger = logging.getLogger(__name__)
+
+INGESTIBLE_EXTENSIONS = {".pdf", ".docx", ".txt", ".md", ".csv", ".html", ".htm"}
+MAX_REPORTED_FAILURES = 50
+
+
+@dataclass
+class StoredFile:
+    name: str
+    object_name: str
+    mime_type: str
+    size: int
+    sha256: str | None = None
+
+
+def _member_name(name: str) -> str | None:
+    """Normalised archive member path, or None for entries that are not documents."""
+    name = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    parts = name.split("/")
+    if name in ("", ".") or ".." in parts:
+        return None
+    if any(p.startswith(".") or p == "__MACOSX" for p in parts):
+        return None
+    return name
+
+
+@contextmanager
+def _open_archive(archive: BinaryIO, filename: str) -> Iterator[Iterator[tuple[str, int, BinaryIO]]]:
+    """Yield an iterator of (member name, declared size, stream) for a zip or tar archive."""
+    archive.seek(0)
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zf:
+            def members():
+                for info in zf.infolist():
+                    if not info.is_dir():
+                        with zf.open(info) as stream:
+                            yield info.filename, info.file_size, stream
+            yield members()
+        return
+
+    archive.seek(0)
+    try:
+        tf = tarfile.open(fileobj=archive, mode="r:*")
+    except tarfile.TarError:
+        raise BadRequestError(f"{filename} is not a zip or tar archive")
+    with tf:
+        def members():
+            for member in tf:
+                if member.isfile():
+                    yield member.name, member.size, tf.extractfile(member)
+        yield members()
+
+
+def _store_archive(archive: BinaryIO, filename: str, prefix: str) -> tuple[list[StoredFile], list[dict]]:
+    """Stream every ingestible archive member into MinIO under *prefix*."""
+    stored: list[StoredFile] = []
+    skipped: list[dict] = []
+    with _open_archive(archive, filename) as members:
+        for raw_name, size, stream in members:
+            name = _member_name(raw_name)
+            if name is None:
+                continue
+            if posixpath.splitext(name)[1].lower() not in INGESTIBLE_EXTENSIONS:
+                skipped.append({"name": name, "reason": "unsupported file type"})
+                continue
+            if size > settings.BATCH_INGEST_MAX_FILE_BYTES:
+                skipped.append({"name": name, "reason": "file too large"})
+                continue
+            if len(stored) >= settings.BATCH_INGEST_MAX_FILES:
+                skipped.append({"name": name, "reason": "too many files in archive"})
+                continue
+            mime_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            object_name = f"{prefix}/{name}"
+            file_size, sha256 = put_stream(KNOWLEDGE_BUCKET, object_name, stream, mime_type)
+            stored.append(StoredFile(name, object_name, mime_type, file_size, sha256))
+    return stored, skipped
+
+
+def _stat_manifest(keys: list[str]) -> tuple[list[StoredFile], list[dict]]:
+    from minio.error import S3Error
+
+    client = get_minio_client()
+    stored: list[StoredFile] = []
+    skipped: list[dict] = []
+    for key in keys:
+        if posixpath.splitext(key)[1].lower() not in INGESTIBLE_EXTENSIONS:
+            skipped.append({"name": key, "reason": "unsupported file type"})
+            continue
+        try:
+            stat = client.stat_object(KNOWLEDGE_BUCKET, key)
+        except S3Error as exc:
+            skipped.append({"name": key, "reason": exc.code})
+            continue
+        if stat.size > settings.BATCH_INGEST_MAX_FILE_BYTES:
+            skipped.append({"name": key, "reason": "file too large"})
+            continue
+        mime_type = stat.content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+        stored.append(StoredFile(posixpath.basename(key), key, mime_type, stat.size))
+    return stored, skipped
+
+
+class BatchIngestionService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_from_archive(
+        self,
+        tenant_id: UUID,
+        department_id: UUID,
+        user_id: UUID,
+        archive: BinaryIO,
+        filename: str,
+    ) -> IngestionJob:
+        """Unpack a zip/tar archive into MinIO and queue every document in it."""
+        job_id = uuid4()
+        prefix = f"tenant-{tenant_id}/dept-{department_id}/job-{job_id}"
+        stored, skipped = await asyncio.to_thread(_store_archive, archive, filename, prefix)
+        return await self._create_job(
+            job_id, tenant_id, department_id, user_id, "archive", filename, stored, skipped
+        )
+
+    async def create_from_manifest(
+        self,
+        tenant_id: UUID,
+        department_id: UUID,
+        user_id: UUID,
+        object_keys: list[str],
+    ) -> IngestionJob:
+        """Queue objects already in the knowledge bucket (under the tenant's prefix)."""
+        if len(object_keys) > settings.BATCH_INGEST_MAX_FILES:
+            raise BadRequestError(f"A manifest may list at most {settings.BATCH_INGEST_MAX_FILES} objects")
+        tenant_prefix = f"tenant-{tenant_id}/"
+        foreign = [k for k in object_keys if not k.startswith(tenant_prefix) or ".." in k.split("/")]
+        if foreign:
+            raise BadRequestError(
+                f"Object keys must start with {tenant_prefix}",
+                details=[{"key": k} for k in foreign[:MAX_REPORTED_FAILURES]],
+            )
+        stored, skipped = await asyncio.to_thread(_stat_manifest, object_keys)
+        return await self._create_job(
+            uuid4(), tenant_id, department_id, user_id, "manifest", None, stored, skipped
+        )
+
+    async def _create_job(
+        self,
+        job_id: UUID,
+        tenant_id: UUID,
+        department_id: UUID,
+        user_id: UUID,
+        source: str,
+        source_name: str | None,
+        stored: list[StoredFile],
+        skipped: list[dict],
+    ) -> IngestionJob:
+        if not stored:
+            raise BadRequestError("No ingestible documents found", details=skipped[:MAX_REPORTED_FAILURES] or None)
+
+        job = IngestionJob(
+            id=job_id,
+            tenant_id=tenant_id,
+            department_id=department_id,
+            created_by=user_id,
+            source=source,
+            source_name=source_name,
+            total_docs=len(stored),
+            skipped=skipped,
+        )
+        self.db.add(job)
+        # One transaction for the job and all of its documents.
+        docs = [
+            KnowledgeDoc(
+                tenant_id=tenant_id,
+                department_id=department_id,
+                uploaded_by=user_id,
+                title=posixpath.splitext(posixpath.basename(f.name))[0] or f.name,
+                source_type=source_type_for(f.name),
+                file_path=f.object_name,
+                mime_type=f.mime_type,
+                file_size=f.size,
+                status="pending",
+                metadata_={"sha256": f.sha256} if f.sha256 else {},
+                ingestion_job_id=job_id,
+            )
+            for f in stored
+        ]
+        self.db.add_all(docs)
+        await self.db.commit()
+        await self.db.refresh(job)
+
+        try:
+            # Routed to the ingestion-dispatch queue (see celery_worker).
+            await asyncio.to_thread(dispatch_ingestion_job_task.apply_async, args=[str(job_id)])
+        except Exception as exc:
+            # Nothing else will pick the documents up: don't leave them pending forever.
+            logger.error(f"Could not queue ingestion job {job_id}: {exc}")
+            for doc in docs:
+                doc.status = "failed"
+                doc.metadata_ = {**doc.metadata_, "error": f"Could not queue ingestion: {exc}"}
+            await self.db.commit()
+        return job
+
+    async def get_job_progress(self, tenant_id: UUID, job_id: UUID) -> dict:
+        """Aggregate status, throughput and failures of a batch job's documents."""
+        job = (
+            await self.db.execute(
+                select(IngestionJob).where(IngestionJob.id == job_id, IngestionJob.tenant_id == tenant_id)
+            )
+        ).scalar_one_or_none()
+        if not job:
+            raise NotFoundError(f"Ingestion job {job_id} not found")
+
+        rows = await self.db.execute(
+            select(
+                KnowledgeDoc.status,
+                func.count(),
+                func.coalesce(func.sum(KnowledgeDoc.chunk_count), 0),
+                func.max(KnowledgeDoc.updated_at),
+            )
+            .where(KnowledgeDoc.ingestion_job_id == job_id)
+            .group_by(KnowledgeDoc.status)
+        )
+        counts: dict[str, int] = {}
+        chunks = 0
+        last_update = job.created_at
+        for status, count, chunk_sum, updated_at in rows.all():
+            counts[status] = count
+            chunks += chunk_sum
+            if updated_at and updated_at > last_update:
+                last_update = updated_at
+
+        done = counts.get("indexed", 0) + counts.get("failed", 0)
+        finished = done >= job.total_docs
+        elapsed = max((last_update - job.created_at).total_seconds(), 1e-3) if done else 0.0
+
+        failures = (
+            await self.db.execute(
+                select(KnowledgeDoc.id, KnowledgeDoc.title, KnowledgeDoc.metadata_)
+                .where(KnowledgeDoc.ingestion_job_id == job_id, KnowledgeDoc.status == "failed")
+                .limit(MAX_REPORTED_FAILURES)
+            )
+        ).all()
+
+        if not finished:
+            status = "running" if done or counts.get("processing") else "pending"
+        elif counts.get("failed"):
+            status = "completed_with_errors"
+        else:
+            status = "completed"
+
+        return {
+            "id": job.id,
+            "status": status,
+            "source": job.source,
+            "source_name": job.source_name,
+            "total_docs": job.total_docs,
+            "counts": counts,
+            "chunks_indexed": chunks,
+            "docs_per_second": round(done / elapsed, 3) if elapsed else 0.0,
+            "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0,
+            "skipped": job.skipped,
+            "failures": [
+                {"document_id": doc_id, "title": title, "error": (meta or {}).get("error")}
+                for doc_id, title, meta in failures
+            ],
+            "created_at": job.created_at,
+            "finished_at": last_update if finished else None,
+        }
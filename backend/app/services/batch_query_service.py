@@ -0,0 +1,247 @@
+"""Bulk question answering for offline evaluation and bulk Q&A (``POST /query/batch``).
+
+Questions are retrieved a window at a time with one embedding batch and one
+batched Qdrant search, then answered through the query graph's nodes with
+a cap on concurrent generations per LLM provider. Results are yielded as
+they complete.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.agents.graph import QueryDeps, QueryState, get_query_deps, run_query_pipeline
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.approval import Approval
+from app.models.conversation import Conversation, Message
+from app.services.query_service import QueryService
+
+logger = logging.getLogger(__name__)
+
+# Shared by every batch in the process, so two evaluation runs can't double a provider's load.
+_provider_slots: dict[str, asyncio.Semaphore] = {}
+
+
+def _provider_limit(state: QueryState) -> tuple[str, int]:
+    if state.get("provider_type") == "openai_compatible":
+        return state.get("provider_base_url") or "", settings.QUERY_BATCH_PROVIDER_CONCURRENCY
+    return "ollama", settings.QUERY_BATCH_OLLAMA_CONCURRENCY
+
+
+def provider_slots(state: QueryState) -> asyncio.Semaphore:
+    """Process-wide cap on concurrent batch generations for the state's provider."""
+    key, limit = _provider_limit(state)
+    if key not in _provider_slots:
+        _provider_slots[key] = asyncio.Semaphore(limit)
+    return _provider_slots[key]
+
+
+class PrefetchedRetriever:
+    """Serves results retrieved ahead of time for a window of questions."""
+
+    def __init__(self, retriever, results: dict[str, list[dict]]):
+        self.retriever = retriever
+        self.results = results
+
+    def retrieve(self, query: str, tenant_id: str, department_id: str, top_k: int = 5) -> list[dict]:
+        if query in self.results:
+            return self.results[query]
+        return self.retriever.retrieve(query=query, tenant_id=tenant_id, department_id=department_id, top_k=top_k)
+
+    def build_context(self, results: list[dict], max_tokens: int = 2000) -> str:
+        return self.retriever.build_context(results, max_tokens=max_tokens)
+
+
+class BatchQueryService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def prepare(
+        self,
+        tenant_id: UUID,
+        department_id: UUID,
+        user_id: UUID,
+        model_name: str | None = None,
+    ) -> QueryState:
+        """Graph input shared by every question of a batch; raises before any answering starts."""
+        service = QueryService(self.db)
+        department = await service.get_department(department_id)
+        provider = await service.resolve_provider(tenant_id, model_name)
+        plan_tier = await service.get_plan_tier(tenant_id)
+        return QueryService.build_state(department, provider, tenant_id, user_id, "", plan_tier=plan_tier)
+
+    async def run(
+        self,
+        template: QueryState,
+        queries: list[dict],
+        persist: bool = True,
+        concurrency: int | None = None,
+    ) -> AsyncIterator[dict]:
+        """Answer *queries* (``{"id", "text"}``), yielding one row per question, then a summary.
+
+        Rows arrive in completion order; ``index`` is the position in *queries*.
+        With *persist* each question is saved as its own conversation, with
+        messages and an approval as for a single query, in groups of
+        ``QUERY_BATCH_PERSIST_SIZE`` (run in its own session: this outlives the
+        request's).
+        """
+        started = time.perf_counter()
+        deps = get_query_deps()
+        slots = provider_slots(template)
+        limit = asyncio.Semaphore(concurrency or _provider_limit(template)[1])
+        size = settings.QUERY_BATCH_RETRIEVE_SIZE
+        indexed = list(enumerate(queries))
+        windows = [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
+        async def prefetch(window: list[tuple[int, dict]]) -> QueryDeps:
+            texts = list(dict.fromkeys(item["text"] for _, item in window))
+            try:
+                batches = await asyncio.to_thread(
+                    lambda: deps.retriever.retrieve_batch(texts, template["tenant_id"], template["department_id"])
+                )
+                results = dict(zip(texts, batches))
+            except Exception as e:
+                # Fall back to per-question retrieval inside the pipeline.
+                logger.warning(f"Batched retrieval failed for {len(texts)} questions: {e}")
+                results = {}
+            return QueryDeps(retriever=PrefetchedRetriever(deps.retriever, results), ollama=deps.ollama)
+
+        async def answer(index: int, item: dict, window_deps: QueryDeps) -> tuple[int, dict, dict]:
+            state = {**template, "query": item["text"]}
+            async with limit, slots:
+                try:
+                    # Interactive questions are admitted to the LLM ahead of batch ones.
+                    config = {"configurable": {"deps": window_deps, "lane": "background"}}
+                    final = await run_query_pipeline(state, config)
+                    if "llm_overloaded" in (final.get("degradations") or []):
+                        # No slot within the queue timeout: the stand-in text is not an answer.
+                        final = {**final, "answer": "", "error": "The language model is overloaded"}
+                except Exception as e:
+                    final = {**state, "answer": "", "confidence": 0.0, "needs_approval": False, "error": str(e)}
+            return index, item, final
+
+        errors = 0
+        pending: list[tuple[dict, dict]] = []
+        tasks: list[asyncio.Task] = []
+        next_window = asyncio.create_task(prefetch(windows[0])) if windows else None
+        try:
+            async with SessionLocal() as db:
+                for w, window in enumerate(windows):
+                    window_deps = await next_window
+                    # Retrieve the next window while this one is being answered.
+                    if w + 1 < len(windows):
+                        next_window = asyncio.create_task(prefetch(windows[w + 1]))
+                    tasks = [asyncio.create_task(answer(i, item, window_deps)) for i, item in window]
+                    for done in asyncio.as_completed(tasks):
+                        index, item, final = await done
+                        row = _result_row(index, item, final)
+                        errors += bool(row["error"])
+                        if not persist:
+                            yield row
+                            continue
+                        pending.append((row, final))
+                        if len(pending) >= settings.QUERY_BATCH_PERSIST_SIZE:
+                            for saved in await _save_answers(db, template, pending):
+                                yield saved
+                            pending = []
+                if pending:
+                    for saved in await _save_answers(db, template, pending):
+                        yield saved
+        finally:
+            # The client went away: stop answering.
+            for task in [*tasks, next_window]:
+                if task is not None and not task.done():
+                    task.cancel()
+
+        yield {
+            "summary": {
+                "total": len(queries),
+                "errors": errors,
+                "persisted": persist,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+            }
+        }
+
+
+def _result_row(index: int, item: dict, final: dict) -> dict:
+    return {
+        "index": index,
+        "id": item.get("id"),
+        "query": item["text"],
+        "answer": final.get("answer", ""),
+        "confidence": final.get("confidence", 0.0),
+        "needs_approval": final.get("needs_approval", False),
+        "sources": final.get("sources", []),
+        "model_used": final.get("model_used"),
+        "tokens_input": final.get("tokens_input", 0),
+        "tokens_output": final.get("tokens_output", 0),
+        "latency_ms": final.get("latency_ms", 0.0),
+        "degradations": final.get("degradations", []),
+        "error": final.get("error"),
+    }
+
+
+async def _save_answers(db: AsyncSession, template: QueryState, answered: list[tuple[dict, dict]]) -> list[dict]:
+    """Save each answered question as its own conversation, in one flush and commit."""
+    tenant_id = UUID(template["tenant_id"])
+    department_id = UUID(template["department_id"])
+    user_id = UUID(template["user_id"])
+    now = datetime.now(timezone.utc)
+
+    saved = []
+    for row, _ in answered:
+        conversation = Conversation(
+            tenant_id=tenant_id,
+            department_id=department_id,
+            user_id=user_id,
+            title=row["query"][:100],
+            status="active",
+            message_count=2,
+            last_message_at=now,
+        )
+        user_msg = Message(
+            conversation=conversation,
+            tenant_id=tenant_id,
+            department_id=department_id,
+            user_id=user_id,
+            role="user",
+            content=row["query"],
+            status="completed",
+        )
+        ai_msg = Message(
+            conversation=conversation,
+            tenant_id=tenant_id,
+            department_id=department_id,
+            role="assistant",
+            content=row["answer"],
+            confidence=row["confidence"],
+            model_used=row["model_used"],
+            tokens_input=row["tokens_input"],
+            tokens_output=row["tokens_output"],
+            latency_ms=row["latency_ms"],
+            sources={"items": row["sources"]},
+            status="pending_approval" if row["needs_approval"] else "completed",
+        )
+        approval = Approval(
+            tenant_id=tenant_id,
+            department_id=department_id,
+            message=ai_msg,
+            requested_by=user_id,
+            status="pending" if row["needs_approval"] else "auto_approved",
+            original_answer=row["answer"],
+            priority="normal" if row["needs_approval"] else "low",
+        )
+        db.add_all([conversation, user_msg, ai_msg, approval])
+        saved.append((row, conversation, ai_msg, approval))
+
+    await db.commit()
+    return [
+        {**row, "conversation_id": str(conversation.id), "message_id": ai_msg.id, "approval_id": str(approval.id)}
+        for row, conversation, ai_msg, approval in saved
+    ]
@@ -19,6 +19,16 @@ celery_app.conf.update(
     task_acks_late=True,
     worker_prefetch_multiplier=1,
     task_routes={
+        # Scheduler passes must not wait behind the ingestion backlog they dispatch.
+        "app.services.tasks.dispatch_ingestion_queue_task": {"queue": "ingestion-dispatch"},
+        "app.services.tasks.dispatch_ingestion_job_task": {"queue": "ingestion-dispatch"},
+        "app.services.tasks.reindex_collection_task": {"queue": "reindex"},
         "app.services.tasks.*": {"queue": "ingestion"},
     },
+    beat_schedule={
+        "dispatch-ingestion-queue": {
+            "task": "app.services.tasks.dispatch_ingestion_queue_task",
+            "schedule": settings.INGEST_SCHEDULER_TICK_SECONDS,
+        },
+    },
 )
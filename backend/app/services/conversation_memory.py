@@ -0,0 +1,143 @@
+"""Conversation memory for follow-up questions.
+
+A question asked in an existing conversation is answered with the most
+recent turns that fit ``CONVERSATION_MEMORY_TOKEN_BUDGET``, preceded by a
+rolling summary of everything older. The summary is cached on the
+conversation row (``summary`` plus ``summary_through_id``, the last message
+folded into it) and refreshed in the background after each answer, so the
+prompt stays bounded however long the thread gets and no question waits on
+a summarization call.
+"""
+
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.agents.graph import get_query_deps
+from app.core.config import settings
+from app.core.exceptions import NotFoundError
+from app.db.session import SessionLocal
+from app.models.conversation import Conversation, Message
+from app.services.llm.prompt_templates import build_summary_prompt
+from app.services.llm.scheduler import llm_slot
+
+logger = logging.getLogger(__name__)
+
+# Summary refreshes in flight; kept referenced until they finish.
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def estimate_tokens(text: str) -> int:
+    """Same words x 1.3 estimate the query graph reports usage with."""
+    return int(len(text.split()) * 1.3)
+
+
+def fit_turns(messages: list[Message], budget: int, max_messages: int) -> list[Message]:
+    """The newest *messages* (oldest first), at most *max_messages*, whose combined size fits *budget*."""
+    kept: list[Message] = []
+    used = 0
+    for message in reversed(messages):
+        used += estimate_tokens(message.content)
+        if used > budget or len(kept) >= max_messages:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+async def load_memory(db: AsyncSession, conversation_id: UUID, tenant_id: UUID) -> dict:
+    """The summary and recent turns to answer a follow-up in *conversation_id* with.
+
+    One query: it also checks that the conversation belongs to *tenant_id*.
+    Turns already folded into the summary are never read.
+    """
+    stmt = (
+        select(Conversation.summary, Message)
+        .outerjoin(
+            Message,
+            and_(
+                Message.conversation_id == Conversation.id,
+                Message.id > func.coalesce(Conversation.summary_through_id, 0),
+                Message.role != "system",
+            ),
+        )
+        .where(Conversation.id == conversation_id, Conversation.tenant_id == tenant_id)
+        .order_by(Message.id.desc())
+        .limit(settings.CONVERSATION_MEMORY_MAX_MESSAGES)
+    )
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        raise NotFoundError(f"Conversation {conversation_id} not found")
+
+    messages = [row.Message for row in reversed(rows) if row.Message is not None]
+    turns = fit_turns(messages, settings.CONVERSATION_MEMORY_TOKEN_BUDGET, settings.CONVERSATION_MEMORY_MAX_MESSAGES)
+    return {
+        "history_summary": rows[0].summary or "",
+        "history": [{"role": m.role, "content": m.content} for m in turns],
+    }
+
+
+async def refresh_summary(conversation_id: UUID, llm) -> bool:
+    """Fold turns that no longer fit the memory budget into the conversation's summary.
+
+    Returns whether the summary changed. The turns are read and the summary
+    written in two short sessions, so no connection is held while the
+    summary waits for and runs on the LLM; a refresh that races another one
+    for the same conversation loses and is dropped.
+    """
+    async with SessionLocal() as db:
+        conversation = await db.get(Conversation, conversation_id)
+        if conversation is None:
+            return False
+        tenant_id = conversation.tenant_id
+        previous = conversation.summary or ""
+        through = conversation.summary_through_id or 0
+        stmt = (
+            select(Message)
+            .where(Message.conversation_id == conversation_id, Message.id > through, Message.role != "system")
+            .order_by(Message.id.asc())
+        )
+        messages = list((await db.execute(stmt)).scalars().all())
+        kept = fit_turns(messages, settings.CONVERSATION_MEMORY_TOKEN_BUDGET, settings.CONVERSATION_MEMORY_MAX_MESSAGES)
+        folded = [{"role": m.role, "content": m.content} for m in messages[: len(messages) - len(kept)]]
+        if not folded:
+            return False
+        folded_through = messages[len(folded) - 1].id
+
+    prompt = build_summary_prompt(previous, folded, settings.CONVERSATION_SUMMARY_MAX_TOKENS)
+    async with llm_slot(None, None, settings.OLLAMA_MODEL, str(tenant_id), lane="background"):
+        summary = (await llm.chat(prompt, model=settings.OLLAMA_MODEL)).strip()
+    # Bound the summary even if the model ignores the requested length.
+    words = summary.split()
+    limit = int(settings.CONVERSATION_SUMMARY_MAX_TOKENS / 1.3)
+    if len(words) > limit:
+        summary = " ".join(words[:limit])
+
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                func.coalesce(Conversation.summary_through_id, 0) == through,
+            )
+            .values(summary=summary, summary_through_id=folded_through)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+
+def schedule_summary_refresh(conversation_id: UUID) -> None:
+    """Refresh the conversation's summary in the background of the current event loop."""
+
+    async def refresh() -> None:
+        try:
+            await refresh_summary(conversation_id, get_query_deps().ollama)
+        except Exception as e:
+            logger.warning(f"Summary refresh failed for conversation {conversation_id}: {e}")
+
+    task = asyncio.create_task(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
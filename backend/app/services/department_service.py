@@ -10,6 +10,7 @@ from app.schemas.department import (
     DepartmentMemberCreate,
     DepartmentUpdate,
 )
+from app.services.query_service import forget_department
 
 
 class DepartmentService:
@@ -70,6 +71,7 @@ class DepartmentService:
         for field, value in update_data.items():
             setattr(dept, field, value)
         await self.db.flush()
+        forget_department(department_id)
         await self.db.refresh(dept)
         return dept
 
@@ -77,6 +79,7 @@ class DepartmentService:
         dept = await self.get_department(department_id)
         dept.deleted_at = func.now()
         await self.db.flush()
+        forget_department(department_id)
 
     async def list_members(
         self, department_id: UUID
@@ -0,0 +1,55 @@
+"""Per-document ingestion progress, kept in Redis so the API can report it while a worker ingests."""
+
+import logging
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TTL_SECONDS = 24 * 3600
+
+
+class IngestionProgress:
+    """Stage and chunk counters for documents being ingested.
+
+    One Redis hash per document (``ingest:progress:<doc_id>``). Reporting is
+    best-effort: a Redis outage never fails an ingestion.
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis = redis.from_url(redis_url, decode_responses=True)
+
+    @staticmethod
+    def _key(doc_id: str) -> str:
+        return f"ingest:progress:{doc_id}"
+
+    async def report(self, doc_id: str, stage: str, done: int = 0, total: int = 0) -> None:
+        key = self._key(doc_id)
+        try:
+            await self.redis.hset(
+                key,
+                mapping={"stage": stage, "done": done, "total": total, "updated_at": time.time()},
+            )
+            await self.redis.expire(key, PROGRESS_TTL_SECONDS)
+        except Exception as exc:
+            logger.warning(f"Could not record ingestion progress for {doc_id}: {exc}")
+
+    async def get(self, doc_id: str) -> Optional[dict]:
+        try:
+            data = await self.redis.hgetall(self._key(doc_id))
+        except Exception as exc:
+            logger.warning(f"Could not read ingestion progress for {doc_id}: {exc}")
+            return None
+        if not data:
+            return None
+        return {
+            "stage": data["stage"],
+            "done": int(data.get("done", 0)),
+            "total": int(data.get("total", 0)),
+            "updated_at": float(data.get("updated_at", 0)),
+        }
+
+    async def close(self) -> None:
+        await self.redis.aclose()
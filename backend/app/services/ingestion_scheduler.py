@@ -0,0 +1,272 @@
+"""
+Fair-share scheduler in front of the ingestion workers.
+
+Documents are not sent to Celery directly. They wait in per-tenant Redis
+sub-queues and the scheduler hands out only as many tasks as there are
+worker slots, choosing the tenant by smooth weighted round-robin (weight
+by plan tier). One tenant bulk-loading 10,000 files therefore holds at
+most its share of the workers, and another tenant's single upload is
+picked on the next free slot instead of after the backlog.
+
+Two lanes, each with its own Celery queue and capacity:
+
+    small  documents <= INGEST_SMALL_DOC_BYTES -> "ingestion-priority"
+    bulk   everything else                     -> "ingestion"
+
+Redis layout (all keys under ``ingest:sched:``):
+
+    tenants:<lane>          set    tenants with queued documents
+    q:<tenant>:<lane>       list   queued doc IDs (FIFO)
+    meta                    hash   doc ID -> {"tenant", "tier", "lane", "enqueued_at"}
+    credit:<lane>           hash   tenant -> round-robin credit
+    inflight:<lane>         zset   doc ID -> lease expiry (renewed while the document runs)
+    wait:<tenant>           hash   count / total_seconds / max_seconds
+    waits:<tenant>          list   recent wait times (for percentiles)
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.services.ingestion_slots import TenantIngestionSlots
+
+logger = logging.getLogger(__name__)
+
+TIER_WEIGHTS = {
+    "free": 1,
+    "professional": 2,
+    "enterprise": 4,
+    "onpremise": 4,
+}
+
+LANES = ("small", "bulk")
+LANE_QUEUES = {"small": "ingestion-priority", "bulk": "ingestion"}
+_PREFIX = "ingest:sched"
+_RECENT_WAITS = 200
+
+
+def smooth_wrr(credits: dict[str, float], weights: dict[str, int]) -> str:
+    """One step of smooth weighted round-robin; updates *credits* in place.
+
+    Every tenant earns its weight, the richest one is chosen and pays the
+    total weight. Over ``sum(weights)`` picks each tenant is chosen exactly
+    ``weight`` times, interleaved rather than in bursts.
+    """
+    for tenant, weight in weights.items():
+        credits[tenant] = credits.get(tenant, 0.0) + weight
+    chosen = max(weights, key=lambda t: (credits[t], weights[t], t))
+    credits[chosen] -= sum(weights.values())
+    return chosen
+
+
+class IngestionScheduler:
+    def __init__(self, client: redis.Redis):
+        self.redis = client
+        self.slots = TenantIngestionSlots(
+            client, settings.INGESTION_TENANT_CONCURRENCY, settings.INGESTION_LOCK_TTL_SECONDS
+        )
+        self.capacity = {
+            "small": settings.INGEST_PRIORITY_CAPACITY,
+            "bulk": settings.INGEST_SCHEDULER_CAPACITY,
+        }
+
+    @classmethod
+    def from_settings(cls) -> "IngestionScheduler":
+        return cls(redis.from_url(settings.REDIS_URL, decode_responses=True))
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    @staticmethod
+    def lane_for(size_bytes: int | None) -> str:
+        if size_bytes is not None and size_bytes <= settings.INGEST_SMALL_DOC_BYTES:
+            return "small"
+        return "bulk"
+
+    # ------------------------------------------------------------------
+    # Producers / consumers
+    # ------------------------------------------------------------------
+    async def submit(self, tenant_id: str, doc_id: str, plan_tier: str | None, size_bytes: int | None) -> None:
+        """Queue a document for ingestion and dispatch if a slot is free."""
+        await self.submit_many([(tenant_id, doc_id, plan_tier, size_bytes)])
+
+    async def submit_many(self, items: list[tuple[str, str, str | None, int | None]]) -> None:
+        """Queue (tenant ID, doc ID, plan tier, size) entries, then dispatch once."""
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=True)
+        for tenant_id, doc_id, plan_tier, size_bytes in items:
+            lane = self.lane_for(size_bytes)
+            meta = {"tenant": tenant_id, "tier": plan_tier or "free", "lane": lane, "enqueued_at": now}
+            pipe.hset(f"{_PREFIX}:meta", doc_id, json.dumps(meta))
+            pipe.rpush(f"{_PREFIX}:q:{tenant_id}:{lane}", doc_id)
+            pipe.sadd(f"{_PREFIX}:tenants:{lane}", tenant_id)
+        await pipe.execute()
+        await self.dispatch()
+
+    async def renew(self, tenant_id: str, doc_id: str) -> None:
+        """Extend a running document's leases on its lane and tenant slots."""
+        expiry = time.time() + settings.INGESTION_LOCK_TTL_SECONDS
+        pipe = self.redis.pipeline(transaction=False)
+        for lane in LANES:
+            pipe.zadd(f"{_PREFIX}:inflight:{lane}", {doc_id: expiry}, xx=True)
+        await pipe.execute()
+        await self.slots.acquire(tenant_id, doc_id)
+
+    async def complete(self, tenant_id: str | None, doc_id: str) -> None:
+        """A worker finished (or gave up on) a document: free its slots and refill."""
+        pipe = self.redis.pipeline(transaction=False)
+        for lane in LANES:
+            pipe.zrem(f"{_PREFIX}:inflight:{lane}", doc_id)
+        await pipe.execute()
+        if tenant_id is not None:
+            await self.slots.release(tenant_id, doc_id)
+        await self.dispatch()
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+    async def dispatch(self) -> int:
+        """Send queued documents to Celery while lanes have capacity. Returns tasks sent."""
+        lock_key = f"{_PREFIX}:lock"
+        token = str(uuid.uuid4())
+        # Whoever holds the lock is already dispatching; it will see our new work.
+        if not await self.redis.set(lock_key, token, nx=True, px=10_000):
+            return 0
+        sent = 0
+        try:
+            for lane in LANES:
+                sent += await self._dispatch_lane(lane)
+        finally:
+            if await self.redis.get(lock_key) == token:
+                await self.redis.delete(lock_key)
+        return sent
+
+    async def _dispatch_lane(self, lane: str) -> int:
+        from app.services.tasks import ingest_document_task
+
+        inflight_key = f"{_PREFIX}:inflight:{lane}"
+        now = time.time()
+        await self.redis.zremrangebyscore(inflight_key, "-inf", now)
+        free = self.capacity[lane] - await self.redis.zcard(inflight_key)
+        sent = 0
+        blocked: set[str] = set()  # tenants at their in-flight cap this round
+        while free > 0:
+            pick = await self._next_tenant(lane, blocked)
+            if pick is None:
+                break
+            tenant_id, doc_id = pick
+            if doc_id is None:
+                continue
+            if not await self.slots.acquire(tenant_id, doc_id):
+                # Tenant is at its cap: put the document back at the head of its queue.
+                await self.redis.lpush(f"{_PREFIX}:q:{tenant_id}:{lane}", doc_id)
+                blocked.add(tenant_id)
+                continue
+
+            await self.redis.zadd(inflight_key, {doc_id: now + settings.INGESTION_LOCK_TTL_SECONDS})
+            await self._record_wait(tenant_id, doc_id)
+            await asyncio.to_thread(
+                ingest_document_task.apply_async,
+                args=[doc_id],
+                queue=LANE_QUEUES[lane],
+                task_id=f"ingest-{doc_id}",
+            )
+            free -= 1
+            sent += 1
+        return sent
+
+    async def _next_tenant(self, lane: str, blocked: set[str]) -> tuple[str, str | None] | None:
+        """Smooth weighted round-robin over tenants with queued work in *lane*."""
+        tenants = [t for t in await self.redis.smembers(f"{_PREFIX}:tenants:{lane}") if t not in blocked]
+        if not tenants:
+            return None
+
+        weights = {t: TIER_WEIGHTS.get(await self._tier_of(t, lane), 1) for t in tenants}
+        credit_key = f"{_PREFIX}:credit:{lane}"
+        raw = await self.redis.hmget(credit_key, tenants)
+        credits = {t: float(c or 0) for t, c in zip(tenants, raw)}
+        chosen = smooth_wrr(credits, weights)
+        await self.redis.hset(credit_key, mapping=credits)
+
+        doc_id = await self.redis.lpop(f"{_PREFIX}:q:{chosen}:{lane}")
+        if doc_id is None:
+            # Queue drained: the tenant leaves the rotation (and its credit resets).
+            await self.redis.srem(f"{_PREFIX}:tenants:{lane}", chosen)
+            await self.redis.hdel(credit_key, chosen)
+        return chosen, doc_id
+
+    async def _tier_of(self, tenant_id: str, lane: str) -> str:
+        head = await self.redis.lindex(f"{_PREFIX}:q:{tenant_id}:{lane}", 0)
+        if head is None:
+            return "free"
+        meta = await self.redis.hget(f"{_PREFIX}:meta", head)
+        return json.loads(meta)["tier"] if meta else "free"
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    async def _record_wait(self, tenant_id: str, doc_id: str) -> None:
+        raw = await self.redis.hget(f"{_PREFIX}:meta", doc_id)
+        await self.redis.hdel(f"{_PREFIX}:meta", doc_id)
+        if not raw:
+            return
+        waited = max(0.0, time.time() - json.loads(raw)["enqueued_at"])
+        wait_key = f"{_PREFIX}:wait:{tenant_id}"
+        previous_max = float(await self.redis.hget(wait_key, "max_seconds") or 0)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(wait_key, "count", 1)
+        pipe.hincrbyfloat(wait_key, "total_seconds", waited)
+        if waited > previous_max:
+            pipe.hset(wait_key, "max_seconds", waited)
+        pipe.lpush(f"{_PREFIX}:waits:{tenant_id}", waited)
+        pipe.ltrim(f"{_PREFIX}:waits:{tenant_id}", 0, _RECENT_WAITS - 1)
+        await pipe.execute()
+
+    async def tenant_stats(self, tenant_id: str) -> dict:
+        """Queue depth, in-flight count and queue wait times for one tenant."""
+        queued = {lane: await self.redis.llen(f"{_PREFIX}:q:{tenant_id}:{lane}") for lane in LANES}
+        wait = await self.redis.hgetall(f"{_PREFIX}:wait:{tenant_id}")
+        recent = sorted(float(w) for w in await self.redis.lrange(f"{_PREFIX}:waits:{tenant_id}", 0, -1))
+        count = int(wait.get("count", 0))
+
+        def percentile(p: float) -> float:
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 3) if recent else 0.0
+
+        return {
+            "queued": queued,
+            "in_flight": await self.slots.in_flight(tenant_id),
+            "in_flight_cap": settings.INGESTION_TENANT_CONCURRENCY,
+            "wait_seconds": {
+                "count": count,
+                "avg": round(float(wait.get("total_seconds", 0)) / count, 3) if count else 0.0,
+                "max": round(float(wait.get("max_seconds", 0)), 3),
+                "p50_recent": percentile(0.5),
+                "p95_recent": percentile(0.95),
+            },
+        }
+
+
+async def schedule_ingestion(db, docs: list) -> None:
+    """Hand KnowledgeDocs to the scheduler, weighted by their tenants' plan tiers."""
+    from sqlalchemy import select
+
+    from app.models.tenant import Tenant
+
+    if not docs:
+        return
+    tenant_ids = {doc.tenant_id for doc in docs}
+    rows = await db.execute(select(Tenant.id, Tenant.plan_tier).where(Tenant.id.in_(tenant_ids)))
+    tiers = {tenant_id: tier for tenant_id, tier in rows.all()}
+
+    scheduler = IngestionScheduler.from_settings()
+    try:
+        await scheduler.submit_many(
+            [(str(doc.tenant_id), str(doc.id), tiers.get(doc.tenant_id), doc.file_size) for doc in docs]
+        )
+    finally:
+        await scheduler.close()
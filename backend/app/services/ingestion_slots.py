@@ -0,0 +1,61 @@
+"""Per-tenant cap on documents being ingested at once, shared by all Celery workers."""
+
+import logging
+import time
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+# Members are doc IDs scored by lease expiry, so a crashed worker's slot frees itself.
+_ACQUIRE = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZSCORE', KEYS[1], ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    return 1
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[4]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+
+class TenantIngestionSlots:
+    """Lease-based slots in a Redis sorted set per tenant (``ingest:slots:<tenant_id>``)."""
+
+    def __init__(self, client: redis.Redis, limit: int, lease_seconds: int):
+        self.redis = client
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self._acquire = self.redis.register_script(_ACQUIRE)
+
+    @staticmethod
+    def _key(tenant_id: str) -> str:
+        return f"ingest:slots:{tenant_id}"
+
+    async def acquire(self, tenant_id: str, doc_id: str) -> bool:
+        """Take a slot for *doc_id*; False when the tenant is at its limit. 0 = unlimited."""
+        if self.limit <= 0:
+            return True
+        now = time.time()
+        acquired = await self._acquire(
+            keys=[self._key(tenant_id)],
+            args=[now, now + self.lease_seconds, doc_id, self.limit, self.lease_seconds],
+        )
+        return bool(acquired)
+
+    async def release(self, tenant_id: str, doc_id: str) -> None:
+        if self.limit <= 0:
+            return
+        try:
+            await self.redis.zrem(self._key(tenant_id), doc_id)
+        except Exception as exc:
+            logger.warning(f"Could not release ingestion slot of {doc_id}: {exc}")
+
+    async def in_flight(self, tenant_id: str) -> int:
+        key = self._key(tenant_id)
+        await self.redis.zremrangebyscore(key, "-inf", time.time())
+        return await self.redis.zcard(key)
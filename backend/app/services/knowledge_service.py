@@ -1,94 +1,109 @@
+import asyncio
+import logging
 import os
-import tempfile
-from uuid import UUID
+from typing import BinaryIO
+from uuid import UUID, uuid4
 
-from minio import Minio
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.exceptions import NotFoundError
-from app.models.knowledge import KnowledgeChunk, KnowledgeDoc
-from app.services.rag.ingestion import IngestionService
+from app.models.knowledge import KnowledgeDoc
+from app.services.ingestion_scheduler import schedule_ingestion
+from app.services.query_coalescer import bump_knowledge_version
+from app.services.object_storage import KNOWLEDGE_BUCKET, get_minio_client, put_stream
+from app.services.rag.dedupe import ChunkDeduper
+from app.services.rag.ingestion import IngestionService, promote_duplicates
 from app.services.rag.vector_store import VectorStore
 
+logger = logging.getLogger(__name__)
+
+
+def source_type_for(filename: str) -> str:
+    """KnowledgeDoc.source_type from a file extension."""
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    return ext if ext in ("pdf", "docx", "txt", "md", "csv", "html") else "manual"
+
 
 class KnowledgeService:
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.minio_client = Minio(
-            getattr(settings, "MINIO_ENDPOINT", "localhost:9000"),
-            access_key=getattr(settings, "MINIO_ACCESS_KEY", "minioadmin"),
-            secret_key=getattr(settings, "MINIO_SECRET_KEY", "minioadmin"),
-            secure=False,
-        )
-        self.bucket = "knowledge-docs"
+        self.minio_client = get_minio_client()
+        self.bucket = KNOWLEDGE_BUCKET
 
     async def upload_document(
         self,
         tenant_id: UUID,
         department_id: UUID,
         user_id: UUID,
-        file_content: bytes,
+        file: BinaryIO,
         filename: str,
         title: str,
         mime_type: str,
     ) -> KnowledgeDoc:
-        # Store file in MinIO
-        object_name = f"tenant-{tenant_id}/dept-{department_id}/{filename}"
-        if not self.minio_client.bucket_exists(self.bucket):
-            self.minio_client.make_bucket(self.bucket)
-
-        import io
-        self.minio_client.put_object(
-            self.bucket,
-            object_name,
-            io.BytesIO(file_content),
-            len(file_content),
-            content_type=mime_type,
+        """Store an uploaded file and queue it for ingestion.
+
+        *file* is the request's spooled upload. It is streamed to MinIO once
+        (hashed on the way) and the document is returned as ``pending``; a
+        Celery worker on the ``ingestion`` queue does the rest. With
+        ``INGESTION_ASYNC`` off, extraction reads the same spool inline.
+        """
+        # One object per document: a re-upload of the same name must not
+        # replace the bytes an earlier, not yet ingested document points at.
+        doc_id = uuid4()
+        object_name = f"tenant-{tenant_id}/dept-{department_id}/doc-{doc_id}/{filename}"
+        file_size, content_hash = await asyncio.to_thread(
+            put_stream, self.bucket, object_name, file, mime_type
         )
 
-        # Determine source type from extension
-        ext = os.path.splitext(filename)[1].lower().lstrip(".")
-        source_type = ext if ext in ("pdf", "docx", "txt", "md", "csv", "html") else "manual"
-
         # Create DB record
         doc = KnowledgeDoc(
+            id=doc_id,
             tenant_id=tenant_id,
             department_id=department_id,
             uploaded_by=user_id,
             title=title,
-            source_type=source_type,
+            source_type=source_type_for(filename),
             file_path=object_name,
             mime_type=mime_type,
-            file_size=len(file_content),
+            file_size=file_size,
             status="pending",
+            metadata_={"sha256": content_hash},
         )
         self.db.add(doc)
         await self.db.flush()
         await self.db.refresh(doc)
 
-        # Trigger async ingestion (in a real app, use Celery)
-        try:
-            # Save to temp file for extraction
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{ext}") as tmp:
-                tmp.write(file_content)
-                tmp_path = tmp.name
+        # The worker loads the document by ID, and inline ingestion commits
+        # checkpoints as it goes: either way the record is committed first.
+        await self.db.commit()
+
+        if settings.INGESTION_ASYNC:
+            try:
+                await schedule_ingestion(self.db, [doc])
+            except Exception as exc:
+                # Nothing will pick the document up: don't leave it pending forever.
+                logger.error(f"Could not queue ingestion for document {doc.id}: {exc}")
+                doc.status = "failed"
+                doc.metadata_ = {**doc.metadata_, "error": f"Could not queue ingestion: {exc}"}
+                await self.db.commit()
+            return doc
 
+        try:
             ingestion = IngestionService(self.db)
             await ingestion.ingest_document(
                 doc_id=doc.id,
                 tenant_id=tenant_id,
                 department_id=department_id,
-                file_path=tmp_path,
+                source=file,
                 mime_type=mime_type,
+                content_hash=content_hash,
+                filename=filename,
             )
         except Exception:
             # Ingestion failure is non-blocking; status is set in ingestion service
             pass
-        finally:
-            if "tmp_path" in locals():
-                os.unlink(tmp_path)
 
         await self.db.refresh(doc)
         return doc
@@ -116,6 +131,25 @@ class KnowledgeService:
         result = await self.db.execute(stmt)
         return list(result.scalars().all()), total
 
+    async def dedupe_report(self, tenant_id: UUID, department_id: UUID) -> dict:
+        """Near-duplicate chunks suppressed at ingestion, summed over the department's documents."""
+        rows = await self.db.execute(
+            select(KnowledgeDoc.metadata_).where(
+                KnowledgeDoc.tenant_id == tenant_id,
+                KnowledgeDoc.department_id == department_id,
+                KnowledgeDoc.deleted_at.is_(None),
+            )
+        )
+        report = {"documents": 0, "duplicates": 0, "points_saved": 0, "bytes_saved": 0}
+        for (metadata,) in rows.all():
+            stats = (metadata or {}).get("dedupe")
+            if not stats:
+                continue
+            report["documents"] += 1
+            for name in ("duplicates", "points_saved", "bytes_saved"):
+                report[name] += stats.get(name, 0)
+        return {**report, "mode": settings.DEDUP_MODE, "threshold": settings.DEDUP_THRESHOLD}
+
     async def get_document(self, doc_id: UUID) -> KnowledgeDoc:
         stmt = select(KnowledgeDoc).where(
             KnowledgeDoc.id == doc_id,
@@ -130,12 +164,18 @@ class KnowledgeService:
     async def delete_document(self, doc_id: UUID) -> None:
         doc = await self.get_document(doc_id)
 
+        # Its chunks stop being canonical for near-duplicate detection; chunks
+        # of other documents linked to its vectors get vectors of their own.
+        vs = await asyncio.to_thread(VectorStore)
+        deduper = ChunkDeduper.for_department(str(doc.department_id))
+        await promote_duplicates(self.db, doc_id, vs, deduper)
+
         # Delete vectors from Qdrant
         try:
-            vs = VectorStore()
             vs.delete_by_document(str(doc_id))
         except Exception:
             pass
+        await bump_knowledge_version(str(doc.department_id))
 
         # Delete file from MinIO
         try:
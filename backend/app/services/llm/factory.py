@@ -12,6 +12,7 @@ from app.models.ai_provider import AIProvider
 from app.models.allowed_model import AllowedModel
 from app.services.llm.ollama_client import OllamaClient
 from app.services.llm.openai_client import OpenAICompatibleClient
+from app.services.llm.registry import get_llm
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,8 @@ async def get_llm_client(
 ) -> OllamaClient | OpenAICompatibleClient:
     """Look up provider for a model and return the appropriate LLM client.
 
-    Falls back to Ollama if no provider is configured.
+    Falls back to Ollama if no provider is configured. Clients are the
+    registry's shared, pooled ones: do not close them.
     """
     result = await db.execute(
         select(AllowedModel)
@@ -37,14 +39,10 @@ async def get_llm_client(
 
     if allowed and allowed.provider:
         provider = allowed.provider
-        if provider.provider_type == "openai_compatible":
-            return OpenAICompatibleClient(
-                base_url=provider.base_url,
-                api_key=provider.api_key,
-            )
+        return get_llm(provider.provider_type, provider.base_url, provider.api_key, provider.endpoints)
 
     # Default: Ollama
-    return OllamaClient()
+    return get_llm()
 
 
 def get_llm_client_sync(
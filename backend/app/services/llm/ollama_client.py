@@ -4,14 +4,19 @@ from collections.abc import AsyncIterator
 import httpx
 
 from app.core.config import settings
+from app.services.llm.streaming import LLMStream, TokenUsage
 
 
 class OllamaClient:
     """Async client for Ollama LLM inference."""
 
-    def __init__(self, base_url: str | None = None):
+    def __init__(self, base_url: str | None = None, limits: httpx.Limits | None = None):
         self.base_url = (base_url or settings.OLLAMA_URL).rstrip("/")
-        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=120.0)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=120.0,
+            limits=limits or httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
 
     async def generate(
         self,
@@ -20,7 +25,7 @@ class OllamaClient:
         stream: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 2048,
-    ) -> str | AsyncIterator[str]:
+    ) -> str | LLMStream:
         model = model or settings.OLLAMA_MODEL
         payload = {
             "model": model,
@@ -33,25 +38,13 @@ class OllamaClient:
         }
 
         if stream:
-            return self._stream_generate(payload)
+            return LLMStream(self._stream(payload, "/api/generate", lambda data: data.get("response", "")))
 
         response = await self.client.post("/api/generate", json=payload)
         response.raise_for_status()
         data = response.json()
         return data.get("response", "")
 
-    async def _stream_generate(self, payload: dict) -> AsyncIterator[str]:
-        async with self.client.stream("POST", "/api/generate", json=payload) as response:
-            response.raise_for_status()
-            async for line in response.aiter_lines():
-                if line.strip():
-                    data = json.loads(line)
-                    token = data.get("response", "")
-                    if token:
-                        yield token
-                    if data.get("done", False):
-                        break
-
     async def chat(
         self,
         messages: list[dict],
@@ -59,7 +52,7 @@ class OllamaClient:
         stream: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 2048,
-    ) -> str | AsyncIterator[str]:
+    ) -> str | LLMStream:
         model = model or settings.OLLAMA_MODEL
         payload = {
             "model": model,
@@ -72,23 +65,25 @@ class OllamaClient:
         }
 
         if stream:
-            return self._stream_chat(payload)
+            return LLMStream(self._stream(payload, "/api/chat", lambda data: data.get("message", {}).get("content", "")))
 
         response = await self.client.post("/api/chat", json=payload)
         response.raise_for_status()
         data = response.json()
         return data.get("message", {}).get("content", "")
 
-    async def _stream_chat(self, payload: dict) -> AsyncIterator[str]:
-        async with self.client.stream("POST", "/api/chat", json=payload) as response:
+    async def _stream(self, payload: dict, path: str, token_of) -> AsyncIterator[str | TokenUsage]:
+        # Leaving this block, however the stream ends, closes the response and so aborts the generation.
+        async with self.client.stream("POST", path, json=payload) as response:
             response.raise_for_status()
             async for line in response.aiter_lines():
                 if line.strip():
                     data = json.loads(line)
-                    token = data.get("message", {}).get("content", "")
+                    token = token_of(data)
                     if token:
                         yield token
                     if data.get("done", False):
+                        yield TokenUsage(data.get("prompt_eval_count", 0), data.get("eval_count", 0))
                         break
 
     async def list_models(self) -> list[dict]:
@@ -0,0 +1,216 @@
+"""Load balancing across several Ollama hosts.
+
+``OllamaPool`` has the ``OllamaClient`` interface and spreads generations
+over a list of hosts:
+
+* least outstanding requests, preferring hosts that already have the
+  requested model loaded (from each host's ``/api/ps``), so a request does
+  not pay for loading the model on a cold box;
+* active health checks every OLLAMA_HEALTH_INTERVAL_SECONDS; a host that
+  fails OLLAMA_EJECT_AFTER_FAILURES times in a row (probes or requests) is
+  ejected for OLLAMA_EJECT_SECONDS (again each time its probe fails) and
+  re-admitted by the next successful probe;
+* a request that cannot connect to its host is retried on another one (a
+  stream only until its first token). A host that is merely slow (read
+  timeouts) is neither retried around nor counted as failing.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+
+from app.core.config import settings
+from app.services.llm.ollama_client import OllamaClient
+from app.services.llm.streaming import LLMStream, TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# The host is down or unreachable, and the request never reached it: safe to retry elsewhere.
+_UNREACHABLE = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def ollama_urls(base_url: str | None = None, endpoints: list[str] | None = None) -> list[str]:
+    """A provider's hosts (base URL first), or the default server's when no base URL is given."""
+    if base_url:
+        urls = [base_url, *(endpoints or [])]
+    else:
+        urls = settings.OLLAMA_URLS or [settings.OLLAMA_URL]
+    return list(dict.fromkeys(url.rstrip("/") for url in urls))
+
+
+class _Host:
+    def __init__(self, url: str, limits: httpx.Limits | None):
+        self.url = url
+        self.client = OllamaClient(base_url=url, limits=limits)
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected = False
+        self.ejected_until = 0.0  # not probed again before this
+        self.loaded: set[str] = set()
+
+    def failed(self, reason: str) -> None:
+        self.failures += 1
+        if self.failures < settings.OLLAMA_EJECT_AFTER_FAILURES:
+            return
+        self.ejected_until = time.monotonic() + settings.OLLAMA_EJECT_SECONDS
+        if not self.ejected:
+            self.ejected = True
+            logger.warning(f"Ejected Ollama host {self.url} after {self.failures} failures: {reason}")
+
+    def succeeded(self) -> None:
+        if self.ejected:
+            logger.info(f"Re-admitted Ollama host {self.url}")
+        self.failures = 0
+        self.ejected = False
+
+
+class OllamaPool:
+    """Ollama client over several hosts; see the module docstring."""
+
+    def __init__(self, urls: list[str], limits: httpx.Limits | None = None):
+        self.hosts = [_Host(url.rstrip("/"), limits) for url in urls]
+        self.base_url = self.hosts[0].url
+        self._probe_task: asyncio.Task | None = None
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def pick(self, model: str | None, exclude: set[str] = frozenset()) -> _Host | None:
+        """The least busy available host, preferring ones with *model* loaded."""
+        self._ensure_probing()
+        candidates = [h for h in self.hosts if not h.ejected and h.url not in exclude]
+        if not candidates:
+            # Everything is ejected: try the hosts anyway rather than fail outright.
+            candidates = [h for h in self.hosts if h.url not in exclude]
+        if not candidates:
+            return None
+        warm = [h for h in candidates if model and model in h.loaded]
+        return min(warm or candidates, key=lambda h: h.outstanding)
+
+    async def _call(self, model: str | None, request):
+        """Run ``request(client)`` on a picked host, retrying elsewhere when the host is unreachable."""
+        tried: set[str] = set()
+        last_error: Exception | None = None
+        while True:
+            host = self.pick(model, tried)
+            if host is None:
+                raise last_error
+            tried.add(host.url)
+            host.outstanding += 1
+            try:
+                result = await request(host.client)
+            except _UNREACHABLE as e:
+                host.failed(str(e))
+                last_error = e
+                logger.warning(f"Ollama host {host.url} unreachable, retrying elsewhere: {e}")
+                continue
+            finally:
+                host.outstanding -= 1
+            host.succeeded()
+            return result
+
+    async def _stream(self, model: str | None, open_stream) -> AsyncIterator[str | TokenUsage]:
+        tried: set[str] = set()
+        last_error: Exception | None = None
+        while True:
+            host = self.pick(model, tried)
+            if host is None:
+                raise last_error
+            tried.add(host.url)
+            host.outstanding += 1
+            started = False
+            try:
+                async with await open_stream(host.client) as stream:
+                    async for token in stream:
+                        started = True
+                        yield token
+                host.succeeded()
+                if stream.usage is not None:
+                    yield stream.usage
+                return
+            except _UNREACHABLE as e:
+                host.failed(str(e))
+                if started:
+                    raise
+                last_error = e
+                logger.warning(f"Ollama host {host.url} unreachable, retrying elsewhere: {e}")
+            finally:
+                host.outstanding -= 1
+
+    # ------------------------------------------------------------------
+    # OllamaClient interface
+    # ------------------------------------------------------------------
+    async def generate(self, prompt: str, model: str | None = None, stream: bool = False, **kwargs):
+        model = model or settings.OLLAMA_MODEL
+        if stream:
+            return LLMStream(self._stream(model, lambda c: c.generate(prompt, model=model, stream=True, **kwargs)))
+        return await self._call(model, lambda c: c.generate(prompt, model=model, **kwargs))
+
+    async def chat(self, messages: list[dict], model: str | None = None, stream: bool = False, **kwargs):
+        model = model or settings.OLLAMA_MODEL
+        if stream:
+            return LLMStream(self._stream(model, lambda c: c.chat(messages, model=model, stream=True, **kwargs)))
+        return await self._call(model, lambda c: c.chat(messages, model=model, **kwargs))
+
+    async def list_models(self) -> list[dict]:
+        """Models on any host, each listed once."""
+        models: dict[str, dict] = {}
+        for host in self.hosts:
+            try:
+                for m in await host.client.list_models():
+                    models.setdefault(m.get("name", ""), m)
+            except Exception as e:
+                logger.warning(f"Listing models on {host.url} failed: {e}")
+        return list(models.values())
+
+    async def health_check(self) -> bool:
+        return any([await h.client.health_check() for h in self.hosts])
+
+    def status(self) -> list[dict]:
+        return [
+            {
+                "url": h.url,
+                "ejected": h.ejected,
+                "outstanding": h.outstanding,
+                "consecutive_failures": h.failures,
+                "loaded_models": sorted(h.loaded),
+            }
+            for h in self.hosts
+        ]
+
+    async def close(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+        for host in self.hosts:
+            await host.client.close()
+
+    # ------------------------------------------------------------------
+    # Active health checks
+    # ------------------------------------------------------------------
+    def _ensure_probing(self) -> None:
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_forever())
+
+    async def _probe_forever(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(settings.OLLAMA_HEALTH_INTERVAL_SECONDS)
+
+    async def probe(self) -> None:
+        """Check every host, ejected ones once their ejection period is over; refresh loaded models."""
+        now = time.monotonic()
+        await asyncio.gather(*(self._probe(h) for h in self.hosts if not h.ejected or h.ejected_until <= now))
+
+    async def _probe(self, host: _Host) -> None:
+        try:
+            response = await host.client.client.get("/api/ps", timeout=5.0)
+            response.raise_for_status()
+        except Exception as e:
+            host.failed(f"health check: {e}")
+            return
+        host.loaded = {m.get("name", "") for m in response.json().get("models", [])}
+        host.succeeded()
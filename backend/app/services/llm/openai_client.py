@@ -1,46 +1,83 @@
 """OpenAI-compatible LLM client. Works with OpenAI, Groq, Together AI, vLLM, Subnet, etc."""
 
+from collections.abc import AsyncIterator
+
 import httpx
 from openai import AsyncOpenAI
 
+from app.services.llm.streaming import LLMStream, TokenUsage
+
 
 class OpenAICompatibleClient:
     """Async client for any OpenAI-compatible API."""
 
-    def __init__(self, base_url: str, api_key: str | None = None):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str | None = None,
+        limits: httpx.Limits | None = None,
+        http2: bool = False,
+    ):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key or "not-needed"
         self.client = AsyncOpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
             timeout=120.0,
+            http_client=httpx.AsyncClient(
+                timeout=120.0,
+                limits=limits or httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                http2=http2,
+            ),
         )
 
     async def chat(
         self,
         messages: list[dict],
         model: str | None = None,
+        stream: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 2048,
-    ) -> str:
-        response = await self.client.chat.completions.create(
-            model=model or "gpt-3.5-turbo",
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
+    ) -> str | LLMStream:
+        params = {
+            "model": model or "gpt-3.5-turbo",
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        if stream:
+            return LLMStream(self._stream_chat(params))
+
+        response = await self.client.chat.completions.create(**params)
         return response.choices[0].message.content or ""
 
+    async def _stream_chat(self, params: dict) -> AsyncIterator[str | TokenUsage]:
+        # include_usage adds a final chunk, with no choices, carrying the token counts.
+        chunks = await self.client.chat.completions.create(
+            **params, stream=True, stream_options={"include_usage": True}
+        )
+        try:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.usage:
+                    yield TokenUsage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+        finally:
+            # Closing the response aborts the generation if the stream was abandoned.
+            await chunks.close()
+
     async def generate(
         self,
         prompt: str,
         model: str | None = None,
+        stream: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 2048,
-    ) -> str:
+    ) -> str | LLMStream:
         return await self.chat(
             messages=[{"role": "user", "content": prompt}],
             model=model,
+            stream=stream,
             temperature=temperature,
             max_tokens=max_tokens,
         )
@@ -23,11 +23,21 @@ def build_rag_prompt(
     context: str,
     system_prompt: str,
     has_verified_answers: bool = False,
+    history: list[dict] | None = None,
+    history_summary: str = "",
 ) -> list[dict]:
     messages = [
         {"role": "system", "content": system_prompt},
     ]
 
+    if history_summary:
+        messages.append(
+            {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{history_summary}",
+            }
+        )
+
     if context:
         preamble = "Use the following knowledge base context to answer the user's question. Cite sources when applicable."
         if has_verified_answers:
@@ -43,11 +53,28 @@ def build_rag_prompt(
             }
         )
 
+    # Recent turns, oldest first, so follow-up questions keep their context.
+    messages.extend({"role": turn["role"], "content": turn["content"]} for turn in history or [])
     messages.append({"role": "user", "content": query})
 
     return messages
 
 
+def build_summary_prompt(summary: str, turns: list[dict], max_tokens: int) -> list[dict]:
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You maintain a running summary of a support conversation. Merge the new turns into the "
+                "summary. Keep facts, decisions, names, versions and open questions; drop pleasantries. "
+                f"Reply with the updated summary only, in at most {int(max_tokens / 1.3)} words."
+            ),
+        },
+        {"role": "user", "content": f"Summary so far:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"},
+    ]
+
+
 def build_confidence_prompt(query: str, answer: str) -> str:
     return f"""Rate the confidence of the following answer on a scale of 0.0 to 1.0.
 Consider: accuracy, completeness, relevance to the question, and whether the answer is based on provided context.
@@ -0,0 +1,123 @@
+"""Process-wide registry of pooled LLM clients.
+
+One long-lived client per (provider type, base URL, API key) keeps its
+connections alive between generations, so an LLM call no longer pays for
+TCP/TLS setup or leaks the sockets of a client nobody closed. Clients
+belong to the event loop that created them and are closed from the app's
+lifespan hook (``close_llm_clients``). Callers must not close them.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import logging
+
+import httpx
+
+from app.core.config import settings
+from app.services.llm.ollama_client import OllamaClient
+from app.services.llm.ollama_pool import OllamaPool, ollama_urls
+from app.services.llm.openai_client import OpenAICompatibleClient
+
+logger = logging.getLogger(__name__)
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+    )
+
+
+def http2_enabled(base_url: str) -> bool:
+    """HTTP/2 is negotiated over TLS only, and needs the optional ``h2`` package."""
+    return settings.LLM_HTTP2 and base_url.startswith("https://") and importlib.util.find_spec("h2") is not None
+
+
+def client_key(
+    provider_type: str | None,
+    base_url: str | None,
+    api_key: str | None,
+    endpoints: list[str] | None = None,
+) -> tuple[str, str, str]:
+    """Registry key; the API key is hashed so it is never held as a dict key or logged.
+
+    For Ollama the URL part lists every host the client balances across.
+    """
+    provider_type = provider_type or "ollama"
+    if provider_type == "openai_compatible":
+        url = (base_url or "").rstrip("/")
+    else:
+        url = ",".join(ollama_urls(base_url, endpoints))
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest() if api_key else ""
+    return provider_type, url, key_hash
+
+
+class LLMClientRegistry:
+    def __init__(self) -> None:
+        self._clients: dict[tuple[str, str, str], OllamaClient | OllamaPool | OpenAICompatibleClient] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def get(
+        self,
+        provider_type: str | None = None,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        endpoints: list[str] | None = None,
+    ) -> OllamaClient | OllamaPool | OpenAICompatibleClient:
+        """The shared client for a provider; the default Ollama server when called without arguments.
+
+        An Ollama provider with several hosts (or OLLAMA_URLS) gets an OllamaPool.
+        """
+        key = client_key(provider_type, base_url, api_key, endpoints)
+        client = self._clients.get(key)
+        if client is None:
+            if key[0] == "openai_compatible":
+                client = OpenAICompatibleClient(base_url=key[1], api_key=api_key, limits=pool_limits(),
+                                                http2=http2_enabled(key[1]))
+            elif "," in key[1]:
+                client = OllamaPool(key[1].split(","), limits=pool_limits())
+            else:
+                client = OllamaClient(base_url=key[1], limits=pool_limits())
+            self._clients[key] = client
+            logger.info(f"Opened pooled LLM client for {key[0]} at {key[1]}")
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Closing LLM client failed: {e}")
+
+
+_registry: LLMClientRegistry | None = None
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    """Return the process-wide registry for the running event loop."""
+    global _registry
+    loop = asyncio.get_running_loop()
+    if _registry is None or _registry.loop is not loop:
+        _registry = LLMClientRegistry()
+        _registry.loop = loop
+    return _registry
+
+
+def get_llm(
+    provider_type: str | None = None,
+    base_url: str | None = None,
+    api_key: str | None = None,
+    endpoints: list[str] | None = None,
+) -> OllamaClient | OllamaPool | OpenAICompatibleClient:
+    """Shortcut for ``get_llm_registry().get(...)``."""
+    return get_llm_registry().get(provider_type, base_url, api_key, endpoints)
+
+
+async def close_llm_clients() -> None:
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
@@ -0,0 +1,215 @@
+"""Admission control and tenant-fair scheduling of LLM generations.
+
+Every LLM endpoint (an Ollama host or an OpenAI-compatible base URL, or a
+model listed in LLM_CONCURRENCY_OVERRIDES) admits a fixed number of
+generations at a time from this process; the rest wait instead of piling
+onto the model server, so latency stays bounded for the ones running.
+
+Waiting generations are queued per lane and tenant. A freed slot goes to
+the interactive lane (chat, streamed answers, WebSocket) before background
+work (batch runs, sub-agents, conversation summaries); within a lane the
+tenant is picked by smooth weighted round-robin on plan tier, with the
+ingestion scheduler's weights. A generation that finds the queue full, or
+is not admitted within LLM_QUEUE_TIMEOUT_SECONDS, raises LLMOverloadedError.
+
+Limits are per API process: set the caps to a host's capacity divided by
+the number of API workers.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app.core.config import settings
+from app.core.exceptions import LLMOverloadedError
+from app.services.ingestion_scheduler import TIER_WEIGHTS, smooth_wrr
+from app.services.llm.ollama_pool import ollama_urls
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "background")
+_RECENT_WAITS = 500
+
+
+def endpoint_for(
+    provider_type: str | None,
+    base_url: str | None,
+    model: str | None = None,
+    endpoints: list[str] | None = None,
+) -> tuple[str, int]:
+    """The gate a generation queues at, and that gate's concurrency cap.
+
+    Load-balanced Ollama hosts share one gate whose cap is the per-host cap
+    times the number of hosts.
+    """
+    overrides = settings.LLM_CONCURRENCY_OVERRIDES
+    if model and model in overrides:
+        return f"model:{model}", overrides[model]
+    if provider_type == "openai_compatible":
+        url = (base_url or "").rstrip("/")
+        return url, overrides.get(url, settings.LLM_PROVIDER_CONCURRENCY)
+    urls = ollama_urls(base_url, endpoints)
+    return ",".join(urls), sum(overrides.get(url, settings.LLM_OLLAMA_CONCURRENCY) for url in urls)
+
+
+class _Gate:
+    """Slots and waiting generations for one endpoint."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        # lane -> tenant -> waiting futures (FIFO)
+        self.waiting: dict[str, dict[str, deque[asyncio.Future]]] = {lane: {} for lane in LANES}
+        self.tiers: dict[str, str] = {}
+        self.credits: dict[str, dict[str, float]] = {lane: {} for lane in LANES}
+        self.stats = {lane: {"admitted": 0, "rejected": 0, "wait_total": 0.0, "wait_max": 0.0} for lane in LANES}
+        self.recent = {lane: deque(maxlen=_RECENT_WAITS) for lane in LANES}
+
+    def queued(self) -> int:
+        return sum(len(q) for lane in self.waiting.values() for q in lane.values())
+
+    def record(self, lane: str, waited: float) -> None:
+        stats = self.stats[lane]
+        stats["admitted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+        self.recent[lane].append(waited)
+
+    def hand_off(self) -> None:
+        """Give free slots to waiting generations: interactive lane first, tenants by weight."""
+        while self.active < self.limit:
+            lane = next((lane for lane in LANES if self.waiting[lane]), None)
+            if lane is None:
+                return
+            queues = self.waiting[lane]
+            weights = {tenant: TIER_WEIGHTS.get(self.tiers.get(tenant, "free"), 1) for tenant in queues}
+            credits = self.credits[lane]
+            tenant = smooth_wrr(credits, weights)
+            future = queues[tenant].popleft()
+            if not queues[tenant]:
+                # Drained: the tenant leaves the rotation and its credit resets.
+                del queues[tenant]
+                credits.pop(tenant, None)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+
+class LLMScheduler:
+    def __init__(self) -> None:
+        self._gates: dict[str, _Gate] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def _gate(self, endpoint: str, limit: int) -> _Gate:
+        gate = self._gates.get(endpoint)
+        if gate is None:
+            gate = self._gates[endpoint] = _Gate(limit)
+        gate.limit = limit
+        return gate
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        endpoint: tuple[str, int],
+        tenant_id: str | None,
+        plan_tier: str | None = None,
+        lane: str = "interactive",
+        timeout: float | None = None,
+    ):
+        """Hold one of *endpoint*'s generation slots (from ``endpoint_for``) for the block."""
+        name, limit = endpoint
+        gate = self._gate(name, limit)
+        tenant = tenant_id or "-"
+        start = time.monotonic()
+
+        if gate.active < gate.limit and not gate.queued():
+            gate.active += 1
+        elif gate.queued() >= settings.LLM_QUEUE_MAX:
+            gate.stats[lane]["rejected"] += 1
+            raise LLMOverloadedError(f"Too many generations waiting for {name}")
+        else:
+            future = asyncio.get_running_loop().create_future()
+            gate.tiers[tenant] = plan_tier or "free"
+            gate.waiting[lane].setdefault(tenant, deque()).append(future)
+            wait = settings.LLM_QUEUE_TIMEOUT_SECONDS if timeout is None else min(timeout, settings.LLM_QUEUE_TIMEOUT_SECONDS)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+                if future.done():
+                    # Admitted just as we gave up: pass the slot on.
+                    gate.active -= 1
+                    gate.hand_off()
+                else:
+                    future.cancel()
+                    queue = gate.waiting[lane].get(tenant)
+                    if queue is not None and future in queue:
+                        queue.remove(future)
+                        if not queue:
+                            del gate.waiting[lane][tenant]
+                            gate.credits[lane].pop(tenant, None)
+                if isinstance(exc, asyncio.CancelledError):
+                    raise
+                gate.stats[lane]["rejected"] += 1
+                raise LLMOverloadedError(f"No generation slot free at {name} within {wait:.0f}s") from None
+
+        gate.record(lane, time.monotonic() - start)
+        try:
+            yield
+        finally:
+            gate.active -= 1
+            gate.hand_off()
+
+    def stats(self) -> dict:
+        """Per endpoint and lane: slots in use, queue depth, admissions, rejections and queue wait times."""
+        result = {}
+        for name, gate in self._gates.items():
+            lanes = {}
+            for lane in LANES:
+                stats, recent = gate.stats[lane], sorted(gate.recent[lane])
+
+                def percentile(p: float) -> float:
+                    return round(recent[min(len(recent) - 1, int(p * len(recent)))], 3) if recent else 0.0
+
+                lanes[lane] = {
+                    "queued": sum(len(q) for q in gate.waiting[lane].values()),
+                    "admitted": stats["admitted"],
+                    "rejected": stats["rejected"],
+                    "wait_seconds": {
+                        "avg": round(stats["wait_total"] / stats["admitted"], 3) if stats["admitted"] else 0.0,
+                        "max": round(stats["wait_max"], 3),
+                        "p50_recent": percentile(0.5),
+                        "p95_recent": percentile(0.95),
+                    },
+                }
+            result[name] = {"active": gate.active, "limit": gate.limit, "lanes": lanes}
+        return result
+
+
+_scheduler: LLMScheduler | None = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Return the process-wide scheduler for the running event loop."""
+    global _scheduler
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler.loop is not loop:
+        _scheduler = LLMScheduler()
+        _scheduler.loop = loop
+    return _scheduler
+
+
+def llm_slot(
+    provider_type: str | None,
+    base_url: str | None,
+    model: str | None,
+    tenant_id: str | None,
+    plan_tier: str | None = None,
+    lane: str = "interactive",
+    timeout: float | None = None,
+    endpoints: list[str] | None = None,
+):
+    """Shortcut: ``get_llm_scheduler().slot(endpoint_for(...), ...)``."""
+    endpoint = endpoint_for(provider_type, base_url, model, endpoints)
+    return get_llm_scheduler().slot(endpoint, tenant_id, plan_tier, lane, timeout)
@@ -0,0 +1,47 @@
+"""Token streams from any LLM client.
+
+``chat(..., stream=True)`` and ``generate(..., stream=True)`` on every
+client (Ollama, OpenAI-compatible, the Ollama pool) return an
+``LLMStream``: iterate it for text tokens. Once it is exhausted, ``usage``
+holds the token counts the provider reported (None if it reported none).
+Closing a stream early (``aclose()``, leaving ``async with``, or
+cancelling the task iterating it) aborts the upstream HTTP request, so an
+abandoned answer stops using model time.
+"""
+
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class LLMStream:
+    """Async iterator of tokens, over a source that yields tokens and then, optionally, a ``TokenUsage``."""
+
+    def __init__(self, source: AsyncGenerator[str | TokenUsage, None]):
+        self._source = source
+        self.usage: TokenUsage | None = None
+
+    def __aiter__(self) -> "LLMStream":
+        return self
+
+    async def __anext__(self) -> str:
+        while True:
+            item = await self._source.__anext__()
+            if isinstance(item, TokenUsage):
+                self.usage = item
+            else:
+                return item
+
+    async def aclose(self) -> None:
+        await self._source.aclose()
+
+    async def __aenter__(self) -> "LLMStream":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
@@ -0,0 +1,71 @@
+"""Shared MinIO client for knowledge documents and derived artifacts."""
+
+import hashlib
+from functools import lru_cache
+from typing import BinaryIO
+
+from minio import Minio
+
+from app.core.config import settings
+
+KNOWLEDGE_BUCKET = "knowledge-docs"
+
+# Multipart part size for uploads of unknown length (MinIO minimum is 5 MiB).
+# This bounds the memory an upload holds, whatever the file size.
+UPLOAD_PART_SIZE = 10 * 1024 * 1024
+
+
+@lru_cache
+def get_minio_client() -> Minio:
+    """Return the process-wide MinIO client (it is thread-safe and pools connections)."""
+    return Minio(
+        settings.MINIO_ENDPOINT,
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        secure=settings.MINIO_SECURE,
+    )
+
+
+def ensure_buckets(buckets: tuple[str, ...] = (KNOWLEDGE_BUCKET,)) -> None:
+    """Create missing buckets. Called once at startup instead of on every upload."""
+    client = get_minio_client()
+    for bucket in buckets:
+        if not client.bucket_exists(bucket):
+            client.make_bucket(bucket)
+
+
+class HashingReader:
+    """File-like wrapper that SHA-256 hashes and counts bytes as they are read."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self._digest.update(data)
+        self.size += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def put_stream(bucket: str, object_name: str, stream: BinaryIO, content_type: str) -> tuple[int, str]:
+    """Stream *stream* into MinIO as a multipart upload, hashing it on the way.
+
+    Returns ``(size_in_bytes, sha256_hex)``. The stream is rewound first and
+    left positioned at its end.
+    """
+    stream.seek(0)
+    reader = HashingReader(stream)
+    get_minio_client().put_object(
+        bucket,
+        object_name,
+        reader,
+        length=-1,
+        part_size=UPLOAD_PART_SIZE,
+        content_type=content_type,
+    )
+    return reader.size, reader.hexdigest()
@@ -0,0 +1,279 @@
+"""Single-flight coalescing of identical in-flight queries.
+
+During an incident many people in one department ask the same question
+within seconds. The first of them (the leader) runs the query graph; the
+others wait for its final state and then save their own Message/Approval
+rows. Within a process followers await the leader's future; across API
+workers the leader holds a Redis lock and publishes its result. Followers
+only ever see ``SHARED_FIELDS`` of it: never the provider credentials or
+the retrieved context in the leader's graph state. A leader whose graph
+failed (``error`` set) shares nothing, and a follower never waits past its
+own request's ``deadline``: in both cases the follower falls back to
+``compute()``.
+
+Queries only coalesce while the knowledge they would search is unchanged:
+the key includes a per-department version that ingestion, deletes and
+verified answers bump (see ``bump_knowledge_version``).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "query:coalesce"
+_VERSION_PREFIX = "knowledge:version"
+_RESULT_TTL_SECONDS = 30  # covers a follower subscribing just after the leader published
+_STATS_TTL_SECONDS = 30 * 24 * 3600
+
+# What a follower needs from the leader's final state to save and return its answer.
+SHARED_FIELDS = (
+    "answer",
+    "sources",
+    "confidence",
+    "needs_approval",
+    "model_used",
+    "tokens_input",
+    "tokens_output",
+    "latency_ms",
+    "degradations",
+)
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a question, ignoring trailing punctuation."""
+    return " ".join(text.casefold().split()).rstrip("?!. ")
+
+
+def shared_result(state: dict) -> dict:
+    return {field: state[field] for field in SHARED_FIELDS if field in state}
+
+
+def _shareable(result: dict | None) -> dict | None:
+    """*result*, or None when the graph failed: followers then answer on their own."""
+    return None if result is None or result.get("error") else result
+
+
+def coalesce_key(state: dict, knowledge_version: str) -> str:
+    parts = [
+        state["tenant_id"],
+        state["department_id"],
+        normalize_query(state["query"]),
+        state.get("model_name") or "",
+        state.get("provider_base_url") or "",
+        knowledge_version,
+        # Follow-ups only share an answer when they share the conversation so far.
+        json.dumps([state.get("history_summary") or "", state.get("history") or []]),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+async def bump_knowledge_version(department_id: str | None = None) -> None:
+    """Record that a department's searchable knowledge changed (every department when omitted).
+
+    Best-effort: a Redis outage never fails the write that called it.
+    """
+    client = redis.from_url(settings.REDIS_URL)
+    key = f"{_VERSION_PREFIX}:{department_id or 'global'}"
+    try:
+        await client.incr(key)
+    except Exception as exc:
+        logger.warning(f"Could not bump knowledge version {key}: {exc}")
+    finally:
+        await client.aclose()
+
+
+def _until_deadline(state: dict) -> float | None:
+    """Seconds left before *state*'s request deadline (at least 0), or None when it has none."""
+    deadline = state.get("deadline")
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+
+class QueryCoalescer:
+    """Runs at most one graph per identical in-flight query, per process and across workers."""
+
+    def __init__(self, client: redis.Redis, wait_seconds: float):
+        self.redis = client
+        self.wait_seconds = wait_seconds
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._release = self.redis.register_script(_RELEASE)
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    @classmethod
+    def from_settings(cls) -> "QueryCoalescer":
+        return cls(
+            redis.from_url(settings.REDIS_URL, decode_responses=True),
+            settings.QUERY_COALESCE_WAIT_SECONDS,
+        )
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    async def run(self, state: dict, compute: Callable[[], Awaitable[dict]]) -> tuple[dict, str]:
+        """Return ``compute()``'s result, or the ``SHARED_FIELDS`` of an identical query already in flight.
+
+        The second item is this caller's role: ``leader`` (it ran the graph),
+        ``local`` or ``remote`` (it reused another request's result in this
+        process or another worker), ``fallback`` (it waited on another
+        request, which failed or was too slow, then ran the graph itself), or
+        ``bypass`` (Redis unavailable).
+        """
+        try:
+            version = await self._knowledge_version(state["department_id"])
+        except Exception as exc:
+            logger.warning(f"Query coalescing unavailable: {exc}")
+            return await compute(), "bypass"
+
+        key = coalesce_key(state, version)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # None means the leader failed or outlived our deadline; answer on our own.
+            try:
+                result = await asyncio.wait_for(asyncio.shield(pending), _until_deadline(state))
+            except asyncio.TimeoutError:
+                result = None
+            role = "local" if result is not None else "fallback"
+            if result is None:
+                result = await compute()
+            else:
+                result = shared_result(result)
+            await self._count(state["tenant_id"], role)
+            return result, role
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        result = None
+        try:
+            result, role = await self._run_across_workers(key, compute, _until_deadline(state))
+        finally:
+            del self._inflight[key]
+            future.set_result(_shareable(result))
+        await self._count(state["tenant_id"], role)
+        return result, role
+
+    async def _knowledge_version(self, department_id: str) -> str:
+        versions = await self.redis.mget(f"{_VERSION_PREFIX}:global", f"{_VERSION_PREFIX}:{department_id}")
+        return ":".join(v or "0" for v in versions)
+
+    async def _run_across_workers(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict]],
+        until_deadline: float | None,
+    ) -> tuple[dict, str]:
+        lock_key = f"{_PREFIX}:lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            leader = await self.redis.set(lock_key, token, nx=True, px=int(self.wait_seconds * 1000))
+        except Exception as exc:
+            logger.warning(f"Query coalescing across workers unavailable: {exc}")
+            return await compute(), "leader"
+
+        if not leader:
+            wait = self.wait_seconds if until_deadline is None else min(self.wait_seconds, until_deadline)
+            result = await self._wait_for_leader(key, lock_key, wait)
+            if result is not None:
+                return result, "remote"
+            # The leader failed, died or is too slow: answer on our own.
+            return await compute(), "fallback"
+
+        payload = "null"
+        try:
+            result = await compute()
+            if _shareable(result) is not None:
+                payload = json.dumps(shared_result(result), default=str)
+            return result, "leader"
+        finally:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.set(f"{_PREFIX}:result:{key}", payload, ex=_RESULT_TTL_SECONDS)
+                pipe.publish(f"{_PREFIX}:done:{key}", payload)
+                await pipe.execute()
+                await self._release(keys=[lock_key], args=[token])
+            except Exception as exc:
+                logger.warning(f"Could not publish coalesced query result: {exc}")
+
+    async def _wait_for_leader(self, key: str, lock_key: str, wait: float) -> dict | None:
+        result_key = f"{_PREFIX}:result:{key}"
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(f"{_PREFIX}:done:{key}")
+            # The leader may have published before we subscribed.
+            cached = await self.redis.get(result_key)
+            if cached is not None:
+                return json.loads(cached)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            while (remaining := deadline - loop.time()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1.0))
+                if message is not None:
+                    return json.loads(message["data"])
+                if not await self.redis.exists(lock_key):
+                    cached = await self.redis.get(result_key)
+                    return json.loads(cached) if cached is not None else None
+            return None
+        except Exception as exc:
+            logger.warning(f"Waiting for a coalesced query failed: {exc}")
+            return None
+        finally:
+            await pubsub.aclose()
+
+    async def _count(self, tenant_id: str, role: str) -> None:
+        key = f"{_PREFIX}:stats:{tenant_id}"
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(key, "queries", 1)
+            pipe.hincrby(key, role, 1)
+            pipe.expire(key, _STATS_TTL_SECONDS)
+            await pipe.execute()
+        except Exception as exc:
+            logger.warning(f"Could not record query coalescing stats: {exc}")
+
+    async def tenant_stats(self, tenant_id: str) -> dict:
+        """How many of the tenant's queries reused another query's answer."""
+        data = await self.redis.hgetall(f"{_PREFIX}:stats:{tenant_id}")
+        roles = ("queries", "leader", "local", "remote", "fallback", "bypass")
+        counts = {field: int(data.get(field, 0)) for field in roles}
+        coalesced = counts["local"] + counts["remote"]
+        return {
+            **counts,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / counts["queries"], 4) if counts["queries"] else 0.0,
+        }
+
+
+_coalescer: QueryCoalescer | None = None
+
+
+def get_query_coalescer() -> QueryCoalescer:
+    """Return the process-wide coalescer for the running event loop."""
+    global _coalescer
+    loop = asyncio.get_running_loop()
+    if _coalescer is None or _coalescer.loop is not loop:
+        _coalescer = QueryCoalescer.from_settings()
+        _coalescer.loop = loop
+    return _coalescer
+
+
+async def close_query_coalescer() -> None:
+    global _coalescer
+    if _coalescer is not None:
+        await _coalescer.close()
+        _coalescer = None
@@ -1,17 +1,47 @@
-from uuid import UUID
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from uuid import UUID, uuid4
 
-from sqlalchemy import select
+from sqlalchemy import func, inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, make_transient_to_detached
 
-from app.agents.graph import QueryState, create_query_graph
+from app.agents.graph import QueryState, confidence_check, get_query_deps, get_query_graph, sources_only
 from app.core.config import settings
 from app.core.exceptions import NotFoundError
+from app.db.session import SessionLocal
 from app.models.allowed_model import AllowedModel
 from app.models.approval import Approval
 from app.models.conversation import Conversation, Message
 from app.models.department import Department
+from app.models.tenant import Tenant
+from app.services.conversation_memory import load_memory, schedule_summary_refresh
+from app.services.query_coalescer import get_query_coalescer
+
+logger = logging.getLogger(__name__)
+
+# Streamed answers whose client went away; kept referenced until they are saved.
+_answer_tasks: set[asyncio.Task] = set()
+
+# Per-process lookups, trusted for QUERY_LOOKUP_CACHE_SECONDS: (monotonic time, value).
+_department_cache: dict[UUID, tuple[float, dict]] = {}
+_provider_cache: dict[tuple[UUID, str], tuple[float, dict]] = {}
+_plan_tier_cache: dict[UUID, tuple[float, str]] = {}
+
+
+def _cached(cache: dict, key):
+    entry = cache.get(key)
+    if entry and time.monotonic() - entry[0] < settings.QUERY_LOOKUP_CACHE_SECONDS:
+        return entry[1]
+    return None
+
+
+def forget_department(department_id: UUID) -> None:
+    """Drop a department's cached lookup after it is edited or deleted (this process only)."""
+    _department_cache.pop(department_id, None)
 
 
 class QueryService:
@@ -27,58 +57,99 @@ class QueryService:
         conversation_id: UUID | None = None,
         image_path: str | None = None,
         model_name: str | None = None,
+        timeout: float | None = None,
     ) -> dict:
-        # Get department config
-        stmt = select(Department).where(
-            Department.id == department_id,
-            Department.deleted_at.is_(None),
+        conversation, initial_state = await self.prepare_query(
+            tenant_id, department_id, user_id, query_text, conversation_id, image_path, model_name, timeout
         )
-        result = await self.db.execute(stmt)
-        department = result.scalar_one_or_none()
-        if not department:
-            raise NotFoundError(f"Department {department_id} not found")
+        final_state = await self._run_graph(initial_state)
+        return await self._save_answer(conversation, final_state)
+
+    async def prepare_query(
+        self,
+        tenant_id: UUID,
+        department_id: UUID,
+        user_id: UUID,
+        query_text: str,
+        conversation_id: UUID | None = None,
+        image_path: str | None = None,
+        model_name: str | None = None,
+        timeout: float | None = None,
+    ) -> tuple[Conversation, QueryState]:
+        """Validate the request and build the graph input. Nothing is written yet.
+
+        Returns the conversation to answer in: a new, unsaved one, or a
+        detached stand-in for an existing one. ``_save_answer`` writes it with
+        both messages and the approval in a single flush.
+
+        The answer is due *timeout* seconds from now, else after the
+        department's ``deadline_seconds`` or QUERY_DEADLINE_SECONDS, capped at
+        QUERY_DEADLINE_MAX_SECONDS.
+        """
+        department = await self.get_department(department_id)
 
-        # Get or create conversation
+        memory = {}
         if conversation_id:
-            conv_stmt = select(Conversation).where(
-                Conversation.id == conversation_id,
-                Conversation.tenant_id == tenant_id,
-            )
-            conv_result = await self.db.execute(conv_stmt)
-            conversation = conv_result.scalar_one_or_none()
-            if not conversation:
-                raise NotFoundError(f"Conversation {conversation_id} not found")
+            memory = await load_memory(self.db, conversation_id, tenant_id)
+            conversation = Conversation(id=conversation_id)
+            make_transient_to_detached(conversation)
         else:
             conversation = Conversation(
+                id=uuid4(),
                 tenant_id=tenant_id,
                 department_id=department_id,
                 user_id=user_id,
                 title=query_text[:100],
                 status="active",
+                message_count=2,
+                last_message_at=func.now(),
             )
-            self.db.add(conversation)
-            await self.db.flush()
 
-        # Save user message
-        user_msg = Message(
-            conversation_id=conversation.id,
-            tenant_id=tenant_id,
-            department_id=department_id,
-            user_id=user_id,
-            role="user",
-            content=query_text,
-            image_path=image_path,
-            status="completed",
+        provider = await self.resolve_provider(tenant_id, model_name)
+        initial_state = self.build_state(
+            department, provider, tenant_id, user_id, query_text, image_path, await self.get_plan_tier(tenant_id)
         )
-        self.db.add(user_msg)
-        await self.db.flush()
+        seconds = timeout or department["config"].get("deadline_seconds") or settings.QUERY_DEADLINE_SECONDS
+        deadline = time.time() + min(float(seconds), settings.QUERY_DEADLINE_MAX_SECONDS)
+        return conversation, {**initial_state, **memory, "deadline": deadline}
+
+    async def get_department(self, department_id: UUID) -> dict:
+        """The department's ID and config; cached per process for QUERY_LOOKUP_CACHE_SECONDS."""
+        department = _cached(_department_cache, department_id)
+        if department is not None:
+            return department
+        stmt = select(Department.id, Department.config).where(
+            Department.id == department_id,
+            Department.deleted_at.is_(None),
+        )
+        row = (await self.db.execute(stmt)).one_or_none()
+        if not row:
+            raise NotFoundError(f"Department {department_id} not found")
+        department = {"id": row.id, "config": row.config or {}}
+        _department_cache[department_id] = (time.monotonic(), department)
+        return department
 
-        # Look up provider config for the selected model
-        provider_type = None
-        provider_base_url = None
-        provider_api_key = None
-        effective_model = model_name or settings.OLLAMA_MODEL
+    async def get_plan_tier(self, tenant_id: UUID) -> str:
+        """The tenant's plan tier, which weights its share of the LLM; cached like departments."""
+        tier = _cached(_plan_tier_cache, tenant_id)
+        if tier is None:
+            tier = await self.db.scalar(select(Tenant.plan_tier).where(Tenant.id == tenant_id)) or "free"
+            _plan_tier_cache[tenant_id] = (time.monotonic(), tier)
+        return tier
 
+    async def resolve_provider(self, tenant_id: UUID, model_name: str | None) -> dict:
+        """The model to answer with and, for a tenant-configured model, its provider."""
+        if model_name:
+            cached = _cached(_provider_cache, (tenant_id, model_name))
+            if cached is not None:
+                return cached
+        provider = {
+            "model_name": model_name or settings.OLLAMA_MODEL,
+            "provider_type": None,
+            "provider_base_url": None,
+            "provider_api_key": None,
+            "provider_endpoints": [],
+        }
         if model_name:
             allowed_result = await self.db.execute(
                 select(AllowedModel)
@@ -90,24 +161,43 @@ class QueryService:
             )
             allowed = allowed_result.scalar_one_or_none()
             if allowed and allowed.provider:
-                provider_type = allowed.provider.provider_type
-                provider_base_url = allowed.provider.base_url
-                provider_api_key = allowed.provider.api_key
+                provider["provider_type"] = allowed.provider.provider_type
+                provider["provider_base_url"] = allowed.provider.base_url
+                provider["provider_api_key"] = allowed.provider.api_key
+                provider["provider_endpoints"] = allowed.provider.endpoints or []
+            _provider_cache[(tenant_id, model_name)] = (time.monotonic(), provider)
+        return provider
 
-        # Run LangGraph orchestrator
-        initial_state: QueryState = {
+    @staticmethod
+    def build_state(
+        department: dict,
+        provider: dict,
+        tenant_id: UUID,
+        user_id: UUID,
+        query_text: str,
+        image_path: str | None = None,
+        plan_tier: str = "free",
+    ) -> QueryState:
+        """The graph input for one question."""
+        return {
             "query": query_text,
-            "department_id": str(department_id),
+            "department_id": str(department["id"]),
             "tenant_id": str(tenant_id),
             "user_id": str(user_id),
             "image_path": image_path,
-            "department_config": department.config or {},
-            "model_name": effective_model,
-            "confidence_threshold": department.config.get("confidence_threshold", 0.85) if department.config else 0.85,
-            "system_prompt": department.config.get("system_prompt", "") if department.config else "",
-            "provider_type": provider_type,
-            "provider_base_url": provider_base_url,
-            "provider_api_key": provider_api_key,
+            "department_config": department["config"],
+            "model_name": provider["model_name"],
+            "confidence_threshold": department["config"].get("confidence_threshold", 0.85),
+            "system_prompt": department["config"].get("system_prompt", ""),
+            "provider_type": provider["provider_type"],
+            "provider_base_url": provider["provider_base_url"],
+            "provider_api_key": provider["provider_api_key"],
+            "provider_endpoints": provider["provider_endpoints"],
+            "plan_tier": plan_tier,
+            "history": [],
+            "history_summary": "",
+            "deadline": None,
+            "degradations": [],
             "rag_results": [],
             "context": "",
             "answer": "",
@@ -122,22 +212,79 @@ class QueryService:
             "error": None,
         }
 
-        try:
-            graph = create_query_graph()
-            final_state = graph.invoke(initial_state)
-        except Exception as e:
-            final_state = {
-                **initial_state,
-                "answer": f"I apologize, but I encountered an error: {e}",
-                "confidence": 0.0,
-                "needs_approval": False,
-                "error": str(e),
-            }
-
-        # Save AI message
+    async def _run_graph(
+        self,
+        initial_state: QueryState,
+        emit: Callable[[str, dict], Awaitable[None]] | None = None,
+    ) -> dict:
+        async def run() -> dict:
+            deadline = initial_state.get("deadline")
+            if deadline is not None and deadline <= time.time():
+                # Spent the whole deadline waiting on an identical query that never answered.
+                final_state = {**initial_state, **sources_only(initial_state, [])}
+                final_state.update(await confidence_check(final_state))
+                if emit is not None:
+                    await emit("token", {"content": final_state["answer"]})
+                return final_state
+
+            configurable = {"deps": get_query_deps()}
+            if emit is not None:
+                configurable["emit"] = emit
+            try:
+                return await get_query_graph().ainvoke(initial_state, config={"configurable": configurable})
+            except Exception as e:
+                return {
+                    **initial_state,
+                    "answer": f"I apologize, but I encountered an error: {e}",
+                    "confidence": 0.0,
+                    "needs_approval": False,
+                    "error": str(e),
+                }
+
+        # Screenshots are per user; everything else may share an identical in-flight query.
+        if not settings.QUERY_COALESCE_ENABLED or initial_state.get("image_path"):
+            return await run()
+
+        final_state, role = await get_query_coalescer().run(initial_state, run)
+        if role in ("local", "remote"):
+            # Only the answer fields are shared; the rest is this request's own.
+            final_state = {**initial_state, **final_state}
+            if emit is not None:
+                await emit("sources", {"sources": final_state.get("sources", [])})
+                await emit("token", {"content": final_state.get("answer", "")})
+        return final_state
+
+    async def _save_answer(self, conversation: Conversation, final_state: dict) -> dict:
+        """Persist the exchange in one flush; return the API response.
+
+        The conversation (insert, or message count update), the user and
+        assistant messages and the approval are all built in memory first.
+        """
+        tenant_id = UUID(final_state["tenant_id"])
+        department_id = UUID(final_state["department_id"])
+        user_id = UUID(final_state["user_id"])
+
+        existing = inspect(conversation).detached
+        self.db.add(conversation)
+        if existing:
+            # Issued as a single UPDATE; the row is never loaded.
+            conversation.message_count = Conversation.message_count + 2
+            conversation.last_message_at = func.now()
+
+        user_msg = Message(
+            conversation=conversation,
+            tenant_id=tenant_id,
+            department_id=department_id,
+            user_id=user_id,
+            role="user",
+            content=final_state["query"],
+            image_path=final_state.get("image_path"),
+            status="completed",
+        )
+
         status = "pending_approval" if final_state.get("needs_approval") else "completed"
         ai_msg = Message(
-            conversation_id=conversation.id,
+            conversation=conversation,
             tenant_id=tenant_id,
             department_id=department_id,
             role="assistant",
@@ -150,29 +297,25 @@ class QueryService:
             sources={"items": final_state.get("sources", [])},
             status=status,
         )
-        self.db.add(ai_msg)
-        await self.db.flush()
-
-        # Update conversation
-        conversation.message_count = (conversation.message_count or 0) + 2
-        from sqlalchemy import func
-        conversation.last_message_at = func.now()
-        await self.db.flush()
 
         # Always create approval record so user can provide feedback
         approval_status = "pending" if final_state.get("needs_approval") else "auto_approved"
         approval = Approval(
             tenant_id=tenant_id,
             department_id=department_id,
-            message_id=ai_msg.id,
+            message=ai_msg,
             requested_by=user_id,
             status=approval_status,
             original_answer=final_state.get("answer", ""),
             priority="normal" if final_state.get("needs_approval") else "low",
         )
-        self.db.add(approval)
+        self.db.add_all([user_msg, ai_msg, approval])
         await self.db.flush()
         approval_id = str(approval.id)
+        if existing:
+            # Turns that no longer fit the memory budget are folded in the background. Ones
+            # not yet committed when it runs are picked up after the next answer.
+            schedule_summary_refresh(conversation.id)
 
         return {
             "answer": final_state.get("answer", ""),
@@ -182,12 +325,50 @@ class QueryService:
             "tokens_input": final_state.get("tokens_input", 0),
             "tokens_output": final_state.get("tokens_output", 0),
             "latency_ms": final_state.get("latency_ms", 0.0),
+            "degradations": final_state.get("degradations") or [],
             "conversation_id": conversation.id,
             "message_id": ai_msg.id,
             "needs_approval": final_state.get("needs_approval", False),
             "approval_id": approval_id,
         }
 
+    async def stream_query(self, conversation: Conversation, initial_state: QueryState) -> AsyncIterator[tuple[str, dict]]:
+        """Run a prepared query, yielding ``(event, data)`` as the graph progresses.
+
+        Events are ``sources``, then ``token`` (one per LLM chunk), then ``done``
+        with the same payload ``execute_query`` returns, or ``error``. The answer
+        is generated and saved in its own session and task: the request's
+        session is closed before a streaming body starts, and a client that
+        disconnects mid-answer still gets the conversation saved.
+        """
+        queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue()
+
+        async def emit(event: str, data: dict) -> None:
+            queue.put_nowait((event, data))
+
+        async def answer() -> None:
+            try:
+                async with SessionLocal() as db:
+                    service = QueryService(db)
+                    final_state = await service._run_graph(initial_state, emit)
+                    result = await service._save_answer(conversation, final_state)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Streaming query failed for conversation {conversation.id}: {e}", exc_info=True)
+                queue.put_nowait(("error", {"detail": str(e)}))
+            else:
+                queue.put_nowait(("done", result))
+
+        task = asyncio.create_task(answer())
+        _answer_tasks.add(task)
+        task.add_done_callback(_answer_tasks.discard)
+
+        while True:
+            event, data = await queue.get()
+            yield event, data
+            if event in ("done", "error"):
+                return
+
     async def get_conversation_history(
         self,
         conversation_id: UUID,
@@ -196,7 +377,8 @@ class QueryService:
         stmt = (
             select(Message)
             .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
+            # Both messages of an exchange share created_at; the user's is added first.
+            .order_by(Message.created_at.asc(), Message.id.asc())
             .limit(limit)
         )
         result = await self.db.execute(stmt)
@@ -0,0 +1,119 @@
+"""
+Bulk writer for ``knowledge_chunks`` rows.
+
+Adding one ``KnowledgeChunk`` ORM object per chunk costs identity-map and
+unit-of-work bookkeeping for every row. :class:`ChunkWriter` skips the ORM:
+rows are buffered as plain tuples and written ``batch_size`` at a time with
+PostgreSQL ``COPY`` (asyncpg ``copy_records_to_table``) or, on other
+drivers, a Core multi-row ``INSERT``. It writes on the session's own
+connection, so the rows commit or roll back with the rest of the
+transaction -- from an API request or a Celery task alike.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from uuid import UUID, uuid4
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.knowledge import KnowledgeChunk
+
+_TABLE = KnowledgeChunk.__table__
+_COLUMNS = (
+    "id",
+    "document_id",
+    "tenant_id",
+    "department_id",
+    "chunk_index",
+    "content",
+    "qdrant_point_id",
+    "token_count",
+    "metadata",
+)
+
+
+class ChunkWriter:
+    """Buffer chunk rows and write them in fixed-size batches."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        batch_size: int | None = None,
+        method: str | None = None,
+    ):
+        self.db = db
+        self.batch_size = batch_size or settings.CHUNK_WRITE_BATCH_SIZE
+        self.method = method or settings.CHUNK_WRITE_METHOD
+        self.written = 0
+        self._buffer: list[tuple] = []
+
+    async def add(
+        self,
+        document_id: UUID,
+        tenant_id: UUID,
+        department_id: UUID,
+        chunk_index: int,
+        content: str,
+        qdrant_point_id: str | None,
+        token_count: int = 0,
+        metadata: dict | None = None,
+    ) -> None:
+        """Queue one row; a full batch is written immediately."""
+        self._buffer.append(
+            (
+                uuid4(),
+                document_id,
+                tenant_id,
+                department_id,
+                chunk_index,
+                content,
+                qdrant_point_id,
+                token_count,
+                metadata or {},
+            )
+        )
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def write(self, rows: Iterable[dict]) -> int:
+        """Add every row (keyword arguments of :meth:`add`) and flush. Returns rows written."""
+        before = self.written
+        for row in rows:
+            await self.add(**row)
+        await self.flush()
+        return self.written - before
+
+    async def flush(self) -> None:
+        """Write whatever is buffered."""
+        while self._buffer:
+            batch = self._buffer[: self.batch_size]
+            del self._buffer[: self.batch_size]
+            if self._use_copy():
+                await self._copy(batch)
+            else:
+                await self._insert(batch)
+            self.written += len(batch)
+
+    def _use_copy(self) -> bool:
+        if self.method == "insert":
+            return False
+        return self.db.get_bind().dialect.driver == "asyncpg"
+
+    async def _copy(self, batch: list[tuple]) -> None:
+        connection = await self.db.connection()
+        raw = await connection.get_raw_connection()
+        # SQLAlchemy's asyncpg jsonb codec takes already-serialised text.
+        records = [(*row[:-1], json.dumps(row[-1])) for row in batch]
+        await raw.driver_connection.copy_records_to_table(
+            _TABLE.name, records=records, columns=_COLUMNS
+        )
+        logger.debug("COPY {} rows into {}", len(batch), _TABLE.name)
+
+    async def _insert(self, batch: list[tuple]) -> None:
+        # Core executemany with the column keys, not the ORM attribute names.
+        await self.db.execute(insert(_TABLE), [dict(zip(_COLUMNS, row)) for row in batch])
@@ -10,10 +10,15 @@ from __future__ import annotations
 
 import re
 import textwrap
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
 from loguru import logger
 
+if TYPE_CHECKING:
+    from app.services.rag.extractor import ExtractedSection
+
 
 # Rough token estimator: 1 token ~ 4 characters for English text.
 _CHARS_PER_TOKEN = 4
@@ -89,29 +94,57 @@ class TextChunker:
             - token_count: estimated token count
             - metadata: copy of caller-supplied metadata with chunk info merged
         """
-        metadata = metadata or {}
         chunks = self.chunk_text(text)
-        result: list[dict] = []
+        return self._enrich([(content, {}) for content in chunks], metadata or {})
 
-        for idx, content in enumerate(chunks):
-            token_count = max(1, len(content) // _CHARS_PER_TOKEN)
-            chunk_meta = {
-                **metadata,
-                "chunk_index": idx,
-                "token_count": token_count,
-                "total_chunks": len(chunks),
-            }
-            result.append(
-                {
-                    "content": content,
-                    "chunk_index": idx,
-                    "token_count": token_count,
-                    "metadata": chunk_meta,
-                }
-            )
+    def chunk_sections(
+        self,
+        sections: Iterable[ExtractedSection],
+        metadata: dict | None = None,
+    ) -> list[dict]:
+        """
+        Chunk a stream of extracted sections (e.g. PDF pages).
+
+        Chunks never span two sections, and each chunk's metadata carries the
+        metadata of the section it came from (such as ``page_number``).
+        Indices are numbered continuously across sections.
+        """
+        chunks = list(self.iter_chunks(sections, metadata))
+        for chunk in chunks:
+            chunk["metadata"]["total_chunks"] = len(chunks)
+        return chunks
+
+    def iter_chunks(
+        self,
+        sections: Iterable[ExtractedSection],
+        metadata: dict | None = None,
+    ) -> Iterator[dict]:
+        """Lazy :meth:`chunk_sections`, minus ``total_chunks`` (unknown until the end)."""
+        idx = 0
+        for section in sections:
+            for content in self.chunk_text(section.text):
+                yield self._make_chunk(idx, content, {**(metadata or {}), **section.metadata})
+                idx += 1
+
+    def _enrich(self, pieces: list[tuple[str, dict]], metadata: dict) -> list[dict]:
+        result: list[dict] = []
+        for idx, (content, section_meta) in enumerate(pieces):
+            chunk = self._make_chunk(idx, content, {**metadata, **section_meta})
+            chunk["metadata"]["total_chunks"] = len(pieces)
+            result.append(chunk)
 
         return result
 
+    @staticmethod
+    def _make_chunk(idx: int, content: str, metadata: dict) -> dict:
+        token_count = max(1, len(content) // _CHARS_PER_TOKEN)
+        return {
+            "content": content,
+            "chunk_index": idx,
+            "token_count": token_count,
+            "metadata": {**metadata, "chunk_index": idx, "token_count": token_count},
+        }
+
     # ------------------------------------------------------------------
     # Recursive splitter
     # ------------------------------------------------------------------
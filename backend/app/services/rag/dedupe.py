@@ -0,0 +1,274 @@
+"""
+Near-duplicate chunk detection with MinHash signatures and banded LSH.
+
+Each chunk gets a MinHash signature over its word shingles. The signature
+is cut into ``bands`` bands of ``rows`` values; two chunks whose estimated
+Jaccard similarity is above the threshold very likely share at least one
+identical band, so a band lookup finds the candidates and the full
+signatures confirm them.
+
+The index is per department and lives in Redis so it survives restarts
+and is shared by every ingestion worker:
+
+    dedup:<department_id>:band:<i>   hash  band digest -> canonical point ID
+    dedup:<department_id>:sig        hash  point ID    -> signature bytes
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from loguru import logger
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=8)
+def _permutations(num_perm: int, seed: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint is closest to *threshold*."""
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        gap = abs((1 / bands) ** (1 / rows) - threshold)
+        if gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+class MinHasher:
+    """MinHash signatures of word ``shingle_size``-grams."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a, self._b = _permutations(num_perm)
+
+    def shingles(self, text: str) -> set[str]:
+        words = _WORD_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(words) <= k:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i : i + k]) for i in range(len(words) - k + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self.shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # (a * h + b) mod p, truncated to 32 bits; min over shingles per permutation.
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+@dataclass
+class DedupeResult:
+    canonical_id: str | None  # point ID this chunk duplicates, or None if it is new
+    similarity: float = 0.0
+
+
+class DedupeIndex:
+    """Persistent per-department LSH index of chunk signatures.
+
+    *client* is a synchronous Redis client created with ``decode_responses=False``.
+    """
+
+    def __init__(self, client, department_id: str, threshold: float, hasher: MinHasher):
+        self.redis = client
+        self.department_id = department_id
+        self.threshold = threshold
+        self.hasher = hasher
+        self.bands, self.rows = lsh_params(threshold, hasher.num_perm)
+
+    def _band_key(self, band: int) -> str:
+        return f"dedup:{self.department_id}:band:{band}"
+
+    @property
+    def _sig_key(self) -> str:
+        return f"dedup:{self.department_id}:sig"
+
+    def band_digests(self, signature: np.ndarray) -> list[str]:
+        digests = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows : (band + 1) * self.rows]
+            digests.append(hashlib.blake2b(chunk.tobytes(), digest_size=12).hexdigest())
+        return digests
+
+    def lookup(
+        self,
+        point_id: str,
+        signature: np.ndarray,
+        digests: list[str],
+        local: dict[str, np.ndarray] | None = None,
+    ) -> DedupeResult:
+        """The most similar indexed canonical above the threshold, if any.
+
+        *local* adds candidates (point ID -> signature) not in Redis yet.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for band, digest in enumerate(digests):
+            pipe.hget(self._band_key(band), digest)
+        candidates = {c.decode() for c in pipe.execute() if c} - {point_id}
+
+        signatures = {pid: sig for pid, sig in (local or {}).items() if pid != point_id}
+        remote = sorted(candidates - signatures.keys())
+        if remote:
+            for candidate, raw in zip(remote, self.redis.hmget(self._sig_key, remote)):
+                if raw is not None:
+                    signatures[candidate] = np.frombuffer(raw, dtype=np.uint64)
+
+        best = DedupeResult(None)
+        for candidate in sorted(signatures):
+            similarity = MinHasher.jaccard(signature, signatures[candidate])
+            if similarity >= self.threshold and similarity > best.similarity:
+                best = DedupeResult(candidate, similarity)
+        return best
+
+    def add(self, entries: list[tuple[str, np.ndarray]]) -> None:
+        """Index (point ID, signature) pairs as canonicals."""
+        pipe = self.redis.pipeline(transaction=False)
+        for point_id, signature in entries:
+            for band, digest in enumerate(self.band_digests(signature)):
+                pipe.hsetnx(self._band_key(band), digest, point_id)
+            pipe.hset(self._sig_key, point_id, signature.tobytes())
+        pipe.execute()
+
+    def check_and_add(self, point_id: str, text: str) -> DedupeResult:
+        """Return the canonical point *text* nearly duplicates, or index it as a new canonical."""
+        signature = self.hasher.signature(text)
+        result = self.lookup(point_id, signature, self.band_digests(signature))
+        if result.canonical_id is None:
+            self.add([(point_id, signature)])
+        return result
+
+    def remove(self, point_ids: list[str]) -> None:
+        """Drop canonical points (e.g. of a deleted document) from the index."""
+        if not point_ids:
+            return
+        raw_signatures = self.redis.hmget(self._sig_key, point_ids)
+        pipe = self.redis.pipeline(transaction=False)
+        for point_id, raw in zip(point_ids, raw_signatures):
+            if raw is None:
+                continue
+            for band, digest in enumerate(self.band_digests(np.frombuffer(raw, dtype=np.uint64))):
+                band_key = self._band_key(band)
+                # Only entries this point owns; another point may hold the bucket.
+                pipe.eval(
+                    "if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then "
+                    "return redis.call('HDEL', KEYS[1], ARGV[1]) end return 0",
+                    1, band_key, digest, point_id,
+                )
+            pipe.hdel(self._sig_key, point_id)
+        pipe.execute()
+        logger.debug("Removed {} points from dedupe index of {}", len(point_ids), self.department_id)
+
+
+class ChunkDeduper:
+    """Ingestion-side wrapper: honours DEDUP_MODE and fails open if Redis is unavailable.
+
+    A chunk that ``check`` finds to be new only becomes a canonical for other
+    documents once ``register`` records it, which ingestion does after its
+    vector is stored; until then it is matched within this run only. A
+    failed run therefore never leaves the index pointing at missing vectors.
+    """
+
+    def __init__(self, index: DedupeIndex | None, mode: str):
+        self.index = index
+        self.mode = mode if index is not None else "off"
+        self._available = True
+        self._lock = threading.Lock()  # check and register run in different worker threads
+        self._signatures: dict[str, np.ndarray] = {}  # canonicals found by this run
+        self._bands: dict[tuple[int, str], str] = {}
+        self._unregistered: set[str] = set()
+
+    @classmethod
+    def for_department(cls, department_id: str) -> "ChunkDeduper":
+        from app.core.config import settings
+
+        if settings.DEDUP_MODE == "off":
+            return cls(None, "off")
+        import redis
+
+        client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=False)
+        hasher = MinHasher(settings.DEDUP_NUM_PERM, settings.DEDUP_SHINGLE_SIZE)
+        return cls(DedupeIndex(client, department_id, settings.DEDUP_THRESHOLD, hasher), settings.DEDUP_MODE)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self._available
+
+    def check(self, point_id: str, text: str) -> str | None:
+        """Canonical point ID that *text* duplicates, else None (and *point_id* is a new canonical)."""
+        if not self.enabled:
+            return None
+        signature = self.index.hasher.signature(text)
+        digests = self.index.band_digests(signature)
+        with self._lock:
+            local = {self._bands[key] for key in enumerate(digests) if key in self._bands}
+            local = {pid: self._signatures[pid] for pid in local}
+        try:
+            canonical_id = self.index.lookup(point_id, signature, digests, local).canonical_id
+        except Exception as exc:
+            logger.warning("Dedupe index unavailable ({}), indexing without it", exc)
+            self._available = False
+            return None
+        if canonical_id is None:
+            with self._lock:
+                self._signatures[point_id] = signature
+                for key in enumerate(digests):
+                    self._bands.setdefault(key, point_id)
+                self._unregistered.add(point_id)
+        return canonical_id
+
+    def register(self, point_ids: list[str]) -> None:
+        """Index the new canonicals among *point_ids* now that their vectors are stored."""
+        with self._lock:
+            entries = [(pid, self._signatures[pid]) for pid in point_ids if pid in self._unregistered]
+            self._unregistered.difference_update(pid for pid, _ in entries)
+        if not entries or not self.enabled:
+            return
+        try:
+            self.index.add(entries)
+        except Exception as exc:
+            logger.warning("Dedupe index unavailable ({}), indexing without it", exc)
+            self._available = False
+
+    def add(self, point_id: str, text: str) -> None:
+        """Index an existing point as a canonical, e.g. a promoted duplicate."""
+        if not self.enabled:
+            return
+        try:
+            self.index.add([(point_id, self.index.hasher.signature(text))])
+        except Exception as exc:
+            logger.warning("Could not add point to dedupe index: {}", exc)
+
+    def forget(self, point_ids: list[str]) -> None:
+        if self.index is None:
+            return
+        try:
+            self.index.remove(point_ids)
+        except Exception as exc:
+            logger.warning("Could not remove points from dedupe index: {}", exc)
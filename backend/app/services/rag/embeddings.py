@@ -3,7 +3,11 @@ Embedding service using sentence-transformers with BGE-large-en-v1.5.
 
 Provides text-to-vector conversion for the RAG pipeline.
 Lazy-loads the model on first call and falls back to random vectors
-when the model is unavailable (e.g. in dev without GPU).
+when the model is unavailable (e.g. in dev without GPU). Other models can
+be named explicitly; a re-index job builds a collection with one while
+queries keep using the model of the live collection. The fallback is per
+model, and a re-index job disables it: a model that fails to load fails
+the job instead of filling a collection with noise.
 """
 
 import random
@@ -20,11 +24,18 @@ class EmbeddingService:
     """Singleton-style embedding service with lazy model loading."""
 
     _instance: ClassVar["EmbeddingService | None"] = None
-    _model: ClassVar[object | None] = None
-    _fallback: ClassVar[bool] = False
+    _models: ClassVar[dict[str, object]] = {}  # model name -> loaded model, shared per process
+    _fallback: ClassVar[set[str]] = set()  # models that failed to load and embed randomly
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, model_name: str | None = None, allow_fallback: bool = True) -> None:
+        self.model_name = model_name or EMBEDDING_MODEL
+        self.allow_fallback = allow_fallback
+        # The instruction prefix is specific to the BGE family.
+        self.query_prefix = QUERY_PREFIX if "bge" in self.model_name.lower() else ""
+
+    @property
+    def _model(self) -> object | None:
+        return self.__class__._models.get(self.model_name)
 
     # ------------------------------------------------------------------
     # Factory
@@ -40,24 +51,32 @@ class EmbeddingService:
     # ------------------------------------------------------------------
     def _load_model(self) -> None:
         """Load the SentenceTransformer model (once)."""
-        if self.__class__._model is not None or self.__class__._fallback:
+        if self._model is not None:
+            return
+        if self.is_fallback:
+            if not self.allow_fallback:
+                raise RuntimeError(f"Embedding model {self.model_name} could not be loaded")
             return
 
         try:
             from sentence_transformers import SentenceTransformer  # type: ignore[import-untyped]
 
-            logger.info("Loading embedding model: {}", EMBEDDING_MODEL)
-            self.__class__._model = SentenceTransformer(EMBEDDING_MODEL)
+            logger.info("Loading embedding model: {}", self.model_name)
+            model = SentenceTransformer(self.model_name)
+            self.__class__._models[self.model_name] = model
             logger.info(
                 "Embedding model loaded (dim={})",
-                self.__class__._model.get_sentence_embedding_dimension(),
+                model.get_sentence_embedding_dimension(),
             )
         except Exception as exc:
+            if not self.allow_fallback:
+                raise RuntimeError(f"Could not load embedding model {self.model_name}: {exc}") from exc
             logger.warning(
-                "Could not load embedding model ({}). Falling back to random vectors for dev.",
+                "Could not load embedding model {} ({}). Falling back to random vectors for dev.",
+                self.model_name,
                 exc,
             )
-            self.__class__._fallback = True
+            self.__class__._fallback.add(self.model_name)
 
     # ------------------------------------------------------------------
     # Public API
@@ -66,22 +85,22 @@ class EmbeddingService:
         """Embed a single text string and return a vector of floats."""
         self._load_model()
 
-        if self.__class__._fallback:
+        if self.is_fallback:
             return self._random_vector()
 
-        prefixed = f"{QUERY_PREFIX}{text}"
-        vector = self.__class__._model.encode(prefixed, normalize_embeddings=True)
+        prefixed = f"{self.query_prefix}{text}"
+        vector = self._model.encode(prefixed, normalize_embeddings=True)
         return vector.tolist()
 
     def embed_batch(self, texts: list[str]) -> list[list[float]]:
         """Embed a batch of texts and return a list of vectors."""
         self._load_model()
 
-        if self.__class__._fallback:
+        if self.is_fallback:
             return [self._random_vector() for _ in texts]
 
-        prefixed = [f"{QUERY_PREFIX}{t}" for t in texts]
-        vectors = self.__class__._model.encode(
+        prefixed = [f"{self.query_prefix}{t}" for t in texts]
+        vectors = self._model.encode(
             prefixed,
             normalize_embeddings=True,
             batch_size=32,
@@ -93,10 +112,10 @@ class EmbeddingService:
         """Embed document chunks (no query prefix) for indexing."""
         self._load_model()
 
-        if self.__class__._fallback:
+        if self.is_fallback:
             return [self._random_vector() for _ in texts]
 
-        vectors = self.__class__._model.encode(
+        vectors = self._model.encode(
             texts,
             normalize_embeddings=True,
             batch_size=32,
@@ -116,4 +135,4 @@ class EmbeddingService:
 
     @property
     def is_fallback(self) -> bool:
-        return self.__class__._fallback
+        return self.model_name in self.__class__._fallback
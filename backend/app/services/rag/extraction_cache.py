@@ -0,0 +1,292 @@
+"""
+Content-addressed cache of extraction results.
+
+The same file uploaded to several departments (or re-ingested after a retry
+or a chunking change) is only extracted once: the SHA-256 of its bytes plus
+``EXTRACTOR_VERSION`` maps to the extracted sections, stored compressed on
+local disk or in MinIO and evicted least-recently-used once the cache grows
+past ``EXTRACTION_CACHE_MAX_BYTES``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import time
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Protocol
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.rag.extractor import EXTRACTOR_VERSION, DocumentExtractor, ExtractedSection, Source
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zlib fallback keeps the cache usable
+    zstandard = None
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes) -> bytes:
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this cache entry")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def hash_file(source: Source) -> str:
+    """Return the hex SHA-256 of a file path or seekable stream, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Storage backends
+# ----------------------------------------------------------------------
+class CacheBackend(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def put(self, key: str, data: bytes) -> None: ...
+
+    def evict(self, max_bytes: int) -> int: ...
+
+
+class LocalDiskBackend:
+    """Entries are files under ``root``; mtime doubles as the LRU clock.
+
+    The cache size is tracked from this process's writes, so ``evict`` only
+    scans the directory when that estimate is over budget, or every
+    ``evict_interval`` seconds to account for other processes' writes.
+    """
+
+    def __init__(self, root: str, evict_interval: float = 300.0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.evict_interval = evict_interval
+        self._size: int | None = None  # bytes at the last scan plus writes since
+        self._scanned_at = 0.0
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.bin"
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+        if self._size is not None:
+            self._size += len(data) - replaced
+
+    def evict(self, max_bytes: int) -> int:
+        now = time.monotonic()
+        if self._size is not None and self._size <= max_bytes and now - self._scanned_at < self.evict_interval:
+            return 0
+        self._scanned_at = now
+
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.bin"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self._size = total
+        return removed
+
+
+class MinioBackend:
+    """Entries are objects in a dedicated bucket; last-modified is the LRU clock.
+
+    A hit refreshes last-modified with a server-side self-copy. Listing the
+    bucket to evict is comparatively expensive, so it runs at most once per
+    ``evict_interval`` seconds.
+    """
+
+    def __init__(self, bucket: str, evict_interval: float = 300.0):
+        from app.services.object_storage import get_minio_client
+
+        self.client = get_minio_client()
+        self.bucket = bucket
+        self.evict_interval = evict_interval
+        self._last_evicted = 0.0
+        if not self.client.bucket_exists(bucket):
+            self.client.make_bucket(bucket)
+
+    def get(self, key: str) -> bytes | None:
+        from minio.commonconfig import REPLACE, CopySource
+        from minio.error import S3Error
+
+        try:
+            response = self.client.get_object(self.bucket, key)
+        except S3Error as exc:
+            if exc.code == "NoSuchKey":
+                return None
+            raise
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+        self.client.copy_object(
+            self.bucket, key, CopySource(self.bucket, key), metadata_directive=REPLACE
+        )
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(self.bucket, key, io.BytesIO(data), len(data))
+
+    def evict(self, max_bytes: int) -> int:
+        now = time.monotonic()
+        if now - self._last_evicted < self.evict_interval:
+            return 0
+        self._last_evicted = now
+
+        objects = list(self.client.list_objects(self.bucket, recursive=True))
+        total = sum(o.size for o in objects)
+        removed = 0
+        for obj in sorted(objects, key=lambda o: o.last_modified):
+            if total <= max_bytes:
+                break
+            self.client.remove_object(self.bucket, obj.object_name)
+            total -= obj.size
+            removed += 1
+        return removed
+
+
+# ----------------------------------------------------------------------
+# Cache
+# ----------------------------------------------------------------------
+class ExtractionCache:
+    """Maps (content hash, extractor version) to extracted sections."""
+
+    def __init__(self, backend: CacheBackend | None = None, max_bytes: int | None = None):
+        self.backend = backend
+        self.max_bytes = max_bytes if max_bytes is not None else settings.EXTRACTION_CACHE_MAX_BYTES
+
+    @classmethod
+    def from_settings(cls) -> "ExtractionCache":
+        kind = settings.EXTRACTION_CACHE_BACKEND
+        try:
+            if kind == "local":
+                return cls(LocalDiskBackend(settings.EXTRACTION_CACHE_DIR))
+            if kind == "minio":
+                return cls(MinioBackend(settings.EXTRACTION_CACHE_BUCKET))
+        except Exception as exc:
+            logger.warning("Extraction cache unavailable ({}), extracting without it", exc)
+        return cls(None)
+
+    @staticmethod
+    def key(content_hash: str) -> str:
+        return f"{content_hash}-v{EXTRACTOR_VERSION}"
+
+    def get(self, content_hash: str) -> list[ExtractedSection] | None:
+        if self.backend is None:
+            return None
+        try:
+            data = self.backend.get(self.key(content_hash))
+            if data is None:
+                return None
+            payload = json.loads(_decompress(data))
+        except Exception as exc:
+            logger.warning("Extraction cache read failed for {}: {}", content_hash, exc)
+            return None
+        return [ExtractedSection(text=s["text"], metadata=s["metadata"]) for s in payload["sections"]]
+
+    def put(self, content_hash: str, sections: list[ExtractedSection]) -> None:
+        if self.backend is None:
+            return
+        payload = {
+            "extractor_version": EXTRACTOR_VERSION,
+            "sections": [{"text": s.text, "metadata": s.metadata} for s in sections],
+        }
+        try:
+            self.backend.put(self.key(content_hash), _compress(json.dumps(payload).encode()))
+            self.backend.evict(self.max_bytes)
+        except Exception as exc:
+            logger.warning("Extraction cache write failed for {}: {}", content_hash, exc)
+
+    def extract_sections(
+        self,
+        extractor: DocumentExtractor,
+        source: Source,
+        mime_type: str,
+        content_hash: str,
+        filename: str | None = None,
+    ) -> Iterator[ExtractedSection]:
+        """Yield cached sections, or extract (streaming) and populate the cache.
+
+        An extraction that skipped pages is not cached, so a later ingest of
+        the same file tries those pages again.
+        """
+        cached = self.get(content_hash)
+        if cached is not None:
+            logger.debug("Extraction cache HIT: {}", content_hash)
+            yield from cached
+            return
+
+        # Stop collecting once the entry would be too large to be worth caching,
+        # so streaming extraction of huge exports keeps flat memory.
+        collected: list[ExtractedSection] | None = []
+        collected_bytes = 0
+        for section in extractor.extract_sections(source, mime_type, filename):
+            if collected is not None:
+                collected_bytes += len(section.text)
+                if collected_bytes > settings.EXTRACTION_CACHE_MAX_ENTRY_BYTES:
+                    collected = None
+                else:
+                    collected.append(section)
+            yield section
+        skipped = getattr(extractor, "skipped_pages", None)
+        if skipped:
+            logger.warning("Not caching extraction of {}: pages {} were skipped", content_hash, skipped)
+        elif collected is not None:
+            self.put(content_hash, collected)
@@ -1,6 +1,138 @@
 import csv
 import io
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import BinaryIO, TextIO
+
+from loguru import logger
+
+from app.core.config import settings
+
+# Bump whenever extraction output changes so cached results are not reused.
+EXTRACTOR_VERSION = "3"
+
+
+@dataclass
+class ExtractedSection:
+    """A contiguous piece of extracted text and where it came from (e.g. page number)."""
+
+    text: str
+    metadata: dict = field(default_factory=dict)
+
+
+# Tags whose text never belongs in the knowledge base.
+_HTML_SKIP_TAGS = frozenset({"script", "style", "nav", "header", "footer"})
+_READ_BLOCK_CHARS = 64 * 1024
+
+
+# A document source is either a filesystem path or a seekable binary stream
+# (e.g. the spooled temp file behind an UploadFile).
+Source = str | BinaryIO
+
+
+def _available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _shareable_path(source: Source) -> str | None:
+    """Return a path other processes can open to read *source*, if there is one."""
+    if isinstance(source, str):
+        return source
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    try:
+        # Unnamed temp files (e.g. a rolled-over spool) are still reachable via procfs.
+        proc_path = f"/proc/{os.getpid()}/fd/{source.fileno()}"
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    return proc_path if os.path.exists(proc_path) else None
+
+
+@contextmanager
+def _open_text(source: Source, newline: str | None = None) -> Iterator[TextIO]:
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8", errors="replace", newline=newline) as f:
+            yield f
+        return
+
+    source.seek(0)
+    wrapper = io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline=newline)
+    try:
+        yield wrapper
+    finally:
+        wrapper.detach()  # leave the caller's stream open
+
+
+# ----------------------------------------------------------------------
+# PDF worker process state (one PdfReader per pool worker)
+# ----------------------------------------------------------------------
+_worker_reader = None
+
+
+def _init_pdf_worker(file_path: str) -> None:
+    global _worker_reader
+    from PyPDF2 import PdfReader
+
+    _worker_reader = PdfReader(file_path)
+
+
+def _extract_pdf_page(page_index: int) -> str:
+    text = _worker_reader.pages[page_index].extract_text()
+    return (text or "").strip()
+
+
+class _HTMLTextTarget:
+    """lxml parser target that collects visible text nodes, one per line.
+
+    Mirrors ``BeautifulSoup.get_text(separator="\\n", strip=True)`` after
+    decomposing ``_HTML_SKIP_TAGS``, without ever building a tree.
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self.size = 0
+        self._pending: list[str] = []
+        self._skip_depth = 0
+
+    def _flush(self) -> None:
+        if self._pending:
+            text = "".join(self._pending).strip()
+            self._pending = []
+            if text and not self._skip_depth:
+                self.lines.append(text)
+                self.size += len(text) + 1
+
+    def start(self, tag, attrib) -> None:
+        self._flush()
+        if tag in _HTML_SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag) -> None:
+        self._flush()
+        if tag in _HTML_SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data) -> None:
+        if not self._skip_depth:
+            self._pending.append(data)
+
+    def close(self) -> None:
+        self._flush()
+
+    def take(self) -> str:
+        text = "\n".join(self.lines)
+        self.lines = []
+        self.size = 0
+        return text
 
 
 class DocumentExtractor:
@@ -15,10 +147,31 @@ class DocumentExtractor:
         "text/html": "_extract_html",
     }
 
-    def extract(self, file_path: str, mime_type: str) -> str:
+    def __init__(
+        self,
+        pdf_workers: int | None = None,
+        pdf_page_timeout: float | None = None,
+        pdf_parallel_min_pages: int | None = None,
+        csv_group_chars: int | None = None,
+        html_section_chars: int | None = None,
+    ):
+        workers = pdf_workers if pdf_workers is not None else settings.PDF_EXTRACT_WORKERS
+        self.pdf_workers = workers if workers > 0 else _available_cores()
+        self.pdf_page_timeout = pdf_page_timeout or settings.PDF_PAGE_TIMEOUT_SECONDS
+        self.pdf_parallel_min_pages = (
+            pdf_parallel_min_pages
+            if pdf_parallel_min_pages is not None
+            else settings.PDF_PARALLEL_MIN_PAGES
+        )
+        self.csv_group_chars = csv_group_chars or settings.CSV_ROW_GROUP_CHARS
+        self.html_section_chars = html_section_chars or settings.HTML_SECTION_CHARS
+        # 1-based pages the last extract_sections() call skipped (timed out or failed).
+        self.skipped_pages: list[int] = []
+
+    def _resolve_method(self, filename: str, mime_type: str) -> str:
         method_name = self.SUPPORTED_TYPES.get(mime_type)
         if not method_name:
-            ext = Path(file_path).suffix.lower()
+            ext = Path(filename).suffix.lower()
             ext_map = {
                 ".pdf": "_extract_pdf",
                 ".docx": "_extract_docx",
@@ -31,30 +184,143 @@ class DocumentExtractor:
             method_name = ext_map.get(ext)
 
         if not method_name:
-            raise ValueError(f"Unsupported file type: {mime_type} ({file_path})")
+            raise ValueError(f"Unsupported file type: {mime_type} ({filename})")
+        return method_name
+
+    def extract(self, source: Source, mime_type: str, filename: str | None = None) -> str:
+        return "\n\n".join(s.text for s in self.extract_sections(source, mime_type, filename))
+
+    def extract_sections(
+        self,
+        source: Source,
+        mime_type: str,
+        filename: str | None = None,
+    ) -> Iterator[ExtractedSection]:
+        """Yield the document as sections in reading order.
+
+        *source* is a path or a seekable binary stream; *filename* is used
+        for the extension fallback when *mime_type* is not recognised and
+        defaults to the path.
+
+        PDFs yield one section per non-empty page (``metadata["page_number"]``
+        is 1-based). CSVs yield row groups that each repeat the header row
+        (``row_start``/``row_end`` are 1-based data rows) and HTML yields
+        blocks of visible text; both are read incrementally so memory stays
+        flat on very large exports. Other formats yield a single section.
 
-        method = getattr(self, method_name)
-        return method(file_path)
+        Pages that cannot be extracted are skipped and listed in
+        ``skipped_pages`` once the iteration is done.
+        """
+        self.skipped_pages = []
+        if filename is None:
+            filename = source if isinstance(source, str) else getattr(source, "name", "") or ""
+        method_name = self._resolve_method(str(filename), mime_type)
+        streaming = {
+            "_extract_pdf": self._iter_pdf_pages,
+            "_extract_csv": self._iter_csv_row_groups,
+            "_extract_html": self._iter_html_blocks,
+        }
+        if method_name in streaming:
+            yield from streaming[method_name](source)
+            return
 
-    def _extract_pdf(self, file_path: str) -> str:
+        text = getattr(self, method_name)(source)
+        if text:
+            yield ExtractedSection(text=text)
+
+    def _extract_pdf(self, source: Source) -> str:
+        return "\n\n".join(s.text for s in self._iter_pdf_pages(source))
+
+    def _iter_pdf_pages(self, source: Source) -> Iterator[ExtractedSection]:
         try:
             from PyPDF2 import PdfReader
-
-            reader = PdfReader(file_path)
-            pages = []
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    pages.append(text.strip())
-            return "\n\n".join(pages)
         except ImportError:
             raise ImportError("PyPDF2 is required for PDF extraction: pip install PyPDF2")
 
-    def _extract_docx(self, file_path: str) -> str:
+        if not isinstance(source, str):
+            source.seek(0)
+        reader = PdfReader(source)
+        page_count = len(reader.pages)
+        worker_path = None
+        if self.pdf_workers > 1 and page_count >= self.pdf_parallel_min_pages:
+            worker_path = _shareable_path(source)
+
+        if worker_path is None:
+            for index, page in enumerate(reader.pages):
+                text = (page.extract_text() or "").strip()
+                if text:
+                    yield ExtractedSection(text=text, metadata={"page_number": index + 1})
+            return
+
+        del reader
+        yield from self._iter_pdf_pages_parallel(worker_path, page_count)
+
+    def _iter_pdf_pages_parallel(self, file_path: str, page_count: int) -> Iterator[ExtractedSection]:
+        """Extract pages in a process pool, yielding them in page order.
+
+        Pages are submitted through a bounded window so results never pile
+        up far ahead of the consumer. A page that exceeds the per-page
+        timeout is skipped; if every worker appears stuck the extraction is
+        aborted rather than waiting out each remaining page.
+        """
+        workers = min(self.pdf_workers, page_count)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        ctx = multiprocessing.get_context(start_method)
+        pool = ctx.Pool(processes=workers, initializer=_init_pdf_worker, initargs=(file_path,))
+        logger.debug("Extracting {} PDF pages with {} workers", page_count, workers)
+
+        window = workers * 4
+        pending: deque = deque()
+        next_page = 0
+        consecutive_timeouts = 0
+        terminate = False
+        try:
+            while next_page < page_count or pending:
+                while next_page < page_count and len(pending) < window:
+                    pending.append((next_page, pool.apply_async(_extract_pdf_page, (next_page,))))
+                    next_page += 1
+
+                index, result = pending.popleft()
+                try:
+                    text = result.get(timeout=self.pdf_page_timeout)
+                    consecutive_timeouts = 0
+                except multiprocessing.TimeoutError:
+                    terminate = True
+                    consecutive_timeouts += 1
+                    logger.warning(
+                        "PDF page {} of {} timed out after {}s, skipping",
+                        index + 1, file_path, self.pdf_page_timeout,
+                    )
+                    self.skipped_pages.append(index + 1)
+                    if consecutive_timeouts >= workers:
+                        raise RuntimeError(
+                            f"PDF extraction stalled: {consecutive_timeouts} consecutive pages timed out"
+                        )
+                    continue
+                except Exception as exc:
+                    logger.warning("PDF page {} of {} failed to extract: {}", index + 1, file_path, exc)
+                    self.skipped_pages.append(index + 1)
+                    continue
+
+                if text:
+                    yield ExtractedSection(text=text, metadata={"page_number": index + 1})
+        except GeneratorExit:
+            terminate = True
+            raise
+        finally:
+            if terminate or pending:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+
+    def _extract_docx(self, source: Source) -> str:
         try:
             from docx import Document
 
-            doc = Document(file_path)
+            if not isinstance(source, str):
+                source.seek(0)
+            doc = Document(source)
             paragraphs = []
             for para in doc.paragraphs:
                 if para.text.strip():
@@ -70,31 +336,83 @@ class DocumentExtractor:
         except ImportError:
             raise ImportError("python-docx is required for DOCX extraction: pip install python-docx")
 
-    def _extract_text(self, file_path: str) -> str:
-        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+    def _extract_text(self, source: Source) -> str:
+        with _open_text(source) as f:
             return f.read()
 
-    def _extract_csv(self, file_path: str) -> str:
-        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+    def _extract_csv(self, source: Source) -> str:
+        return "\n\n".join(s.text for s in self._iter_csv_row_groups(source))
+
+    def _iter_csv_row_groups(self, source: Source) -> Iterator[ExtractedSection]:
+        """Stream rows into groups of about ``csv_group_chars``, each led by the header."""
+        with _open_text(source, newline="") as f:
             reader = csv.reader(f)
-            rows = []
-            for row in reader:
-                rows.append(" | ".join(row))
-            return "\n".join(rows)
+            header_row = next(reader, None)
+            if header_row is None:
+                return
+            header = " | ".join(header_row)
+
+            group: list[str] = []
+            group_chars = len(header)
+            row_start = 1
+            for row_number, row in enumerate(reader, start=1):
+                line = " | ".join(row)
+                if group and group_chars + len(line) + 1 > self.csv_group_chars:
+                    yield ExtractedSection(
+                        text="\n".join([header, *group]),
+                        metadata={"row_start": row_start, "row_end": row_number - 1},
+                    )
+                    group = []
+                    group_chars = len(header)
+                    row_start = row_number
+                group.append(line)
+                group_chars += len(line) + 1
+
+            if group:
+                yield ExtractedSection(
+                    text="\n".join([header, *group]),
+                    metadata={"row_start": row_start, "row_end": row_start + len(group) - 1},
+                )
+            elif header.strip():
+                yield ExtractedSection(text=header)
+
+    def _extract_html(self, source: Source) -> str:
+        return "\n".join(s.text for s in self._iter_html_blocks(source))
+
+    def _iter_html_blocks(self, source: Source) -> Iterator[ExtractedSection]:
+        """Feed the file to lxml's incremental parser and yield text blocks as they fill."""
+        try:
+            from lxml import etree
+        except ImportError:
+            text = self._extract_html_soup(source)
+            if text:
+                yield ExtractedSection(text=text)
+            return
+
+        target = _HTMLTextTarget()
+        parser = etree.HTMLParser(target=target)
+        with _open_text(source) as f:
+            for block in iter(lambda: f.read(_READ_BLOCK_CHARS), ""):
+                parser.feed(block)
+                if target.size >= self.html_section_chars:
+                    yield ExtractedSection(text=target.take())
+        parser.close()
+        if target.lines:
+            yield ExtractedSection(text=target.take())
 
-    def _extract_html(self, file_path: str) -> str:
+    def _extract_html_soup(self, source: Source) -> str:
         try:
             from bs4 import BeautifulSoup
 
-            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            with _open_text(source) as f:
                 soup = BeautifulSoup(f.read(), "html.parser")
 
-            for tag in soup(["script", "style", "nav", "header", "footer"]):
+            for tag in soup(list(_HTML_SKIP_TAGS)):
                 tag.decompose()
 
             return soup.get_text(separator="\n", strip=True)
         except ImportError:
-            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            with _open_text(source) as f:
                 import re
                 html = f.read()
                 text = re.sub(r"<[^>]+>", " ", html)
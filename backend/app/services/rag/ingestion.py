@@ -1,33 +1,105 @@
-from uuid import UUID, uuid4
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from itertools import islice
+from typing import BinaryIO
+from uuid import UUID, uuid5
 
-from sqlalchemy import select
+from loguru import logger
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.models.knowledge import KnowledgeChunk, KnowledgeDoc
+from app.services.query_coalescer import bump_knowledge_version
+from app.services.rag.chunk_writer import ChunkWriter
 from app.services.rag.chunker import TextChunker
+from app.services.rag.dedupe import ChunkDeduper
 from app.services.rag.embeddings import EmbeddingService
-from app.services.rag.extractor import DocumentExtractor
-from app.services.rag.vector_store import VectorStore
+from app.services.rag.extraction_cache import ExtractionCache, hash_file
+from app.services.rag.extractor import EXTRACTOR_VERSION, DocumentExtractor
+from app.services.rag.pipeline import Pipeline, Stage
+from app.services.rag.vector_store import VECTOR_SIZE, VectorStore
+
+
+# progress(stage, done, total) -- see app.services.ingestion_progress
+ProgressCallback = Callable[[str, int, int], Awaitable[None]]
+
+
+async def _no_progress(stage: str, done: int, total: int) -> None:
+    return None
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def chunk_point_id(doc_id: UUID, chunk_index: int) -> str:
+    """Deterministic Qdrant point ID, so re-upserting a chunk overwrites it."""
+    return str(uuid5(doc_id, f"chunk-{chunk_index}"))
+
+
+class _Checkpoint:
+    """Contiguous high-water mark of persisted chunks.
+
+    Upsert workers can finish batches out of order; ``next_chunk`` only
+    advances over an unbroken run of finished chunk indices.
+    """
+
+    def __init__(self, key: str, next_chunk: int = 0, dedupe: dict | None = None):
+        self.key = key
+        self.next_chunk = next_chunk
+        self.resumed_from = next_chunk
+        # Near-duplicate counters up to next_chunk (see app.services.rag.dedupe).
+        self.dedupe = dedupe or {"duplicates": 0, "points_saved": 0, "bytes_saved": 0}
+        self._ahead: dict[int, tuple[int, dict]] = {}  # start -> (end, dedupe counts) past the mark
+
+    @classmethod
+    def resume(cls, saved: dict | None, key: str) -> "_Checkpoint":
+        if saved and saved.get("key") == key:
+            return cls(key, int(saved.get("next_chunk", 0)), saved.get("dedupe"))
+        return cls(key)
+
+    def mark_done(self, start: int, end: int, dedupe: dict | None = None) -> None:
+        self._ahead[start] = (end, dedupe or {})
+        while self.next_chunk in self._ahead:
+            self.next_chunk, counts = self._ahead.pop(self.next_chunk)
+            for name, value in counts.items():
+                self.dedupe[name] = self.dedupe.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        return {"key": self.key, "next_chunk": self.next_chunk, "dedupe": self.dedupe}
 
 
 class IngestionService:
     """Full document ingestion pipeline: extract -> chunk -> embed -> store."""
 
-    def __init__(self, db: AsyncSession, qdrant_url: str = "http://localhost:6333"):
+    def __init__(
+        self,
+        db: AsyncSession,
+        qdrant_url: str | None = None,
+        progress: ProgressCallback | None = None,
+    ):
         self.db = db
+        self.progress = progress or _no_progress
         self.extractor = DocumentExtractor()
+        self.extraction_cache = ExtractionCache.from_settings()
         self.chunker = TextChunker()
-        self.embedder = EmbeddingService()
-        self.vector_store = VectorStore(url=qdrant_url)
+        self.vector_store = VectorStore(url=qdrant_url or settings.QDRANT_URL)
+        self.embedder = EmbeddingService(self.vector_store.embedding_model)
 
     async def ingest_document(
         self,
         doc_id: UUID,
         tenant_id: UUID,
         department_id: UUID,
-        file_path: str,
+        source: str | BinaryIO,
         mime_type: str,
+        content_hash: str | None = None,
+        filename: str | None = None,
     ) -> None:
+        """Ingest *source*, a file path or a seekable binary stream."""
         # Get the document record
         stmt = select(KnowledgeDoc).where(KnowledgeDoc.id == doc_id)
         result = await self.db.execute(stmt)
@@ -36,21 +108,37 @@ class IngestionService:
             raise ValueError(f"Document {doc_id} not found")
 
         try:
-            # Update status to processing
+            # Update status to processing; committed so the status endpoint sees it
+            # and a later rollback only loses work since the last checkpoint.
             doc.status = "processing"
-            await self.db.flush()
+            doc.metadata_ = {k: v for k, v in doc.metadata_.items() if k != "error"}
+            content_hash = content_hash or hash_file(source)
+            doc.metadata_ = {**doc.metadata_, "sha256": content_hash}
+            await self.db.commit()
+            await self.progress("extracting", 0, 0)
 
-            # 1. Extract text
-            text = self.extractor.extract(file_path, mime_type)
-            if not text.strip():
-                doc.status = "failed"
-                doc.metadata_ = {**doc.metadata_, "error": "No text content extracted"}
-                await self.db.flush()
-                return
+            # A retry resumes from the checkpoint of an interrupted attempt when it
+            # would produce the same chunks; otherwise it starts over.
+            deduper = ChunkDeduper.for_department(str(department_id))
+            checkpoint = _Checkpoint.resume(doc.metadata_.get("checkpoint"), self._checkpoint_key(content_hash))
+            if checkpoint.next_chunk:
+                logger.info("Resuming document {} from chunk {}", doc_id, checkpoint.next_chunk)
+                await self.db.execute(
+                    delete(KnowledgeChunk).where(
+                        KnowledgeChunk.document_id == doc_id,
+                        KnowledgeChunk.chunk_index >= checkpoint.next_chunk,
+                    )
+                )
+            else:
+                await self._clear_previous_attempt(doc_id, deduper)
 
-            # 2. Chunk text
-            chunks = self.chunker.chunk_document(
-                text,
+            # 1-2. Extract sections (PDF pages stream in page order) and chunk them.
+            # Identical bytes were already extracted once: serve them from the cache.
+            sections = self.extraction_cache.extract_sections(
+                self.extractor, source, mime_type, content_hash, filename
+            )
+            chunks = self.chunker.iter_chunks(
+                sections,
                 metadata={
                     "document_id": str(doc_id),
                     "tenant_id": str(tenant_id),
@@ -58,57 +146,215 @@ class IngestionService:
                     "title": doc.title,
                 },
             )
+            pending = (c for c in chunks if c["chunk_index"] >= checkpoint.next_chunk)
 
-            if not chunks:
-                doc.status = "failed"
-                doc.metadata_ = {**doc.metadata_, "error": "No chunks generated"}
-                await self.db.flush()
-                return
+            # 3-5. Drop or link near-duplicates, then embed, upsert to Qdrant and
+            # store in PostgreSQL batch by batch, with the stages overlapping
+            # (see app.services.rag.pipeline).
+            def dedupe(batch: list[dict]) -> list[dict]:
+                for chunk in batch:
+                    chunk["duplicate_of"] = deduper.check(
+                        chunk_point_id(doc_id, chunk["chunk_index"]), chunk["content"]
+                    )
+                return batch
 
-            # 3. Generate embeddings
-            texts = [c["content"] for c in chunks]
-            embeddings = self.embedder.embed_batch(texts)
+            def embed(batch: list[dict]) -> list[tuple[dict, list[float] | None]]:
+                fresh = [c for c in batch if not c.get("duplicate_of")]
+                vectors = iter(self.embedder.embed_batch([c["content"] for c in fresh]) if fresh else [])
+                return [(c, None if c.get("duplicate_of") else next(vectors)) for c in batch]
 
-            # 4. Store in Qdrant
-            points = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                point_id = str(uuid4())
-                points.append(
+            def upsert(batch: list[tuple[dict, list[float] | None]]) -> list[tuple[dict, str]]:
+                points = [
                     {
-                        "id": point_id,
+                        "id": chunk_point_id(doc_id, chunk["chunk_index"]),
                         "vector": embedding,
                         "tenant_id": str(tenant_id),
                         "department_id": str(department_id),
                         "document_id": str(doc_id),
-                        "chunk_index": i,
+                        "chunk_index": chunk["chunk_index"],
                         "content": chunk["content"],
                         "title": doc.title,
+                        "page_number": chunk["metadata"].get("page_number"),
                     }
-                )
+                    for chunk, embedding in batch
+                    if embedding is not None
+                ]
+                if points:
+                    self.vector_store.upsert_vectors(points)
+                    # Only now may other documents link to these points.
+                    deduper.register([p["id"] for p in points])
+                return [
+                    (chunk, chunk.get("duplicate_of") or chunk_point_id(doc_id, chunk["chunk_index"]))
+                    for chunk, _ in batch
+                ]
 
-            self.vector_store.upsert_vectors(points)
-
-            # 5. Store chunks in PostgreSQL
-            for i, (chunk, point) in enumerate(zip(chunks, points)):
-                db_chunk = KnowledgeChunk(
-                    document_id=doc_id,
-                    tenant_id=tenant_id,
-                    department_id=department_id,
-                    chunk_index=i,
-                    content=chunk["content"],
-                    qdrant_point_id=point["id"],
-                    token_count=chunk.get("token_count", 0),
-                    metadata_=chunk.get("metadata", {}),
-                )
-                self.db.add(db_chunk)
+            writer = ChunkWriter(self.db)
+            last_saved = checkpoint.next_chunk
+
+            async def save_checkpoint() -> None:
+                nonlocal last_saved
+                await writer.flush()
+                doc.metadata_ = {**doc.metadata_, "checkpoint": checkpoint.as_dict()}
+                await self.db.commit()
+                last_saved = checkpoint.next_chunk
+
+            async def persist(batch: list[tuple[dict, str]]) -> None:
+                counts = {"duplicates": 0, "points_saved": 0, "bytes_saved": 0}
+                for chunk, point_id in batch:
+                    metadata = chunk.get("metadata", {})
+                    if chunk.get("duplicate_of"):
+                        counts["duplicates"] += 1
+                        counts["points_saved"] += 1
+                        counts["bytes_saved"] += len(chunk["content"].encode()) + VECTOR_SIZE * 4
+                        if deduper.mode == "skip":
+                            continue
+                        metadata = {**metadata, "duplicate_of": chunk["duplicate_of"]}
+                    await writer.add(
+                        document_id=doc_id,
+                        tenant_id=tenant_id,
+                        department_id=department_id,
+                        chunk_index=chunk["chunk_index"],
+                        content=chunk["content"],
+                        qdrant_point_id=point_id,
+                        token_count=chunk.get("token_count", 0),
+                        metadata=metadata,
+                    )
+                checkpoint.mark_done(batch[0][0]["chunk_index"], batch[-1][0]["chunk_index"] + 1, counts)
+                if checkpoint.next_chunk - last_saved >= settings.INGEST_CHECKPOINT_CHUNKS:
+                    await save_checkpoint()
+                await self.progress("indexing", checkpoint.next_chunk, 0)
+
+            pipeline = Pipeline(
+                [
+                    Stage("dedupe", dedupe, in_thread=True),
+                    Stage("embed", embed, in_thread=True),
+                    Stage("upsert", upsert, workers=settings.INGEST_UPSERT_WORKERS, in_thread=True),
+                    # One AsyncSession cannot be used concurrently: a single writer.
+                    # ChunkWriter buffers rows into CHUNK_WRITE_BATCH_SIZE COPYs.
+                    Stage("persist", persist),
+                ],
+                queue_size=settings.INGEST_QUEUE_SIZE,
+            )
+            stats = await pipeline.run(batched(pending, settings.INGEST_BATCH_SIZE))
+            await writer.flush()
+            total = checkpoint.next_chunk
+            logger.info(
+                "Ingested document {}: {} chunks ({} resumed), stages {}",
+                doc_id,
+                total,
+                checkpoint.resumed_from,
+                {name: s.as_dict() for name, s in stats.items()},
+            )
+
+            doc.metadata_ = {k: v for k, v in doc.metadata_.items() if k not in ("checkpoint", "skipped_pages")}
+            if self.extractor.skipped_pages:
+                doc.metadata_ = {**doc.metadata_, "skipped_pages": self.extractor.skipped_pages}
+            if deduper.enabled or checkpoint.dedupe["duplicates"]:
+                doc.metadata_ = {**doc.metadata_, "dedupe": checkpoint.dedupe}
+            if not total:
+                doc.status = "failed"
+                doc.metadata_ = {**doc.metadata_, "error": "No text content extracted"}
+                await self.db.flush()
+                await self.progress("failed", 0, 0)
+                return
 
             # 6. Update document status
             doc.status = "indexed"
-            doc.chunk_count = len(chunks)
+            doc.chunk_count = total - (checkpoint.dedupe["duplicates"] if deduper.mode == "skip" else 0)
             await self.db.flush()
+            await self.progress("indexed", total, total)
+            await bump_knowledge_version(str(doc.department_id))
 
         except Exception as e:
+            # Keep what the last checkpoint committed; only uncommitted rows are lost.
+            await self.db.rollback()
+            await self.db.refresh(doc)
             doc.status = "failed"
             doc.metadata_ = {**doc.metadata_, "error": str(e)}
             await self.db.flush()
+            await self.progress("failed", 0, 0)
             raise
+
+    def _checkpoint_key(self, content_hash: str) -> str:
+        """Checkpoints are only valid for the same bytes, extractor and chunking."""
+        return (
+            f"{content_hash}:{EXTRACTOR_VERSION}:"
+            f"{self.chunker.chunk_size}:{self.chunker.chunk_overlap}"
+        )
+
+    async def _clear_previous_attempt(self, doc_id: UUID, deduper: ChunkDeduper | None = None) -> None:
+        await promote_duplicates(
+            self.db, doc_id, self.vector_store, deduper or ChunkDeduper(None, "off"), self.embedder
+        )
+        await self.db.execute(delete(KnowledgeChunk).where(KnowledgeChunk.document_id == doc_id))
+        self.vector_store.delete_by_document(str(doc_id))
+
+
+async def promote_duplicates(
+    db: AsyncSession,
+    doc_id: UUID,
+    vector_store: VectorStore,
+    deduper: ChunkDeduper,
+    embedder: EmbeddingService | None = None,
+) -> int:
+    """Keep chunks linked to *doc_id*'s vectors searchable before those vectors are deleted.
+
+    The document's canonical points leave the dedupe index. For each one that
+    link-mode chunks of other documents point at, the chunk of the oldest
+    such document gets a vector of its own and becomes the canonical, and the others are
+    re-linked to it. Returns the number of chunks promoted.
+    """
+    rows = await db.execute(
+        select(KnowledgeChunk.qdrant_point_id, KnowledgeChunk.metadata_).where(KnowledgeChunk.document_id == doc_id)
+    )
+    own = [pid for pid, meta in rows.all() if pid and not (meta or {}).get("duplicate_of")]
+    await asyncio.to_thread(deduper.forget, own)
+
+    linked: dict[str, list[tuple[KnowledgeChunk, str]]] = {}
+    for window in batched(own, 1000):
+        result = await db.execute(
+            select(KnowledgeChunk, KnowledgeDoc.title)
+            .join(KnowledgeDoc, KnowledgeDoc.id == KnowledgeChunk.document_id)
+            .where(
+                KnowledgeChunk.document_id != doc_id,
+                KnowledgeDoc.deleted_at.is_(None),
+                KnowledgeChunk.metadata_["duplicate_of"].as_string().in_(window),
+            )
+            .order_by(KnowledgeDoc.created_at, KnowledgeChunk.document_id, KnowledgeChunk.chunk_index)
+        )
+        for chunk, title in result.all():
+            linked.setdefault(chunk.metadata_["duplicate_of"], []).append((chunk, title))
+    if not linked:
+        return 0
+
+    embedder = embedder or EmbeddingService(vector_store.embedding_model)
+    promoted = [group[0] for group in linked.values()]
+    vectors = await asyncio.to_thread(embedder.embed_batch, [chunk.content for chunk, _ in promoted])
+    points = [
+        {
+            "id": chunk_point_id(chunk.document_id, chunk.chunk_index),
+            "vector": vector,
+            "tenant_id": str(chunk.tenant_id),
+            "department_id": str(chunk.department_id),
+            "document_id": str(chunk.document_id),
+            "chunk_index": chunk.chunk_index,
+            "content": chunk.content,
+            "title": title,
+            "page_number": (chunk.metadata_ or {}).get("page_number"),
+        }
+        for (chunk, title), vector in zip(promoted, vectors)
+    ]
+    await asyncio.to_thread(vector_store.upsert_vectors, points)
+
+    for group in linked.values():
+        canonical, _ = group[0]
+        point_id = chunk_point_id(canonical.document_id, canonical.chunk_index)
+        canonical.qdrant_point_id = point_id
+        canonical.metadata_ = {k: v for k, v in canonical.metadata_.items() if k != "duplicate_of"}
+        for chunk, _ in group[1:]:
+            chunk.qdrant_point_id = point_id
+            chunk.metadata_ = {**chunk.metadata_, "duplicate_of": point_id}
+        await asyncio.to_thread(deduper.add, point_id, canonical.content)
+    await db.flush()
+    logger.info("Promoted {} linked duplicates before removing the vectors of document {}", len(promoted), doc_id)
+    return len(promoted)
@@ -0,0 +1,161 @@
+"""
+Staged, bounded-queue pipeline for document ingestion.
+
+Items from a (blocking) source iterator flow through a chain of stages,
+each with its own workers, connected by bounded ``asyncio.Queue``s. A slow
+stage fills its input queue and the stages before it block on ``put`` --
+that is the backpressure that keeps memory flat. Stages marked
+``in_thread`` run in the default thread pool so CPU-bound work (embedding)
+overlaps with I/O-bound work (Qdrant upserts, DB writes).
+
+The first exception in any stage cancels that stage and every stage
+before it; the stages after it drain what they were already given (unless
+one of them fails too, which cancels them all), then the first exception
+is re-raised from :meth:`Pipeline.run`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline step. ``fn`` maps an item to the next item (``None`` drops it)."""
+
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    in_thread: bool = False
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+    _finished: float | None = field(default=None, repr=False)
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self._finished or time.perf_counter()) - self._started
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of wall time the stage was alive."""
+        wall = self.wall_seconds
+        return self.items / wall if wall > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.throughput, 2),
+        }
+
+
+class Pipeline:
+    """Run ``source`` through ``stages`` with at most ``queue_size`` items buffered per hop."""
+
+    def __init__(self, stages: list[Stage], queue_size: int = 4):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats: dict[str, StageStats] = {}
+
+    async def run(self, source: Iterable[Any]) -> dict[str, StageStats]:
+        self.stats = {"source": StageStats("source")}
+        self.stats.update({s.name: StageStats(s.name) for s in self.stages})
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+
+        tasks = [asyncio.create_task(self._produce(source, queues[0]), name="source")]
+        for i, stage in enumerate(self.stages):
+            out = queues[i + 1] if i + 1 < len(queues) else None
+            tasks.append(
+                asyncio.create_task(self._run_stage(stage, queues[i], out), name=stage.name)
+            )
+
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        failed = next((t for t in done if not t.cancelled() and t.exception()), None)
+        if failed is None:
+            return self.stats
+
+        # Stop the failed stage and everything feeding it, but let the stages
+        # after it finish the items already handed to them, so work that got
+        # past the failure point is not thrown away.
+        failed_at = tasks.index(failed)
+        for task in tasks[: failed_at + 1]:
+            task.cancel()
+        await asyncio.gather(*tasks[: failed_at + 1], return_exceptions=True)
+        draining = tasks[failed_at + 1 :]
+        if draining:
+            # queues[i] feeds stage i, which is tasks[i + 1].
+            end = asyncio.create_task(queues[failed_at].put(_DONE))
+            _, pending = await asyncio.wait(draining, return_when=asyncio.FIRST_EXCEPTION)
+            # Another stage failing while draining would leave the ones after it
+            # waiting for input forever: give up on the rest.
+            for task in [*pending, end]:
+                task.cancel()
+            await asyncio.gather(*draining, end, return_exceptions=True)
+        logger.warning("Pipeline stage '{}' failed: {}", failed.get_name(), failed.exception())
+        raise failed.exception()
+
+    async def _produce(self, source: Iterable[Any], out: asyncio.Queue) -> None:
+        stats = self.stats["source"]
+        iterator = iter(source)
+        while True:
+            start = time.perf_counter()
+            item = await asyncio.to_thread(next, iterator, _DONE)
+            stats.busy_seconds += time.perf_counter() - start
+            if item is _DONE:
+                break
+            stats.items += 1
+            await out.put(item)
+        stats._finished = time.perf_counter()
+        await out.put(_DONE)
+
+    async def _run_stage(self, stage: Stage, inbox: asyncio.Queue, out: asyncio.Queue | None) -> None:
+        stats = self.stats[stage.name]
+        is_async = inspect.iscoroutinefunction(stage.fn)
+
+        async def worker() -> None:
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    # Let sibling workers see the end of the stream too.
+                    await inbox.put(_DONE)
+                    return
+                start = time.perf_counter()
+                if is_async:
+                    result = await stage.fn(item)
+                elif stage.in_thread:
+                    result = await asyncio.to_thread(stage.fn, item)
+                else:
+                    result = stage.fn(item)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += 1
+                if out is not None and result is not None:
+                    await out.put(result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, stage.workers))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # A failing worker stops its siblings instead of leaving them running.
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        stats._finished = time.perf_counter()
+        if out is not None:
+            await out.put(_DONE)
@@ -8,8 +8,18 @@ class RAGRetriever:
     """Combines embedding + vector search for RAG retrieval."""
 
     def __init__(self):
-        self.embedder = EmbeddingService()
         self.vector_store = VectorStore()
+        self._embedder: EmbeddingService | None = None
+
+    @property
+    def embedder(self) -> EmbeddingService:
+        # Queries must be embedded with the model the live collection was built with.
+        # Re-checked per query (the profile is cached) so a long-lived retriever
+        # follows the alias across a re-index swap.
+        model_name = self.vector_store.embedding_model
+        if self._embedder is None or self._embedder.model_name != model_name:
+            self._embedder = EmbeddingService(model_name)
+        return self._embedder
 
     def retrieve(
         self,
@@ -26,7 +36,29 @@ class RAGRetriever:
             department_id=department_id,
             top_k=top_k,
         )
+        return self._rank(results)
 
+    def retrieve_batch(
+        self,
+        queries: list[str],
+        tenant_id: str,
+        department_id: str,
+        top_k: int = 5,
+    ) -> list[list[dict]]:
+        """Retrieve for many queries with one embedding batch and one Qdrant request."""
+        if not queries:
+            return []
+        vectors = self.embedder.embed_batch(queries)
+        batches = self.vector_store.search_batch(
+            query_vectors=vectors,
+            tenant_id=tenant_id,
+            department_id=department_id,
+            top_k=top_k,
+        )
+        return [self._rank(results) for results in batches]
+
+    @staticmethod
+    def _rank(results: list[dict]) -> list[dict]:
         # Boost verified answers so they rank higher
         for r in results:
             if r.get("source_type") == "verified_answer":
@@ -1,60 +1,164 @@
-from uuid import uuid4
+import time
+from uuid import NAMESPACE_URL, uuid4, uuid5
 
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
     Distance,
     Filter,
     FieldCondition,
     MatchValue,
     PointStruct,
+    SearchRequest,
     VectorParams,
 )
 
 from app.core.config import settings
+from app.services.rag.embeddings import EMBEDDING_MODEL
 
-COLLECTION_NAME = "knowledge_vectors"
+COLLECTION_NAME = "knowledge_vectors"  # first physical collection
+COLLECTION_ALIAS = "knowledge"  # what reads and writes go through; re-pointed by re-index jobs
 VECTOR_SIZE = 1024  # BGE-large-en-v1.5
 
+# Every collection carries one reserved point describing how it was built,
+# so the embedding model always travels with the alias.
+PROFILE_POINT_ID = str(uuid5(NAMESPACE_URL, "knowledge-vectors/profile"))
+_SYSTEM_TENANT = "__system__"
+
+_profile_cache: dict[str, tuple[float, dict]] = {}
+
 
 class VectorStore:
-    """Qdrant vector store for knowledge retrieval."""
+    """Qdrant vector store for knowledge retrieval.
 
-    def __init__(self, url: str | None = None):
+    By default it works on the ``knowledge`` alias. Pass *collection* to
+    address one physical collection, e.g. one a re-index job is building.
+    """
+
+    def __init__(self, url: str | None = None, collection: str | None = None):
         url = url or settings.QDRANT_URL
         self.client = QdrantClient(url=url, timeout=30)
-        self._ensure_collection()
+        self.collection = collection or COLLECTION_ALIAS
+        if collection is None:
+            self._ensure_collection()
 
     def _ensure_collection(self) -> None:
-        collections = self.client.get_collections().collections
-        names = [c.name for c in collections]
+        if self.alias_target() is not None:
+            return
+        names = [c.name for c in self.client.get_collections().collections]
         if COLLECTION_NAME not in names:
-            self.client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(
-                    size=VECTOR_SIZE,
-                    distance=Distance.COSINE,
-                ),
-            )
-            self.client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="tenant_id",
-                field_schema="keyword",
-            )
-            self.client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="department_id",
-                field_schema="keyword",
-            )
+            self.create_collection(COLLECTION_NAME, EMBEDDING_MODEL, VECTOR_SIZE)
+        # Existing deployments keep their collection; it just gets the alias.
+        self.client.update_collection_aliases(
+            change_aliases_operations=[
+                CreateAliasOperation(
+                    create_alias=CreateAlias(collection_name=COLLECTION_NAME, alias_name=COLLECTION_ALIAS)
+                )
+            ]
+        )
+
+    # ------------------------------------------------------------------
+    # Collections and the alias
+    # ------------------------------------------------------------------
+    def create_collection(
+        self, name: str, embedding_model: str, vector_size: int, distance: Distance = Distance.COSINE
+    ) -> None:
+        """Create a physical collection with the payload indexes and a profile point."""
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(size=vector_size, distance=distance),
+        )
+        for field_name in ("tenant_id", "department_id", "document_id", "source_type"):
             self.client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="document_id",
+                collection_name=name,
+                field_name=field_name,
                 field_schema="keyword",
             )
-            self.client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="source_type",
-                field_schema="keyword",
+        self.client.upsert(
+            collection_name=name,
+            points=[
+                PointStruct(
+                    id=PROFILE_POINT_ID,
+                    vector=[1.0] + [0.0] * (vector_size - 1),
+                    payload={
+                        "tenant_id": _SYSTEM_TENANT,
+                        "department_id": _SYSTEM_TENANT,
+                        "profile": {
+                            "embedding_model": embedding_model,
+                            "vector_size": vector_size,
+                            "distance": str(distance.value),
+                        },
+                    },
+                )
+            ],
+        )
+
+    def collection_exists(self, name: str) -> bool:
+        return name in [c.name for c in self.client.get_collections().collections]
+
+    def drop_collection(self, name: str) -> None:
+        self.client.delete_collection(collection_name=name)
+
+    def alias_target(self) -> str | None:
+        """Physical collection the alias points at, or None if there is no alias yet."""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == COLLECTION_ALIAS:
+                return alias.collection_name
+        return None
+
+    def swap_alias(self, collection: str) -> str | None:
+        """Atomically re-point the alias at *collection*. Returns the previous target."""
+        previous = self.alias_target()
+        operations = []
+        if previous is not None:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=COLLECTION_ALIAS)))
+        operations.append(
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=collection, alias_name=COLLECTION_ALIAS))
+        )
+        # One request: Qdrant applies the alias operations together.
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        _profile_cache.clear()
+        return previous
+
+    def profile(self) -> dict:
+        """How this store's collection was built; cached for VECTOR_PROFILE_CACHE_SECONDS."""
+        cached = _profile_cache.get(self.collection)
+        if cached and time.monotonic() - cached[0] < settings.VECTOR_PROFILE_CACHE_SECONDS:
+            return cached[1]
+        records = self.client.retrieve(collection_name=self.collection, ids=[PROFILE_POINT_ID])
+        # Collections created before profiles existed were built with the default model.
+        profile = (records[0].payload or {}).get("profile") if records else None
+        profile = profile or {"embedding_model": EMBEDDING_MODEL, "vector_size": VECTOR_SIZE, "distance": "Cosine"}
+        _profile_cache[self.collection] = (time.monotonic(), profile)
+        return profile
+
+    @property
+    def embedding_model(self) -> str:
+        return self.profile()["embedding_model"]
+
+    def scroll_source_type(self, source_type: str, limit: int = 256):
+        """Yield the records (payload, no vector) of one source type, e.g. verified answers."""
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=Filter(
+                    must=[FieldCondition(key="source_type", match=MatchValue(value=source_type))]
+                ),
+                limit=limit,
+                offset=offset,
             )
+            yield from records
+            if offset is None:
+                return
+
+    def upsert_points(self, points: list[PointStruct]) -> None:
+        """Upsert points as given, payload and all; used to copy points between collections."""
+        for i in range(0, len(points), 100):
+            self.client.upsert(collection_name=self.collection, points=points[i : i + 100])
 
     def upsert_vectors(self, points: list[dict]) -> None:
         qdrant_points = []
@@ -72,6 +176,7 @@ class VectorStore:
                         "content": p.get("content", "")[:500],
                         "title": p.get("title", ""),
                         "source_type": p.get("source_type", "document"),
+                        "page_number": p.get("page_number"),
                     },
                 )
             )
@@ -80,7 +185,7 @@ class VectorStore:
         for i in range(0, len(qdrant_points), batch_size):
             batch = qdrant_points[i : i + batch_size]
             self.client.upsert(
-                collection_name=COLLECTION_NAME,
+                collection_name=self.collection,
                 points=batch,
             )
 
@@ -92,39 +197,62 @@ class VectorStore:
         top_k: int = 5,
     ) -> list[dict]:
         results = self.client.search(
-            collection_name=COLLECTION_NAME,
+            collection_name=self.collection,
             query_vector=query_vector,
-            query_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="tenant_id",
-                        match=MatchValue(value=str(tenant_id)),
-                    ),
-                    FieldCondition(
-                        key="department_id",
-                        match=MatchValue(value=str(department_id)),
-                    ),
-                ]
-            ),
+            query_filter=self._department_filter(tenant_id, department_id),
             limit=top_k,
         )
+        return [self._to_result(r) for r in results]
+
+    def search_batch(
+        self,
+        query_vectors: list[list[float]],
+        tenant_id: str,
+        department_id: str,
+        top_k: int = 5,
+    ) -> list[list[dict]]:
+        """Search many query vectors in one request; results are in input order."""
+        query_filter = self._department_filter(tenant_id, department_id)
+        batches = self.client.search_batch(
+            collection_name=self.collection,
+            requests=[
+                SearchRequest(vector=vector, filter=query_filter, limit=top_k, with_payload=True)
+                for vector in query_vectors
+            ],
+        )
+        return [[self._to_result(r) for r in results] for results in batches]
+
+    @staticmethod
+    def _department_filter(tenant_id: str, department_id: str) -> Filter:
+        return Filter(
+            must=[
+                FieldCondition(
+                    key="tenant_id",
+                    match=MatchValue(value=str(tenant_id)),
+                ),
+                FieldCondition(
+                    key="department_id",
+                    match=MatchValue(value=str(department_id)),
+                ),
+            ]
+        )
 
-        return [
-            {
-                "id": str(r.id),
-                "score": r.score,
-                "content": r.payload.get("content", ""),
-                "title": r.payload.get("title", ""),
-                "document_id": r.payload.get("document_id"),
-                "chunk_index": r.payload.get("chunk_index", 0),
-                "source_type": r.payload.get("source_type", "document"),
-            }
-            for r in results
-        ]
+    @staticmethod
+    def _to_result(r) -> dict:
+        return {
+            "id": str(r.id),
+            "score": r.score,
+            "content": r.payload.get("content", ""),
+            "title": r.payload.get("title", ""),
+            "document_id": r.payload.get("document_id"),
+            "chunk_index": r.payload.get("chunk_index", 0),
+            "source_type": r.payload.get("source_type", "document"),
+            "page_number": r.payload.get("page_number"),
+        }
 
     def delete_by_document(self, document_id: str) -> None:
         self.client.delete(
-            collection_name=COLLECTION_NAME,
+            collection_name=self.collection,
             points_selector=Filter(
                 must=[
                     FieldCondition(
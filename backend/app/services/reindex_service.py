@@ -0,0 +1,369 @@
+"""Blue/green re-indexing: rebuild the vector collection, then swap the alias.
+
+A job re-embeds the text already stored in ``knowledge_chunks`` (no
+re-extraction) into a new Qdrant collection while search keeps using the
+current one. It moves through these phases, each resumable from the job row:
+
+    building     copy every chunk, keyset-paginated by chunk ID; the cursor
+                 is committed every REINDEX_WINDOW_BATCHES batches
+    catching_up  redo documents changed since the build started, and copy
+                 the verified answers (they exist only in Qdrant)
+    swapping     re-point the ``knowledge`` alias in one request, wait for
+                 processes to notice the new embedding model, then redo
+                 documents changed and copy answers verified meanwhile
+    active       done; the previous collection is kept for rollback until
+                 the job is finalized
+
+Rollback runs the same catch-up against the previous collection (with its
+own model), including answers verified since the swap, before and after
+swapping the alias back.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from qdrant_client.http.models import PointStruct
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import BadRequestError, NotFoundError
+from app.models.knowledge import KnowledgeChunk, KnowledgeDoc
+from app.models.reindex_job import ReindexJob
+from app.services.query_coalescer import bump_knowledge_version
+from app.services.rag.embeddings import EmbeddingService
+from app.services.rag.ingestion import batched, chunk_point_id
+from app.services.rag.pipeline import Pipeline, Stage
+from app.services.rag.vector_store import COLLECTION_NAME, VectorStore
+
+logger = logging.getLogger(__name__)
+
+RUNNING_STATUSES = ("pending", "building", "catching_up", "swapping", "rolling_back")
+VERIFIED_SOURCE_TYPE = "verified_answer"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _chunk_rows():
+    return (
+        select(
+            KnowledgeChunk.id,
+            KnowledgeChunk.document_id,
+            KnowledgeChunk.tenant_id,
+            KnowledgeChunk.department_id,
+            KnowledgeChunk.chunk_index,
+            KnowledgeChunk.content,
+            KnowledgeChunk.qdrant_point_id,
+            KnowledgeChunk.metadata_,
+            KnowledgeDoc.title,
+        )
+        .join(KnowledgeDoc, KnowledgeDoc.id == KnowledgeChunk.document_id)
+        .where(KnowledgeDoc.deleted_at.is_(None))
+    )
+
+
+class ReindexService:
+    def __init__(self, db: AsyncSession, qdrant_url: str | None = None):
+        self.db = db
+        self.qdrant_url = qdrant_url
+
+    # ------------------------------------------------------------------
+    # API side
+    # ------------------------------------------------------------------
+    async def start(self, embedding_model: str, vector_size: int | None, user_id: UUID | None) -> ReindexJob:
+        running = await self.db.execute(select(ReindexJob.id).where(ReindexJob.status.in_(RUNNING_STATUSES)))
+        if running.first():
+            raise BadRequestError("A re-index job is already running")
+
+        job_id = uuid4()
+        job = ReindexJob(
+            id=job_id,
+            created_by=user_id,
+            embedding_model=embedding_model,
+            vector_size=vector_size,
+            target_collection=f"{COLLECTION_NAME}_{job_id.hex[:12]}",
+        )
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        await self._enqueue(job)
+        return job
+
+    async def resume(self, job_id: UUID) -> ReindexJob:
+        job = await self._get(job_id)
+        if job.status not in RUNNING_STATUSES:
+            raise BadRequestError(f"Re-index job is {job.status}")
+        job.error = None
+        await self.db.commit()
+        await self._enqueue(job)
+        return job
+
+    async def rollback(self, job_id: UUID) -> ReindexJob:
+        job = await self._get(job_id)
+        if job.status != "active" or not job.source_collection:
+            raise BadRequestError("Only an active job with a previous collection can be rolled back")
+        job.status = "rolling_back"
+        job.error = None
+        await self.db.commit()
+        await self._enqueue(job)
+        return job
+
+    async def finalize(self, job_id: UUID) -> ReindexJob:
+        """Drop the previous collection; the job can no longer be rolled back."""
+        job = await self._get(job_id)
+        if job.status != "active":
+            raise BadRequestError(f"Re-index job is {job.status}")
+        if job.source_collection:
+            store = await asyncio.to_thread(VectorStore, self.qdrant_url, job.target_collection)
+            if await asyncio.to_thread(store.collection_exists, job.source_collection):
+                await asyncio.to_thread(store.drop_collection, job.source_collection)
+        job.status = "finalized"
+        await self.db.commit()
+        return job
+
+    async def list_jobs(self, limit: int = 20) -> list[ReindexJob]:
+        result = await self.db.execute(select(ReindexJob).order_by(ReindexJob.created_at.desc()).limit(limit))
+        return list(result.scalars().all())
+
+    async def get_progress(self, job_id: UUID) -> dict:
+        job = await self._get(job_id)
+        remaining = max(job.total_chunks - job.processed_chunks, 0)
+        eta = None
+        if job.status == "building" and job.chunks_per_second > 0:
+            eta = round(remaining / job.chunks_per_second, 1)
+        return {
+            "id": job.id,
+            "status": job.status,
+            "embedding_model": job.embedding_model,
+            "vector_size": job.vector_size,
+            "source_collection": job.source_collection,
+            "target_collection": job.target_collection,
+            "total_chunks": job.total_chunks,
+            "processed_chunks": job.processed_chunks,
+            "percent": round(100 * job.processed_chunks / job.total_chunks, 1) if job.total_chunks else 0.0,
+            "chunks_per_second": round(job.chunks_per_second, 2),
+            "eta_seconds": eta,
+            "error": job.error,
+            "created_at": job.created_at,
+            "swapped_at": job.swapped_at,
+            "finished_at": job.finished_at,
+        }
+
+    async def _get(self, job_id: UUID) -> ReindexJob:
+        job = await self.db.get(ReindexJob, job_id)
+        if not job:
+            raise NotFoundError(f"Re-index job {job_id} not found")
+        return job
+
+    async def _enqueue(self, job: ReindexJob) -> None:
+        from app.services.tasks import reindex_collection_task
+
+        # Its own queue (see celery_worker): a re-embed of every chunk must not hold bulk ingestion workers.
+        await asyncio.to_thread(reindex_collection_task.apply_async, args=[str(job.id)])
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    async def run(self, job_id: UUID) -> None:
+        """Advance the job through its remaining phases."""
+        job = await self._get(job_id)
+        try:
+            if job.status == "rolling_back":
+                await self._rollback(job)
+                return
+            if job.status == "pending":
+                await self._prepare(job)
+            target = await asyncio.to_thread(VectorStore, self.qdrant_url, job.target_collection)
+            embedder = EmbeddingService(job.embedding_model, allow_fallback=False)
+            if job.status == "building":
+                await self._build(job, target, embedder)
+            if job.status == "catching_up":
+                await self._catch_up_before_swap(job, target, embedder)
+            if job.status == "swapping":
+                await self._swap(job, target, embedder)
+        except Exception as exc:
+            await self.db.rollback()
+            job = await self._get(job_id)
+            job.error = str(exc)
+            await self.db.commit()
+            raise
+
+    async def _prepare(self, job: ReindexJob) -> None:
+        live = await asyncio.to_thread(VectorStore, self.qdrant_url)
+        embedder = EmbeddingService(job.embedding_model, allow_fallback=False)
+        if not job.vector_size:
+            probe = await asyncio.to_thread(embedder.embed_batch, ["dimension probe"])
+            job.vector_size = len(probe[0])
+        if not await asyncio.to_thread(live.collection_exists, job.target_collection):
+            await asyncio.to_thread(live.create_collection, job.target_collection, job.embedding_model, job.vector_size)
+
+        job.source_collection = await asyncio.to_thread(live.alias_target)
+        # Anything changed from here on is redone by the catch-up pass.
+        job.snapshot_at = _now()
+        job.total_chunks = await self.db.scalar(
+            select(func.count()).select_from(_chunk_rows().subquery())
+        ) or 0
+        job.status = "building"
+        await self.db.commit()
+        logger.info(
+            f"Re-index {job.id}: {job.total_chunks} chunks from {job.source_collection} "
+            f"into {job.target_collection} ({job.embedding_model}, dim {job.vector_size})"
+        )
+
+    async def _build(self, job: ReindexJob, target: VectorStore, embedder: EmbeddingService) -> None:
+        window = settings.REINDEX_BATCH_SIZE * settings.REINDEX_WINDOW_BATCHES
+        while True:
+            query = _chunk_rows().order_by(KnowledgeChunk.id).limit(window)
+            if job.cursor:
+                query = query.where(KnowledgeChunk.id > UUID(job.cursor))
+            rows = (await self.db.execute(query)).all()
+            if not rows:
+                break
+
+            started = time.perf_counter()
+            await self._index_rows(rows, target, embedder)
+            await self._throttle(len(rows), started)
+            rate = len(rows) / max(time.perf_counter() - started, 1e-6)
+
+            job.cursor = str(rows[-1].id)
+            job.processed_chunks += len(rows)
+            # Smoothed, so the ETA does not jump with every window.
+            job.chunks_per_second = rate if not job.chunks_per_second else 0.7 * job.chunks_per_second + 0.3 * rate
+            await self.db.commit()
+
+        job.status = "catching_up"
+        await self.db.commit()
+
+    async def _catch_up_before_swap(self, job: ReindexJob, target: VectorStore, embedder: EmbeddingService) -> None:
+        mark = _now()
+        await self._catch_up(job.snapshot_at, target, embedder)
+        await self._copy_verified_answers(job.source_collection, target, embedder)
+        job.snapshot_at = mark
+        job.status = "swapping"
+        await self.db.commit()
+
+    async def _swap(self, job: ReindexJob, target: VectorStore, embedder: EmbeddingService) -> None:
+        if await asyncio.to_thread(target.alias_target) != job.target_collection:
+            await asyncio.to_thread(target.swap_alias, job.target_collection)
+            await bump_knowledge_version()
+            job.swapped_at = _now()
+            await self.db.commit()
+            logger.info(f"Re-index {job.id}: alias now points at {job.target_collection}")
+
+        # Until their profile cache expires, other processes may still embed
+        # with the old model and write into the old collection.
+        await asyncio.sleep(settings.VECTOR_PROFILE_CACHE_SECONDS)
+        await self._catch_up(job.snapshot_at, target, embedder)
+        # Answers approved into the old collection since the first copy.
+        await self._copy_verified_answers(job.source_collection, target, embedder)
+        job.status = "active"
+        job.finished_at = _now()
+        await self.db.commit()
+
+    async def _rollback(self, job: ReindexJob) -> None:
+        previous = await asyncio.to_thread(VectorStore, self.qdrant_url, job.source_collection)
+        profile = await asyncio.to_thread(previous.profile)
+        embedder = EmbeddingService(profile["embedding_model"], allow_fallback=False)
+        since = job.swapped_at or job.snapshot_at
+        mark = _now()
+        await self._catch_up(since, previous, embedder)
+        await self._copy_verified_answers(job.target_collection, previous, embedder)
+        await asyncio.to_thread(previous.swap_alias, job.source_collection)
+        await bump_knowledge_version()
+        await asyncio.sleep(settings.VECTOR_PROFILE_CACHE_SECONDS)
+        await self._catch_up(mark, previous, embedder)
+        await self._copy_verified_answers(job.target_collection, previous, embedder)
+        job.status = "rolled_back"
+        job.finished_at = _now()
+        await self.db.commit()
+        logger.info(f"Re-index {job.id}: rolled back to {job.source_collection}")
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    async def _catch_up(self, since: datetime, store: VectorStore, embedder: EmbeddingService) -> int:
+        """Re-copy documents changed since *since*; deleted ones are removed from *store*."""
+        changed = await self.db.execute(
+            select(KnowledgeDoc.id, KnowledgeDoc.deleted_at).where(KnowledgeDoc.updated_at >= since)
+        )
+        count = 0
+        for doc_id, deleted_at in changed.all():
+            await asyncio.to_thread(store.delete_by_document, str(doc_id))
+            if deleted_at is None:
+                rows = (await self.db.execute(_chunk_rows().where(KnowledgeChunk.document_id == doc_id))).all()
+                await self._index_rows(rows, store, embedder)
+            count += 1
+        if count:
+            logger.info(f"Re-index catch-up into {store.collection}: {count} documents changed")
+        return count
+
+    async def _index_rows(self, rows: list, store: VectorStore, embedder: EmbeddingService) -> None:
+        """Embed and upsert chunk rows, reusing their point IDs so PostgreSQL references stay valid."""
+        # Link-mode near-duplicates point at another chunk's vector and have none of their own.
+        rows = [r for r in rows if not (r.metadata_ or {}).get("duplicate_of")]
+        if not rows:
+            return
+
+        def embed(batch: list) -> tuple[list, list[list[float]]]:
+            return batch, embedder.embed_batch([r.content for r in batch])
+
+        def upsert(item: tuple[list, list[list[float]]]) -> None:
+            batch, vectors = item
+            store.upsert_vectors([
+                {
+                    "id": r.qdrant_point_id or chunk_point_id(r.document_id, r.chunk_index),
+                    "vector": vector,
+                    "tenant_id": str(r.tenant_id),
+                    "department_id": str(r.department_id),
+                    "document_id": str(r.document_id),
+                    "chunk_index": r.chunk_index,
+                    "content": r.content,
+                    "title": r.title,
+                    "page_number": (r.metadata_ or {}).get("page_number"),
+                }
+                for r, vector in zip(batch, vectors)
+            ])
+
+        pipeline = Pipeline(
+            [
+                Stage("embed", embed, workers=settings.REINDEX_EMBED_WORKERS, in_thread=True),
+                Stage("upsert", upsert, workers=2, in_thread=True),
+            ],
+            queue_size=settings.INGEST_QUEUE_SIZE,
+        )
+        await pipeline.run(batched(rows, settings.REINDEX_BATCH_SIZE))
+
+    async def _copy_verified_answers(
+        self, collection: str | None, target: VectorStore, embedder: EmbeddingService
+    ) -> None:
+        """Verified Q&A pairs live only in Qdrant: re-embed their question into *target*.
+
+        Points keep their ID and whole payload, so copying again is harmless.
+        """
+        if not collection:
+            return
+        source = await asyncio.to_thread(VectorStore, self.qdrant_url, collection)
+        records = await asyncio.to_thread(lambda: list(source.scroll_source_type(VERIFIED_SOURCE_TYPE)))
+        for batch in batched(records, settings.REINDEX_BATCH_SIZE):
+            # Stored as "Q: <question>\nA: <answer>"; only the question was embedded.
+            questions = [
+                (r.payload.get("content") or "").split("\nA:", 1)[0].removeprefix("Q: ") for r in batch
+            ]
+            vectors = await asyncio.to_thread(embedder.embed_batch, questions)
+            await asyncio.to_thread(
+                target.upsert_points,
+                [PointStruct(id=r.id, vector=v, payload=r.payload) for r, v in zip(batch, vectors)],
+            )
+        if records:
+            logger.info(f"Re-index: copied {len(records)} verified answers into {target.collection}")
+
+    @staticmethod
+    async def _throttle(items: int, started: float) -> None:
+        limit = settings.REINDEX_MAX_CHUNKS_PER_SECOND
+        if limit > 0:
+            await asyncio.sleep(max(0.0, items / limit - (time.perf_counter() - started)))
@@ -2,67 +2,280 @@
 
 import asyncio
 import logging
-from uuid import UUID
+import os
+import tempfile
+from uuid import UUID, uuid4
 
 from app.services.celery_worker import celery_app
 
 logger = logging.getLogger(__name__)
 
 
+_loop: asyncio.AbstractEventLoop | None = None
+
+
 def _run_async(coro):
-    """Run async function in sync Celery context."""
-    loop = asyncio.new_event_loop()
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+    """Run async function in sync Celery context.
+
+    The loop is kept for the life of the worker process so the async engine's
+    pooled connections (which are bound to the loop that opened them) stay
+    usable across tasks.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
-def ingest_document_task(self, doc_id: str, tenant_id: str, department_id: str, file_path: str, filename: str):
-    """Async task: extract, chunk, embed, and store a document."""
+def ingest_document_task(self, doc_id: str):
+    """Async task: download, extract, chunk, embed, and store a document.
+
+    Dispatched by the ingestion scheduler, never queued directly. Idempotent
+    per document: an already indexed or deleted document is skipped, and a
+    Redis lock keeps duplicate deliveries from ingesting the same document
+    concurrently. When the document finishes, its scheduler slot is handed
+    to the next tenant in line; a failed attempt that will be retried keeps
+    the slot for its retry.
+    """
     try:
-        _run_async(_process_document(doc_id, tenant_id, department_id, file_path, filename))
+        _run_async(_process_document(doc_id, final_attempt=self.request.retries >= self.max_retries))
     except Exception as exc:
         logger.error(f"Document ingestion failed for {doc_id}: {exc}")
         raise self.retry(exc=exc)
 
 
-async def _process_document(doc_id: str, tenant_id: str, department_id: str, file_path: str, filename: str):
+@celery_app.task
+def dispatch_ingestion_job_task(job_id: str):
+    """Submit the pending documents of a batch ingestion job to the scheduler."""
+    _run_async(_dispatch_ingestion_job(job_id))
+
+
+@celery_app.task
+def dispatch_ingestion_queue_task():
+    """Periodic scheduler pass: fills slots whose leases expired without a completion."""
+    _run_async(_dispatch_ingestion_queue())
+
+
+async def _dispatch_ingestion_queue():
+    from app.services.ingestion_scheduler import IngestionScheduler
+
+    scheduler = IngestionScheduler.from_settings()
+    try:
+        sent = await scheduler.dispatch()
+    finally:
+        await scheduler.close()
+    if sent:
+        logger.info(f"Ingestion scheduler tick dispatched {sent} documents")
+
+
+async def _dispatch_ingestion_job(job_id: str):
+    from sqlalchemy import select
+
     from app.db.session import async_session_factory
-    from app.services.rag.ingestion import IngestionService
     from app.models.knowledge import KnowledgeDoc
-    from sqlalchemy import select
+    from app.services.ingestion_scheduler import schedule_ingestion
 
     async with async_session_factory() as db:
-        # Update status to processing
-        result = await db.execute(select(KnowledgeDoc).where(KnowledgeDoc.id == UUID(doc_id)))
-        doc = result.scalar_one_or_none()
-        if not doc:
-            logger.error(f"Document {doc_id} not found")
+        result = await db.execute(
+            select(KnowledgeDoc).where(
+                KnowledgeDoc.ingestion_job_id == UUID(job_id),
+                KnowledgeDoc.status == "pending",
+                KnowledgeDoc.deleted_at.is_(None),
+            )
+        )
+        docs = list(result.scalars().all())
+        await schedule_ingestion(db, docs)
+    logger.info(f"Ingestion job {job_id}: queued {len(docs)} documents")
+
+
+async def _heartbeat(renew, interval: float) -> None:
+    """Call *renew* now and then every *interval* seconds, until cancelled."""
+    while True:
+        try:
+            await renew()
+        except Exception as exc:
+            logger.warning(f"Could not renew lease: {exc}")
+        await asyncio.sleep(interval)
+
+
+async def _renew_lock(client, lock_key: str, lock_token: str) -> None:
+    from app.core.config import settings
+
+    # Only our own lock (it may have expired and been re-taken).
+    if await client.get(lock_key) == lock_token:
+        await client.expire(lock_key, settings.INGESTION_LOCK_TTL_SECONDS)
+
+
+async def _process_document(doc_id: str, final_attempt: bool = True):
+    import redis.asyncio as redis
+    from sqlalchemy import select
+
+    from app.core.config import settings
+    from app.db.session import async_session_factory
+    from app.models.knowledge import KnowledgeDoc
+    from app.services.ingestion_progress import IngestionProgress
+    from app.models.tenant import Tenant
+    from app.services.ingestion_scheduler import IngestionScheduler
+
+    lock_key = f"ingest:lock:{doc_id}"
+    lock_token = str(uuid4())
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    progress = IngestionProgress(settings.REDIS_URL)
+    scheduler = IngestionScheduler(client)
+    locked = False
+    tenant_id = None
+    requeue = None  # (plan tier, size) when the document must wait for a slot again
+    hand_back = True  # False while a retry of this task is still to come
+    heartbeat = None
+    try:
+        if not await client.set(lock_key, lock_token, nx=True, ex=settings.INGESTION_LOCK_TTL_SECONDS):
+            logger.info(f"Document {doc_id} is already being ingested, skipping duplicate task")
             return
+        locked = True
+
+        async with async_session_factory() as db:
+            result = await db.execute(select(KnowledgeDoc).where(KnowledgeDoc.id == UUID(doc_id)))
+            doc = result.scalar_one_or_none()
+            if not doc or doc.deleted_at is not None:
+                logger.warning(f"Document {doc_id} not found or deleted, skipping ingestion")
+                return
+            if doc.status == "indexed":
+                logger.info(f"Document {doc_id} already indexed, skipping")
+                return
+            tenant_id = str(doc.tenant_id)
+            # The scheduler took the slot at dispatch; this refreshes its lease.
+            # It fails only if the lease ran out meanwhile: queue up again.
+            if not await scheduler.slots.acquire(tenant_id, doc_id):
+                await progress.report(doc_id, "queued", 0, 0)
+                plan_tier = await db.scalar(select(Tenant.plan_tier).where(Tenant.id == doc.tenant_id))
+                requeue = (plan_tier, doc.file_size)
+                return
+
+            async def renew() -> None:
+                await _renew_lock(client, lock_key, lock_token)
+                await scheduler.renew(tenant_id, doc_id)
+
+            # Leases are short so a crashed worker's document is picked up again soon.
+            heartbeat = asyncio.create_task(_heartbeat(renew, settings.INGESTION_LOCK_TTL_SECONDS / 3))
+
+            async def report(stage: str, done: int, total: int) -> None:
+                await progress.report(doc_id, stage, done, total)
+
+            await report("downloading", 0, 0)
+            with tempfile.TemporaryDirectory(prefix="ingest-") as tmp:
+                local_path = os.path.join(tmp, os.path.basename(doc.file_path))
+                await asyncio.to_thread(_download, doc.file_path, local_path)
+                if not await _matches_upload(doc, local_path):
+                    # Not the uploaded file: extracting it would also cache it under the wrong hash.
+                    doc.status = "failed"
+                    doc.metadata_ = {**doc.metadata_, "error": "Stored file does not match the upload"}
+                    await db.commit()
+                    await report("failed", 0, 0)
+                    return
+                try:
+                    await _ingest(db, doc, local_path, report)
+                finally:
+                    # Persist the final status (indexed or failed) either way.
+                    await db.commit()
+            logger.info(f"Document {doc_id} ingested: status={doc.status} chunks={doc.chunk_count}")
+    except Exception:
+        hand_back = final_attempt
+        raise
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        if locked and hand_back:
+            try:
+                await scheduler.complete(tenant_id, doc_id)
+            except Exception as exc:
+                logger.warning(f"Could not hand back scheduler slot of {doc_id}: {exc}")
+        # Release only our own lock (it may have expired and been re-taken).
+        if await client.get(lock_key) == lock_token:
+            await client.delete(lock_key)
+        # Only after the lock is gone, or the re-dispatched task would be
+        # dropped as a duplicate of this one.
+        if requeue is not None:
+            await scheduler.submit(tenant_id, doc_id, *requeue)
+        await client.aclose()
+        await progress.close()
+
+
+async def _matches_upload(doc, local_path: str) -> bool:
+    """Whether the downloaded file has the SHA-256 recorded at upload (if one was)."""
+    from app.services.rag.extraction_cache import hash_file
+
+    expected = (doc.metadata_ or {}).get("sha256")
+    if not expected:
+        return True
+    actual = await asyncio.to_thread(hash_file, local_path)
+    if actual != expected:
+        logger.error(f"Document {doc.id}: {doc.file_path} has SHA-256 {actual}, uploaded as {expected}")
+    return actual == expected
+
+
+def _download(object_name: str, local_path: str) -> None:
+    """Stream a knowledge object from MinIO to disk without buffering it in memory."""
+    from app.services.object_storage import KNOWLEDGE_BUCKET, get_minio_client
+
+    get_minio_client().fget_object(KNOWLEDGE_BUCKET, object_name, local_path)
+
+
+async def _ingest(db, doc, local_path: str, report) -> None:
+    from app.services.rag.ingestion import IngestionService
+
+    ingestion = IngestionService(db, progress=report)
+    await ingestion.ingest_document(
+        doc_id=doc.id,
+        tenant_id=doc.tenant_id,
+        department_id=doc.department_id,
+        source=local_path,
+        mime_type=doc.mime_type or "application/octet-stream",
+        content_hash=(doc.metadata_ or {}).get("sha256"),
+        filename=os.path.basename(doc.file_path),
+    )
+
+
+@celery_app.task(bind=True, max_retries=5, default_retry_delay=120)
+def reindex_collection_task(self, job_id: str):
+    """Run (or resume) a blue/green re-index job; progress is kept on the job row."""
+    try:
+        _run_async(_run_reindex(job_id))
+    except Exception as exc:
+        logger.error(f"Re-index job {job_id} failed: {exc}")
+        raise self.retry(exc=exc)
 
-        doc.status = "processing"
-        await db.commit()
 
+async def _run_reindex(job_id: str):
+    import redis.asyncio as redis
+
+    from app.core.config import settings
+    from app.db.session import async_session_factory
+    from app.services.reindex_service import ReindexService
+
+    lock_key = f"reindex:lock:{job_id}"
+    lock_token = str(uuid4())
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        # A resume request while the job is running must not start a second copy.
+        if not await client.set(lock_key, lock_token, nx=True, ex=settings.INGESTION_LOCK_TTL_SECONDS):
+            logger.info(f"Re-index job {job_id} is already running")
+            return
+        heartbeat = asyncio.create_task(
+            _heartbeat(lambda: _renew_lock(client, lock_key, lock_token), settings.INGESTION_LOCK_TTL_SECONDS / 3)
+        )
         try:
-            ingestion = IngestionService()
-            chunk_count = await ingestion.ingest_file(
-                file_path=file_path,
-                filename=filename,
-                doc_id=UUID(doc_id),
-                tenant_id=UUID(tenant_id),
-                department_id=UUID(department_id),
-                db=db,
-            )
-            doc.chunk_count = chunk_count
-            doc.status = "indexed"
-            await db.commit()
-            logger.info(f"Document {doc_id} indexed: {chunk_count} chunks")
-        except Exception as e:
-            doc.status = "failed"
-            await db.commit()
-            raise
+            async with async_session_factory() as db:
+                await ReindexService(db).run(UUID(job_id))
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            if await client.get(lock_key) == lock_token:
+                await client.delete(lock_key)
+    finally:
+        await client.aclose()
 
 
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
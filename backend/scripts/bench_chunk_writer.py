@@ -0,0 +1,101 @@
+"""
+Benchmark KnowledgeChunk persistence: per-row ORM adds vs ChunkWriter.
+
+Runs against the configured PostgreSQL database without touching real
+data: a session-local temp table named ``knowledge_chunks`` (same columns
+and defaults, no foreign keys) shadows the real one, and everything is
+rolled back at the end. Reports rows/sec for
+
+  * orm     -- ``db.add(KnowledgeChunk(...))`` per row, one flush (the old path)
+  * insert  -- ChunkWriter with a Core multi-row INSERT
+  * copy    -- ChunkWriter with asyncpg ``copy_records_to_table``
+
+Usage:
+    python -m scripts.bench_chunk_writer                 # 5000 rows
+    python -m scripts.bench_chunk_writer --rows 50000 --batch-size 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal
+from app.models.knowledge import KnowledgeChunk
+from app.services.rag.chunk_writer import ChunkWriter
+
+CONTENT = "Restart the ingestion worker and confirm the queue depth drops. " * 24
+
+
+def make_rows(count: int) -> list[dict]:
+    doc_id, tenant_id, dept_id = uuid4(), uuid4(), uuid4()
+    return [
+        {
+            "document_id": doc_id,
+            "tenant_id": tenant_id,
+            "department_id": dept_id,
+            "chunk_index": i,
+            "content": CONTENT,
+            "qdrant_point_id": str(uuid4()),
+            "token_count": len(CONTENT) // 4,
+            "metadata": {"title": "Runbook", "page_number": i // 10, "chunk_index": i},
+        }
+        for i in range(count)
+    ]
+
+
+async def write_orm(db, rows: list[dict]) -> None:
+    for row in rows:
+        db.add(
+            KnowledgeChunk(
+                document_id=row["document_id"],
+                tenant_id=row["tenant_id"],
+                department_id=row["department_id"],
+                chunk_index=row["chunk_index"],
+                content=row["content"],
+                qdrant_point_id=row["qdrant_point_id"],
+                token_count=row["token_count"],
+                metadata_=dict(row["metadata"]),
+            )
+        )
+    await db.flush()
+
+
+async def run(rows_count: int, batch_size: int) -> None:
+    async with SessionLocal() as db:
+        await db.execute(
+            text(
+                "CREATE TEMP TABLE knowledge_chunks "
+                "(LIKE public.knowledge_chunks INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+        )
+        try:
+            for label in ("orm", "insert", "copy"):
+                rows = make_rows(rows_count)
+                start = time.perf_counter()
+                if label == "orm":
+                    await write_orm(db, rows)
+                else:
+                    await ChunkWriter(db, batch_size=batch_size, method=label).write(rows)
+                elapsed = time.perf_counter() - start
+                db.expunge_all()
+                await db.execute(text("TRUNCATE knowledge_chunks"))
+                print(f"  {label:<7} {rows_count:>8,} rows  {elapsed:8.3f} s  {rows_count / elapsed:>10,.0f} rows/s")
+        finally:
+            await db.rollback()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bulk KnowledgeChunk persistence")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows per method (default: 5000)")
+    parser.add_argument("--batch-size", type=int, default=500, help="ChunkWriter batch size (default: 500)")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark the per-query overhead of the LangGraph query pipeline.
+
+Runs the real graph with instant stand-ins for retrieval and generation, so
+the numbers are the orchestration cost alone (no Qdrant, Ollama or model
+needed). Reports ms/query for
+
+  * per-query -- ``create_query_graph()`` plus a fresh OllamaClient per query (the old path)
+  * shared    -- ``get_query_graph()`` with one QueryDeps for every query
+
+Usage:
+    python -m scripts.bench_query_graph                  # 200 queries
+    python -m scripts.bench_query_graph --queries 1000 --concurrency 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.agents.graph import QueryDeps, create_query_graph, get_query_graph
+from app.services.llm.ollama_client import OllamaClient
+
+RESULTS = [{"score": 0.9, "content": "Restart the ingestion worker.", "title": "Runbook", "document_id": None}]
+
+
+class InstantRetriever:
+    def retrieve(self, query, tenant_id, department_id, top_k=5):
+        return [dict(r) for r in RESULTS]
+
+    def build_context(self, results, max_tokens=2000):
+        return "\n\n".join(r["content"] for r in results)
+
+
+class InstantLLM(OllamaClient):
+    """A real OllamaClient (its HTTP pool is built) that never calls out."""
+
+    async def chat(self, messages, model=None, **kwargs):
+        return "Restart the ingestion worker, then re-upload the document."
+
+
+def make_state(i: int) -> dict:
+    return {
+        "query": f"Why is document {i} stuck in processing?",
+        "department_id": "dept",
+        "tenant_id": "tenant",
+        "user_id": "user",
+        "image_path": None,
+        "department_config": {},
+        "model_name": "bench",
+        "confidence_threshold": 0.85,
+        "system_prompt": "",
+        "provider_type": None,
+        "provider_base_url": None,
+        "provider_api_key": None,
+        "rag_results": [],
+        "context": "",
+        "answer": "",
+        "confidence": 0.0,
+        "sources": [],
+        "model_used": "",
+        "tokens_input": 0,
+        "tokens_output": 0,
+        "latency_ms": 0.0,
+        "has_verified_answers": False,
+        "needs_approval": False,
+        "error": None,
+    }
+
+
+async def per_query(i: int, retriever: InstantRetriever) -> None:
+    deps = QueryDeps(retriever=retriever, ollama=InstantLLM())
+    try:
+        await create_query_graph().ainvoke(make_state(i), {"configurable": {"deps": deps}})
+    finally:
+        await deps.aclose()
+
+
+async def run(mode: str, queries: int, concurrency: int) -> list[float]:
+    retriever = InstantRetriever()
+    shared = QueryDeps(retriever=retriever, ollama=InstantLLM())
+    config = {"configurable": {"deps": shared}}
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "per-query":
+                await per_query(i, retriever)
+            else:
+                await get_query_graph().ainvoke(make_state(i), config)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await one(-1)  # warm imports and the cached graph
+    timings.clear()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    await shared.aclose()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark query graph overhead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.queries} queries, concurrency {args.concurrency}")
+    for mode in ("per-query", "shared"):
+        start = time.perf_counter()
+        timings = asyncio.run(run(mode, args.queries, args.concurrency))
+        elapsed = time.perf_counter() - start
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(
+            f"  {mode:<10} mean {statistics.mean(timings):7.2f} ms   "
+            f"p95 {p95:7.2f} ms   {args.queries / elapsed:7.1f} queries/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Creates the following default buckets (if they do not already exist):
   - knowledge-docs   : uploaded knowledge-base documents (PDF, DOCX, etc.)
   - user-uploads      : user-submitted files and images
   - model-artifacts   : serialised model weights / config snapshots
+  - extraction-cache  : compressed extracted text, keyed by file content hash
 
 Usage:
     python -m scripts.init_minio                          # defaults
@@ -23,6 +24,7 @@ DEFAULT_BUCKETS = [
     "knowledge-docs",
     "user-uploads",
     "model-artifacts",
+    "extraction-cache",
 ]
 
 
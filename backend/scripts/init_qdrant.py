@@ -5,6 +5,7 @@ Creates the 'knowledge_vectors' collection with:
   - Vector size 1024 (BGE-large-en-v1.5 embedding dimension)
   - Cosine distance metric
   - Payload indexes for tenant_id, department_id, document_id, chunk_index
+  - The 'knowledge' alias the API reads through (re-pointed by re-index jobs)
 
 Usage:
     python -m scripts.init_qdrant          # uses default localhost:6333
@@ -18,12 +19,15 @@ import sys
 
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import (
+    CreateAlias,
+    CreateAliasOperation,
     Distance,
     VectorParams,
     PayloadSchemaType,
 )
 
 COLLECTION_NAME = "knowledge_vectors"
+COLLECTION_ALIAS = "knowledge"
 VECTOR_SIZE = 1024  # BGE-large-en-v1.5
 
 
@@ -65,6 +69,23 @@ def create_payload_indexes(client: QdrantClient) -> None:
         print(f"[ok]   Payload index created: {field_name} ({schema_type.value})")
 
 
+def create_alias(client: QdrantClient) -> None:
+    """Point the 'knowledge' alias at the collection unless an alias already exists."""
+
+    if any(a.alias_name == COLLECTION_ALIAS for a in client.get_aliases().aliases):
+        print(f"[skip] Alias '{COLLECTION_ALIAS}' already exists.")
+        return
+
+    client.update_collection_aliases(
+        change_aliases_operations=[
+            CreateAliasOperation(
+                create_alias=CreateAlias(collection_name=COLLECTION_NAME, alias_name=COLLECTION_ALIAS)
+            )
+        ]
+    )
+    print(f"[ok]   Alias '{COLLECTION_ALIAS}' -> '{COLLECTION_NAME}' created.")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Initialize Qdrant knowledge_vectors collection")
     parser.add_argument("--host", default="localhost", help="Qdrant host (default: localhost)")
@@ -77,6 +98,7 @@ def main() -> None:
     try:
         create_collection(client)
         create_payload_indexes(client)
+        create_alias(client)
         print("\nQdrant initialization complete.")
     except Exception as exc:
         print(f"\n[error] Failed to initialize Qdrant: {exc}", file=sys.stderr)
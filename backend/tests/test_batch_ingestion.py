@@ -0,0 +1,127 @@
+"""Tests for unpacking batch ingestion archives."""
+
+import io
+import tarfile
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.exceptions import BadRequestError
+from app.services import batch_ingestion_service
+from app.services.batch_ingestion_service import _member_name, _stat_manifest, _store_archive
+
+FILES = {
+    "wiki/runbooks/restart.md": b"# Restart\nRun make restart.",
+    "wiki/tickets.csv": b"id,status\n1,open\n",
+    "wiki/logo.png": b"\x89PNG",
+    "__MACOSX/wiki/._restart.md": b"junk",
+}
+
+
+@pytest.fixture
+def uploaded(monkeypatch):
+    objects = {}
+
+    def fake_put_stream(bucket, object_name, stream, content_type):
+        data = stream.read()
+        objects[object_name] = data
+        return len(data), "0" * 64
+
+    monkeypatch.setattr(batch_ingestion_service, "put_stream", fake_put_stream)
+    return objects
+
+
+def _zip() -> io.BytesIO:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in FILES.items():
+            zf.writestr(name, data)
+    return buf
+
+
+def _tar() -> io.BytesIO:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf
+
+
+@pytest.mark.parametrize("make_archive", [_zip, _tar])
+def test_store_archive_streams_supported_members(uploaded, make_archive):
+    stored, skipped = _store_archive(make_archive(), "dump", "tenant-1/dept-2/job-3")
+
+    assert sorted(f.name for f in stored) == ["wiki/runbooks/restart.md", "wiki/tickets.csv"]
+    assert uploaded["tenant-1/dept-2/job-3/wiki/tickets.csv"] == FILES["wiki/tickets.csv"]
+    assert skipped == [{"name": "wiki/logo.png", "reason": "unsupported file type"}]
+
+
+def test_store_archive_rejects_other_files(uploaded):
+    with pytest.raises(BadRequestError):
+        _store_archive(io.BytesIO(b"not an archive"), "notes.txt", "prefix")
+
+
+def test_member_name_blocks_traversal():
+    assert _member_name("../../etc/passwd.txt") is None
+    assert _member_name("/abs/doc.md") == "abs/doc.md"
+    assert _member_name("docs/.hidden.md") is None
+
+
+def test_stat_manifest_skips_unsupported_keys_without_a_stat(monkeypatch):
+    statted = []
+
+    def stat_object(bucket, key):
+        statted.append(key)
+        return SimpleNamespace(content_type="text/markdown", size=len(FILES[key]))
+
+    monkeypatch.setattr(batch_ingestion_service, "get_minio_client", lambda: SimpleNamespace(stat_object=stat_object))
+
+    stored, skipped = _stat_manifest(["wiki/runbooks/restart.md", "wiki/logo.png"])
+
+    assert [f.name for f in stored] == ["restart.md"]
+    assert skipped == [{"name": "wiki/logo.png", "reason": "unsupported file type"}]
+    assert statted == ["wiki/runbooks/restart.md"]
+
+
+class FakeSession:
+    def __init__(self):
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def add_all(self, objs):
+        self.added.extend(objs)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+async def test_job_documents_fail_when_the_job_cannot_be_queued(monkeypatch):
+    from app.models.knowledge import KnowledgeDoc
+    from app.services.batch_ingestion_service import BatchIngestionService, StoredFile
+
+    calls = []
+
+    def apply_async(*args, **kwargs):
+        calls.append(kwargs)
+        raise ConnectionError("broker down")
+
+    stored = [StoredFile("restart.md", "tenant-1/wiki/restart.md", "text/markdown", 10)]
+    monkeypatch.setattr(batch_ingestion_service, "_stat_manifest", lambda keys: (stored, []))
+    monkeypatch.setattr(batch_ingestion_service.dispatch_ingestion_job_task, "apply_async", apply_async)
+    db = FakeSession()
+
+    await BatchIngestionService(db).create_from_manifest("1", "2", None, ["tenant-1/wiki/restart.md"])
+
+    # Routed by celery_worker's task_routes, not pinned to the bulk queue.
+    assert "queue" not in calls[0]
+    docs = [obj for obj in db.added if isinstance(obj, KnowledgeDoc)]
+    assert [d.status for d in docs] == ["failed"]
+    assert "broker down" in docs[0].metadata_["error"]
@@ -0,0 +1,95 @@
+"""Tests for the batch query runner."""
+
+import asyncio
+
+from app.agents.graph import QueryDeps
+from app.core.config import settings
+from app.core.exceptions import LLMOverloadedError
+from app.services import batch_query_service
+from app.services.batch_query_service import BatchQueryService
+
+
+class BatchRetriever:
+    def __init__(self):
+        self.batches: list[list[str]] = []
+
+    def retrieve_batch(self, queries, tenant_id, department_id, top_k=5):
+        self.batches.append(queries)
+        return [[{"score": 0.8, "content": f"About {q}", "title": "FAQ"}] for q in queries]
+
+    def retrieve(self, query, tenant_id, department_id, top_k=5):
+        raise AssertionError("questions should be retrieved in batches")
+
+    def build_context(self, results, max_tokens=2000):
+        return "\n".join(r["content"] for r in results)
+
+
+class CountingLLM:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def chat(self, messages, model=None, **kwargs):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return "See the FAQ."
+
+    async def close(self):
+        pass
+
+
+def _template() -> dict:
+    return {
+        "query": "",
+        "department_id": "dept",
+        "tenant_id": "tenant",
+        "user_id": "00000000-0000-0000-0000-000000000010",
+        "image_path": None,
+        "department_config": {},
+        "model_name": "test-model",
+        "confidence_threshold": 0.85,
+        "system_prompt": "",
+        "provider_type": None,
+        "provider_base_url": None,
+        "provider_api_key": None,
+    }
+
+
+async def test_batch_retrieves_in_windows_and_caps_concurrency(monkeypatch):
+    retriever, llm = BatchRetriever(), CountingLLM()
+    monkeypatch.setattr(batch_query_service, "get_query_deps", lambda: QueryDeps(retriever=retriever, ollama=llm))
+    monkeypatch.setattr(settings, "QUERY_BATCH_RETRIEVE_SIZE", 3)
+    queries = [{"id": f"q{i}", "text": f"question {i}"} for i in range(7)]
+
+    rows = [row async for row in BatchQueryService(None).run(_template(), queries, persist=False, concurrency=2)]
+
+    assert [len(batch) for batch in retriever.batches] == [3, 3, 1]
+    answers, summary = rows[:-1], rows[-1]["summary"]
+    assert sorted(r["index"] for r in answers) == list(range(7))
+    assert all(r["answer"] == "See the FAQ." and r["id"] == f"q{r['index']}" for r in answers)
+    assert all(r["sources"][0]["chunk"] == f"About question {r['index']}" for r in answers)
+    assert summary["total"] == 7 and summary["errors"] == 0
+    assert llm.peak == 2
+
+
+class OverloadedLLM:
+    async def chat(self, messages, model=None, **kwargs):
+        raise LLMOverloadedError("No generation slot free")
+
+    async def close(self):
+        pass
+
+
+async def test_batch_reports_overloaded_generations_as_errors(monkeypatch):
+    retriever = BatchRetriever()
+    monkeypatch.setattr(batch_query_service, "get_query_deps", lambda: QueryDeps(retriever=retriever, ollama=OverloadedLLM()))
+    queries = [{"id": "q0", "text": "question 0"}]
+
+    rows = [row async for row in BatchQueryService(None).run(_template(), queries, persist=False)]
+
+    row, summary = rows[0], rows[-1]["summary"]
+    assert row["answer"] == "" and row["error"]
+    assert "llm_overloaded" in row["degradations"]
+    assert summary["errors"] == 1
@@ -0,0 +1,33 @@
+"""Tests for the bulk chunk writer (Core INSERT path; COPY needs PostgreSQL)."""
+
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.knowledge import KnowledgeChunk
+from app.services.rag.chunk_writer import ChunkWriter
+
+
+@pytest.mark.asyncio
+async def test_chunk_writer_batches_rows():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: KnowledgeChunk.__table__.create(sync_conn))
+
+    doc_id = uuid4()
+    async with async_sessionmaker(engine)() as db:
+        writer = ChunkWriter(db, batch_size=3)
+        for i in range(7):
+            await writer.add(doc_id, doc_id, doc_id, i, f"chunk {i}", f"point-{i}", 2, {"page_number": i})
+        assert writer.written == 6  # two full batches, one row still buffered
+
+        await writer.flush()
+        rows = (await db.execute(select(KnowledgeChunk).order_by(KnowledgeChunk.chunk_index))).scalars().all()
+
+    assert writer.written == 7
+    assert [r.chunk_index for r in rows] == list(range(7))
+    assert rows[4].metadata_ == {"page_number": 4}
+    assert rows[4].qdrant_point_id == "point-4"
+    await engine.dispose()
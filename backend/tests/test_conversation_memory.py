@@ -0,0 +1,21 @@
+"""Tests for conversation memory."""
+
+from types import SimpleNamespace
+
+from app.services.conversation_memory import fit_turns
+
+
+def _messages(*texts: str) -> list:
+    return [SimpleNamespace(role="user", content=text) for text in texts]
+
+
+def test_fit_turns_keeps_the_newest_turns_within_the_budget():
+    messages = _messages("one two three", "four five", "six")
+
+    assert [m.content for m in fit_turns(messages, budget=4, max_messages=10)] == ["four five", "six"]
+
+
+def test_fit_turns_caps_the_number_of_turns():
+    messages = _messages("a", "b", "c", "d")
+
+    assert [m.content for m in fit_turns(messages, budget=1000, max_messages=2)] == ["c", "d"]
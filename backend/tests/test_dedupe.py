@@ -0,0 +1,248 @@
+"""Tests for MinHash near-duplicate detection."""
+
+import io
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models.knowledge import KnowledgeChunk, KnowledgeDoc
+from app.services.rag import ingestion
+from app.services.rag.dedupe import ChunkDeduper, DedupeIndex, MinHasher, lsh_params
+from app.services.rag.extraction_cache import ExtractionCache
+from app.services.rag.ingestion import IngestionService, chunk_point_id, promote_duplicates
+
+POLICY = " ".join(
+    f"Section {i}: employees must submit expense reports within thirty days of travel "
+    f"and attach itemised receipts for every purchase above fifty dollars."
+    for i in range(12)
+)
+
+
+def test_minhash_estimates_similarity():
+    hasher = MinHasher()
+    revised = POLICY.replace("thirty days", "forty five days", 1)
+    unrelated = "Quarterly revenue grew in the enterprise segment after new contracts in Europe. " * 10
+
+    assert MinHasher.jaccard(hasher.signature(POLICY), hasher.signature(POLICY)) == 1.0
+    assert MinHasher.jaccard(hasher.signature(POLICY), hasher.signature(revised)) > 0.85
+    assert MinHasher.jaccard(hasher.signature(POLICY), hasher.signature(unrelated)) < 0.1
+
+
+def test_lsh_params_cover_all_permutations():
+    for threshold in (0.5, 0.8, 0.9, 0.95):
+        bands, rows = lsh_params(threshold, 128)
+        assert bands * rows == 128
+
+
+def test_deduper_fails_open_without_redis():
+    class DownRedis:
+        def pipeline(self, transaction=True):
+            raise ConnectionError("redis down")
+
+    deduper = ChunkDeduper(DedupeIndex(DownRedis(), "dept", 0.9, MinHasher()), "link")
+
+    assert deduper.check("point-1", POLICY) is None
+    assert not deduper.enabled
+
+
+class FakeRedis:
+    """The hash commands DedupeIndex uses, on plain dicts."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[str, bytes]] = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.hget(key, f) for f in fields]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hsetnx(self, key, field, value):
+        self.hashes.setdefault(key, {}).setdefault(field, value.encode() if isinstance(value, str) else value)
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    def eval(self, script, numkeys, key, field, owner):
+        # Delete-if-owner, as in DedupeIndex.remove.
+        if self.hget(key, field) == owner.encode():
+            self.hdel(key, field)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+REVISED = POLICY.replace("thirty days", "forty five days", 1)
+
+
+def test_index_finds_near_duplicates_and_forgets_removed_points():
+    redis = FakeRedis()
+    index = DedupeIndex(redis, "dept", 0.8, MinHasher())
+
+    assert index.check_and_add("p1", POLICY).canonical_id is None
+    assert index.check_and_add("p2", REVISED).canonical_id == "p1"
+    assert index.check_and_add("p3", "Quarterly revenue grew after new contracts in Europe. " * 10).canonical_id is None
+
+    index.remove(["p1"])
+    assert not any("p1".encode() in h.values() for h in redis.hashes.values())
+    assert "p3" in redis.hashes["dedup:dept:sig"]
+    # With p1 gone, the revision is a canonical of its own.
+    assert index.check_and_add("p2", REVISED).canonical_id is None
+
+
+def test_deduper_registers_canonicals_only_when_asked():
+    redis = FakeRedis()
+    deduper = ChunkDeduper(DedupeIndex(redis, "dept", 0.8, MinHasher()), "link")
+
+    assert deduper.check("p1", POLICY) is None
+    # Matched within the run before its vector is stored...
+    assert deduper.check("p2", REVISED) == "p1"
+    # ...but invisible to other runs until registered.
+    other_run = ChunkDeduper(DedupeIndex(redis, "dept", 0.8, MinHasher()), "link")
+    assert other_run.check("p3", REVISED) is None
+
+    deduper.register(["p1"])
+    assert ChunkDeduper(DedupeIndex(redis, "dept", 0.8, MinHasher()), "link").check("p4", REVISED) == "p1"
+
+
+class FakeVectorStore:
+    points: dict[str, dict] = {}
+    embedding_model = None
+
+    def __init__(self, url=None):
+        pass
+
+    def upsert_vectors(self, points):
+        self.points.update({p["id"]: p for p in points})
+
+    def delete_by_document(self, document_id):
+        for point_id in [k for k, p in self.points.items() if p["document_id"] == document_id]:
+            del self.points[point_id]
+
+
+class CountingEmbedder:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.embedded = 0
+
+    def embed_batch(self, texts):
+        if self.fail:
+            raise RuntimeError("embedding worker lost")
+        self.embedded += len(texts)
+        return [[0.0] for _ in texts]
+
+
+@pytest.fixture
+async def ingest(monkeypatch, tmp_path):
+    """ingest(title, mode, fail=False) -> document ID, over SQLite, a fake Qdrant and a fake Redis."""
+    monkeypatch.setattr(ingestion, "VectorStore", FakeVectorStore)
+    monkeypatch.setattr(settings, "INGEST_UPSERT_WORKERS", 1)
+    FakeVectorStore.points = {}
+    redis = FakeRedis()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/dedupe.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            lambda c: KnowledgeDoc.metadata.create_all(c, tables=[KnowledgeDoc.__table__, KnowledgeChunk.__table__])
+        )
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    tenant_id, department_id = uuid4(), uuid4()
+    text = "\n\n".join(f"Section {i}: " + " ".join(f"term{i}n{j}" for j in range(300)) for i in range(4))
+
+    def deduper(mode):
+        return ChunkDeduper(DedupeIndex(redis, str(department_id), 0.8, MinHasher()), mode)
+
+    async def run(title: str, mode: str, fail: bool = False):
+        monkeypatch.setattr(ChunkDeduper, "for_department", classmethod(lambda cls, dept: deduper(mode)))
+        doc_id = uuid4()
+        async with session_factory() as db:
+            db.add(KnowledgeDoc(id=doc_id, tenant_id=tenant_id, department_id=department_id,
+                                title=title, status="pending", metadata_={}))
+            await db.commit()
+            service = IngestionService(db)
+            service.extraction_cache = ExtractionCache(None)
+            service.embedder = CountingEmbedder(fail)
+            try:
+                await service.ingest_document(doc_id, tenant_id, department_id, io.BytesIO(text.encode()), "text/plain")
+            except RuntimeError:
+                pass
+            await db.commit()
+        return doc_id
+
+    run.session_factory, run.redis, run.deduper = session_factory, redis, deduper
+    yield run
+    await engine.dispose()
+
+
+async def _chunks(session_factory, doc_id) -> list[KnowledgeChunk]:
+    async with session_factory() as db:
+        stmt = select(KnowledgeChunk).where(KnowledgeChunk.document_id == doc_id).order_by(KnowledgeChunk.chunk_index)
+        return list((await db.execute(stmt)).scalars().all())
+
+
+async def test_link_mode_points_duplicates_at_canonical_vectors(ingest):
+    original = await ingest("Policy", "link")
+    copy = await ingest("Policy (copy)", "link")
+
+    originals, copies = await _chunks(ingest.session_factory, original), await _chunks(ingest.session_factory, copy)
+    assert len(copies) == len(originals) > 1
+    assert all(c.metadata_["duplicate_of"] == c.qdrant_point_id for c in copies)
+    assert {c.qdrant_point_id for c in copies} <= {o.qdrant_point_id for o in originals}
+    assert all(p["document_id"] == str(original) for p in FakeVectorStore.points.values())
+
+
+async def test_skip_mode_stores_no_duplicate_rows(ingest):
+    await ingest("Policy", "skip")
+    copy = await ingest("Policy (copy)", "skip")
+
+    assert await _chunks(ingest.session_factory, copy) == []
+
+
+async def test_failed_run_registers_no_canonicals(ingest):
+    await ingest("Policy", "link", fail=True)
+
+    assert not ingest.redis.hashes.get(f"dedup:{ingest.deduper('link').index.department_id}:sig")
+    assert FakeVectorStore.points == {}
+
+
+async def test_deleting_canonical_promotes_a_linked_duplicate(ingest):
+    original = await ingest("Policy", "link")
+    copy = await ingest("Policy (copy)", "link")
+    third = await ingest("Policy (third)", "link")
+
+    async with ingest.session_factory() as db:
+        deduper = ingest.deduper("link")
+        promoted = await promote_duplicates(db, original, FakeVectorStore(), deduper, CountingEmbedder())
+        FakeVectorStore().delete_by_document(str(original))
+        await db.commit()
+
+    copies, thirds = await _chunks(ingest.session_factory, copy), await _chunks(ingest.session_factory, third)
+    # One of the linked documents now owns the vectors; the other links to it.
+    if "duplicate_of" in copies[0].metadata_:
+        copy, third, copies, thirds = third, copy, thirds, copies
+    assert promoted == len(copies) > 1
+    assert all(c.qdrant_point_id == chunk_point_id(copy, c.chunk_index) for c in copies)
+    assert all("duplicate_of" not in c.metadata_ for c in copies)
+    assert set(FakeVectorStore.points) == {c.qdrant_point_id for c in copies}
+    assert all(t.metadata_["duplicate_of"] == t.qdrant_point_id for t in thirds)
+    assert {t.qdrant_point_id for t in thirds} <= set(FakeVectorStore.points)
+    # New documents dedupe against the promoted chunks.
+    assert deduper.check("new", copies[0].content) == copies[0].qdrant_point_id
@@ -0,0 +1,89 @@
+"""Tests for the content-addressed extraction cache."""
+
+import os
+
+from app.services.rag.extraction_cache import ExtractionCache, LocalDiskBackend, hash_file
+from app.services.rag.extractor import ExtractedSection
+
+
+class CountingExtractor:
+    def __init__(self):
+        self.calls = 0
+
+    def extract_sections(self, source, mime_type, filename=None):
+        self.calls += 1
+        yield ExtractedSection(text="Reset the VPN token from the portal.", metadata={"page_number": 1})
+        yield ExtractedSection(text="Escalate to the network team if it fails.", metadata={"page_number": 2})
+
+
+def test_duplicate_content_skips_extraction(tmp_path):
+    doc = tmp_path / "runbook.pdf"
+    doc.write_bytes(b"%PDF same bytes uploaded twice")
+    cache = ExtractionCache(LocalDiskBackend(str(tmp_path / "cache")))
+    extractor = CountingExtractor()
+    content_hash = hash_file(str(doc))
+
+    first = list(cache.extract_sections(extractor, str(doc), "application/pdf", content_hash))
+    second = list(cache.extract_sections(extractor, str(doc), "application/pdf", content_hash))
+
+    assert extractor.calls == 1
+    assert second == first
+    assert second[1].metadata == {"page_number": 2}
+
+
+def test_disabled_cache_always_extracts(tmp_path):
+    cache = ExtractionCache(None)
+    extractor = CountingExtractor()
+
+    list(cache.extract_sections(extractor, "a.pdf", "application/pdf", "abc"))
+    list(cache.extract_sections(extractor, "a.pdf", "application/pdf", "abc"))
+
+    assert extractor.calls == 2
+
+
+def test_lru_eviction_removes_least_recently_used(tmp_path):
+    backend = LocalDiskBackend(str(tmp_path))
+    for i, key in enumerate(["aa-old", "bb-used", "cc-new"]):
+        backend.put(key, b"x" * 100)
+        path = backend._path(key)
+        os.utime(path, (1000 + i, 1000 + i))
+    backend.get("aa-old")  # touching makes it the most recently used
+
+    removed = backend.evict(max_bytes=200)
+
+    assert removed == 1
+    assert backend.get("bb-used") is None
+    assert backend.get("aa-old") is not None
+    assert backend.get("cc-new") is not None
+
+
+def test_extraction_with_skipped_pages_is_not_cached(tmp_path):
+    class TimingOutExtractor(CountingExtractor):
+        def extract_sections(self, source, mime_type, filename=None):
+            yield from super().extract_sections(source, mime_type, filename)
+            self.skipped_pages = [3]
+
+    cache = ExtractionCache(LocalDiskBackend(str(tmp_path)))
+    extractor = TimingOutExtractor()
+
+    list(cache.extract_sections(extractor, "a.pdf", "application/pdf", "abc"))
+    list(cache.extract_sections(extractor, "a.pdf", "application/pdf", "abc"))
+
+    assert extractor.calls == 2
+    assert cache.get("abc") is None
+
+
+def test_eviction_scans_only_when_over_budget(tmp_path, monkeypatch):
+    backend = LocalDiskBackend(str(tmp_path))
+    backend.put("aa-first", b"x" * 100)
+    assert backend.evict(max_bytes=250) == 0  # first call scans to learn the size
+
+    scans = []
+    monkeypatch.setattr(type(backend.root), "glob", lambda self, pattern: scans.append(pattern) or iter(()))
+    backend.put("bb-second", b"x" * 100)
+    assert backend.evict(max_bytes=250) == 0
+    assert scans == []
+
+    backend.put("cc-third", b"x" * 100)
+    backend.evict(max_bytes=250)
+    assert len(scans) == 1
@@ -0,0 +1,124 @@
+"""Tests for document extraction and section-aware chunking."""
+
+from app.services.rag.chunker import TextChunker
+from app.services.rag.extractor import DocumentExtractor, ExtractedSection
+
+
+def _write_pdf(path, pages: list[str]) -> None:
+    """Write a minimal multi-page PDF with one line of Helvetica text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def test_pdf_parallel_pages_in_order(tmp_path):
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, [f"Page {i} troubleshooting notes" for i in range(1, 7)])
+
+    extractor = DocumentExtractor(pdf_workers=3, pdf_parallel_min_pages=1)
+    sections = list(extractor.extract_sections(str(pdf), "application/pdf"))
+
+    assert [s.metadata["page_number"] for s in sections] == [1, 2, 3, 4, 5, 6]
+    assert sections[3].text == "Page 4 troubleshooting notes"
+
+
+def test_pdf_serial_matches_parallel(tmp_path):
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, [f"Page {i} troubleshooting notes" for i in range(1, 4)])
+
+    serial = DocumentExtractor(pdf_workers=1).extract(str(pdf), "application/pdf")
+    parallel = DocumentExtractor(pdf_workers=2, pdf_parallel_min_pages=1).extract(str(pdf), "application/pdf")
+
+    assert serial == parallel
+
+
+def test_chunk_sections_keeps_page_numbers():
+    chunker = TextChunker(chunk_size=512)
+    sections = [
+        ExtractedSection(text="First page talks about restarting the API server.", metadata={"page_number": 1}),
+        ExtractedSection(text="Second page covers rotating the database credentials.", metadata={"page_number": 2}),
+    ]
+
+    chunks = chunker.chunk_sections(sections, metadata={"title": "Runbook"})
+
+    assert [c["chunk_index"] for c in chunks] == [0, 1]
+    assert [c["metadata"]["page_number"] for c in chunks] == [1, 2]
+    assert all(c["metadata"]["title"] == "Runbook" for c in chunks)
+    assert all(c["metadata"]["total_chunks"] == 2 for c in chunks)
+
+
+def test_csv_row_groups_repeat_header(tmp_path):
+    path = tmp_path / "tickets.csv"
+    path.write_text("id,host,status\n" + "".join(f"{i},web-{i},open\n" for i in range(1, 41)))
+
+    sections = list(DocumentExtractor(csv_group_chars=120).extract_sections(str(path), "text/csv"))
+
+    assert len(sections) > 1
+    assert all(s.text.startswith("id | host | status\n") for s in sections)
+    assert sections[0].metadata["row_start"] == 1
+    assert sections[-1].metadata["row_end"] == 40
+    for prev, nxt in zip(sections, sections[1:]):
+        assert nxt.metadata["row_start"] == prev.metadata["row_end"] + 1
+
+
+def test_streaming_html_matches_soup(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><title>Runbook</title><script>track()</script></head><body>"
+        "<header>Corp</header><nav><a>Home</a></nav><h1>Restart</h1>"
+        "<p>Run <code>make restart</code> then verify.</p><footer>(c)</footer></body></html>"
+    )
+    extractor = DocumentExtractor(html_section_chars=10)
+
+    assert extractor._extract_html(str(path)) == extractor._extract_html_soup(str(path))
+    assert "track()" not in extractor.extract(str(path), "text/html")
+
+
+def test_pdf_from_unnamed_spool_uses_worker_pool(tmp_path):
+    import tempfile
+
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, [f"Page {i} troubleshooting notes" for i in range(1, 5)])
+    spool = tempfile.SpooledTemporaryFile(max_size=16)
+    spool.write(pdf.read_bytes())
+
+    extractor = DocumentExtractor(pdf_workers=2, pdf_parallel_min_pages=1)
+    sections = list(extractor.extract_sections(spool, "application/octet-stream", filename="manual.pdf"))
+
+    assert [s.metadata["page_number"] for s in sections] == [1, 2, 3, 4]
+
+
+def test_csv_from_stream_leaves_stream_open():
+    import io
+
+    stream = io.BytesIO(b"id,host\n1,web-1\n2,web-2\n")
+
+    text = DocumentExtractor().extract(stream, "text/csv")
+
+    assert text == "id | host\n1 | web-1\n2 | web-2"
+    assert not stream.closed
@@ -0,0 +1,121 @@
+"""Tests for the staged ingestion pipeline."""
+
+import asyncio
+
+import pytest
+
+from app.services.rag.pipeline import Pipeline, Stage
+
+
+@pytest.mark.asyncio
+async def test_pipeline_runs_every_item_through_every_stage():
+    seen: list[int] = []
+
+    async def collect(item: int) -> None:
+        seen.append(item)
+
+    pipeline = Pipeline(
+        [
+            Stage("double", lambda x: x * 2, in_thread=True),
+            Stage("increment", lambda x: x + 1, workers=3),
+            Stage("collect", collect),
+        ],
+        queue_size=2,
+    )
+    stats = await pipeline.run(range(20))
+
+    assert sorted(seen) == [x * 2 + 1 for x in range(20)]
+    assert {name: s.items for name, s in stats.items()} == {
+        "source": 20, "double": 20, "increment": 20, "collect": 20,
+    }
+
+
+@pytest.mark.asyncio
+async def test_pipeline_applies_backpressure():
+    produced: list[int] = []
+
+    def source():
+        for i in range(50):
+            produced.append(i)
+            yield i
+
+    max_ahead = 0
+    consumed = 0
+
+    async def slow(item: int) -> None:
+        nonlocal consumed, max_ahead
+        await asyncio.sleep(0.001)
+        consumed += 1
+        max_ahead = max(max_ahead, len(produced) - consumed)
+
+    await Pipeline([Stage("slow", slow)], queue_size=3).run(source())
+
+    # Queue capacity, plus the item being handled and the one waiting on put().
+    assert max_ahead <= 3 + 2
+
+
+@pytest.mark.asyncio
+async def test_pipeline_failure_cancels_and_propagates():
+    persisted: list[int] = []
+
+    def embed(item: int) -> int:
+        if item == 5:
+            raise RuntimeError("embedding model crashed")
+        return item
+
+    async def persist(item: int) -> None:
+        persisted.append(item)
+
+    pipeline = Pipeline([Stage("embed", embed, in_thread=True), Stage("persist", persist)])
+    with pytest.raises(RuntimeError, match="embedding model crashed"):
+        await pipeline.run(range(1000))
+
+    assert 5 not in persisted
+    assert len(persisted) < 1000
+
+
+@pytest.mark.asyncio
+async def test_pipeline_failure_cancels_sibling_workers():
+    cancelled = asyncio.Event()
+
+    async def work(item: int) -> int:
+        if item == 0:
+            await asyncio.sleep(0.01)
+            raise ValueError("bad item")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return item
+
+    pipeline = Pipeline([Stage("work", work, workers=2)], queue_size=2)
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(pipeline.run(range(2)), 1.0)
+
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stage_failing_while_draining_does_not_hang():
+    collected: list[int] = []
+
+    async def embed(item: int) -> int:
+        if item == 3:
+            raise ValueError("embedding failed")
+        return item
+
+    async def upsert(item: int) -> int:
+        await asyncio.sleep(0.02)
+        if item == 2:
+            raise ConnectionError("upsert failed")
+        return item
+
+    async def collect(item: int) -> None:
+        collected.append(item)
+
+    pipeline = Pipeline([Stage("embed", embed), Stage("upsert", upsert), Stage("collect", collect)], queue_size=4)
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(pipeline.run(range(10)), 1.0)
+
+    assert collected == [0, 1]
@@ -0,0 +1,111 @@
+"""Tests for checkpointed, resumable ingestion."""
+
+import io
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models.knowledge import KnowledgeChunk, KnowledgeDoc
+from app.services.rag import ingestion
+from app.services.rag.extraction_cache import ExtractionCache
+from app.services.rag.ingestion import IngestionService, _Checkpoint, chunk_point_id
+
+
+class FakeVectorStore:
+    points: dict[str, int] = {}
+    embedding_model = None
+
+    def __init__(self, url=None):
+        pass
+
+    def upsert_vectors(self, points):
+        for p in points:
+            self.points[p["id"]] = p["chunk_index"]
+
+    def delete_by_document(self, document_id):
+        self.points.clear()
+
+
+class FlakyEmbedder:
+    def __init__(self, fail_at: int | None):
+        self.fail_at = fail_at
+        self.embedded = 0
+
+    def embed_batch(self, texts):
+        if self.fail_at is not None and self.embedded >= self.fail_at:
+            raise RuntimeError("worker lost")
+        self.embedded += len(texts)
+        return [[0.0] for _ in texts]
+
+
+def test_checkpoint_advances_over_contiguous_batches_only():
+    checkpoint = _Checkpoint("k")
+    checkpoint.mark_done(10, 20)
+    assert checkpoint.next_chunk == 0
+    checkpoint.mark_done(0, 10)
+    assert checkpoint.next_chunk == 20
+    assert _Checkpoint.resume(checkpoint.as_dict(), "k").next_chunk == 20
+    assert _Checkpoint.resume(checkpoint.as_dict(), "other").next_chunk == 0
+
+
+def test_point_ids_are_deterministic():
+    doc_id = uuid4()
+    assert chunk_point_id(doc_id, 3) == chunk_point_id(doc_id, 3)
+    assert chunk_point_id(doc_id, 3) != chunk_point_id(doc_id, 4)
+
+
+@pytest.mark.asyncio
+async def test_retry_resumes_from_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingestion, "VectorStore", FakeVectorStore)
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 5)
+    monkeypatch.setattr(settings, "INGEST_CHECKPOINT_CHUNKS", 10)
+    monkeypatch.setattr(settings, "INGEST_UPSERT_WORKERS", 1)
+    monkeypatch.setattr(settings, "DEDUP_MODE", "off")
+    FakeVectorStore.points = {}
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/ingest.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            lambda c: KnowledgeDoc.metadata.create_all(c, tables=[KnowledgeDoc.__table__, KnowledgeChunk.__table__])
+        )
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    ids = dict(doc_id=uuid4(), tenant_id=uuid4(), department_id=uuid4())
+    text = "\n\n".join(f"Paragraph {i}: " + "restart the worker and check the queue. " * 60 for i in range(40))
+    async with session_factory() as db:
+        db.add(KnowledgeDoc(id=ids["doc_id"], tenant_id=ids["tenant_id"], department_id=ids["department_id"],
+                            title="Runbook", status="pending", metadata_={}))
+        await db.commit()
+
+    async def run(fail_at):
+        async with session_factory() as db:
+            service = IngestionService(db)
+            service.extraction_cache = ExtractionCache(None)
+            service.embedder = FlakyEmbedder(fail_at)
+            try:
+                await service.ingest_document(source=io.BytesIO(text.encode()), mime_type="text/plain", **ids)
+            except RuntimeError:
+                pass
+            await db.commit()
+            return service.embedder.embedded
+
+    first = await run(fail_at=25)
+    second = await run(fail_at=None)
+
+    async with session_factory() as db:
+        doc = await db.get(KnowledgeDoc, ids["doc_id"])
+        indices = (await db.execute(
+            select(KnowledgeChunk.chunk_index).where(KnowledgeChunk.document_id == ids["doc_id"])
+        )).scalars().all()
+
+    assert doc.status == "indexed"
+    assert "checkpoint" not in doc.metadata_
+    assert sorted(indices) == list(range(doc.chunk_count))
+    assert len(FakeVectorStore.points) == doc.chunk_count
+    # The retry only embedded what the first attempt had not checkpointed.
+    assert second == doc.chunk_count - 20
+    assert first == 25
+    await engine.dispose()
@@ -0,0 +1,254 @@
+"""Tests for the fair-share ingestion scheduler."""
+
+import time
+import uuid
+from collections import Counter
+
+import pytest
+import redis.asyncio
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.services import tasks
+from app.services.ingestion_scheduler import IngestionScheduler, smooth_wrr
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+        return op
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.ops]
+
+
+class FakeRedis:
+    """The parts of redis.asyncio.Redis the scheduler uses, in memory."""
+
+    def __init__(self):
+        self.strings: dict[str, str] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.sets: dict[str, set[str]] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.lists: dict[str, list[str]] = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        async def acquire(keys, args):
+            # TenantIngestionSlots' acquire script.
+            now, expiry, doc_id, limit = float(args[0]), float(args[1]), args[2], int(args[3])
+            await self.zremrangebyscore(keys[0], "-inf", now)
+            zset = self.zsets.setdefault(keys[0], {})
+            if doc_id in zset or len(zset) < limit:
+                zset[doc_id] = expiry
+                return 1
+            return 0
+        return acquire
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def delete(self, key):
+        self.strings.pop(key, None)
+
+    async def expire(self, key, seconds):
+        return key in self.strings
+
+    async def zadd(self, key, mapping, xx=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not xx or member in zset:
+                zset[member] = score
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= float(high)]:
+            del zset[member]
+
+    async def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+
+    async def srem(self, key, member):
+        self.sets.get(key, set()).discard(member)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        values = self.hashes.setdefault(key, {})
+        values.update(mapping or {field: value})
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(f) for f in fields]
+
+    async def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+
+    async def hincrbyfloat(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(float(values.get(field, 0)) + amount)
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(str(value))
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, str(value))
+
+    async def lpop(self, key):
+        values = self.lists.get(key)
+        return values.pop(0) if values else None
+
+    async def lindex(self, key, index):
+        values = self.lists.get(key, [])
+        return values[index] if -len(values) <= index < len(values) else None
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def lrange(self, key, start, end):
+        values = self.lists.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    async def ltrim(self, key, start, end):
+        self.lists[key] = await self.lrange(key, start, end)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """A scheduler over a FakeRedis with 2 bulk slots and 1 document per tenant; records dispatches."""
+    monkeypatch.setattr(settings, "INGEST_SCHEDULER_CAPACITY", 2)
+    monkeypatch.setattr(settings, "INGESTION_TENANT_CONCURRENCY", 1)
+    sent: list[str] = []
+    monkeypatch.setattr(tasks.ingest_document_task, "apply_async", lambda args, **kwargs: sent.append(args[0]))
+    scheduler = IngestionScheduler(FakeRedis())
+    scheduler.sent = sent
+    return scheduler
+
+
+def test_smooth_wrr_shares_by_weight():
+    credits: dict[str, float] = {}
+    weights = {"bulk-tenant": 1, "enterprise": 4}
+    picks = [smooth_wrr(credits, weights) for _ in range(50)]
+
+    assert Counter(picks) == {"enterprise": 40, "bulk-tenant": 10}
+    # Interleaved, not 40 in a row: the light tenant gets a turn every cycle.
+    assert "bulk-tenant" in picks[:5]
+
+
+def test_smooth_wrr_new_tenant_is_served_promptly():
+    credits: dict[str, float] = {}
+    weights = {"a": 1}
+    for _ in range(100):
+        smooth_wrr(credits, weights)
+
+    weights = {"a": 1, "b": 1}
+    assert "b" in [smooth_wrr(credits, weights) for _ in range(2)]
+
+
+def test_lane_by_document_size():
+    assert IngestionScheduler.lane_for(settings.INGEST_SMALL_DOC_BYTES) == "small"
+    assert IngestionScheduler.lane_for(settings.INGEST_SMALL_DOC_BYTES + 1) == "bulk"
+    assert IngestionScheduler.lane_for(None) == "bulk"
+
+
+async def test_dispatch_fills_free_slots_within_tenant_caps(scheduler):
+    await scheduler.submit_many(
+        [("a", "a1", "free", None), ("a", "a2", "free", None), ("b", "b1", "free", None)]
+    )
+
+    # Two bulk slots, but tenant "a" may run one document at a time.
+    assert sorted(scheduler.sent) == ["a1", "b1"]
+    assert await scheduler.redis.lrange("ingest:sched:q:a:bulk", 0, -1) == ["a2"]
+
+
+async def test_complete_hands_the_slot_to_the_next_document(scheduler):
+    await scheduler.submit_many([("a", "a1", "free", None), ("a", "a2", "free", None)])
+    assert scheduler.sent == ["a1"]
+
+    await scheduler.complete("a", "a1")
+
+    assert scheduler.sent == ["a1", "a2"]
+    assert await scheduler.slots.in_flight("a") == 1
+
+
+async def test_renew_extends_leases(scheduler):
+    await scheduler.submit("a", "a1", "free", None)
+    scheduler.redis.zsets["ingest:sched:inflight:bulk"]["a1"] = time.time() + 1
+
+    await scheduler.renew("a", "a1")
+
+    assert scheduler.redis.zsets["ingest:sched:inflight:bulk"]["a1"] > time.time() + 60
+
+
+class FailingSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def execute(self, *args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+
+@pytest.mark.parametrize("final_attempt", [False, True])
+async def test_failed_attempt_keeps_its_slot_until_the_last_retry(scheduler, monkeypatch, final_attempt):
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda *args, **kwargs: scheduler.redis)
+    monkeypatch.setattr(db_session, "async_session_factory", FailingSession)
+    doc_id = str(uuid.uuid4())
+    await scheduler.submit("a", doc_id, "free", None)
+
+    with pytest.raises(RuntimeError):
+        await tasks._process_document(doc_id, final_attempt=final_attempt)
+
+    assert await scheduler.redis.get(f"ingest:lock:{doc_id}") is None
+    in_flight = scheduler.redis.zsets["ingest:sched:inflight:bulk"]
+    assert (doc_id in in_flight) is not final_attempt
+
+
+@pytest.mark.parametrize(
+    "task, queue",
+    [
+        ("ingest_document_task", "ingestion"),
+        ("dispatch_ingestion_queue_task", "ingestion-dispatch"),
+        ("dispatch_ingestion_job_task", "ingestion-dispatch"),
+        ("reindex_collection_task", "reindex"),
+    ],
+)
+def test_task_queues(task, queue):
+    from app.services.celery_worker import celery_app
+
+    assert celery_app.amqp.router.route({}, f"app.services.tasks.{task}")["queue"].name == queue
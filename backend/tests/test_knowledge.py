@@ -29,3 +29,89 @@ async def test_upload_document(client: AsyncClient, seeded_db, admin_headers):
 async def test_knowledge_unauthorized(client: AsyncClient, seeded_db):
     response = await client.get(f"/api/v1/knowledge/{TEST_DEPT_ID}")
     assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_document_status_not_found(client: AsyncClient, seeded_db, admin_headers):
+    response = await client.get(
+        f"/api/v1/knowledge/{TEST_DEPT_ID}/00000000-0000-0000-0000-00000000dead/status",
+        headers=admin_headers,
+    )
+    assert response.status_code == 404
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def add(self, obj):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_upload_marks_document_failed_when_it_cannot_be_queued(monkeypatch):
+    from app.core.config import settings
+    from app.services import knowledge_service
+
+    async def unreachable(db, docs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(settings, "INGESTION_ASYNC", True)
+    monkeypatch.setattr(knowledge_service, "put_stream", lambda *args: (24, "abc123"))
+    monkeypatch.setattr(knowledge_service, "schedule_ingestion", unreachable)
+    db = FakeSession()
+
+    doc = await knowledge_service.KnowledgeService(db).upload_document(
+        TEST_DEPT_ID, TEST_DEPT_ID, TEST_DEPT_ID, None, "notes.txt", "Notes", "text/plain"
+    )
+
+    assert doc.status == "failed"
+    assert "redis down" in doc.metadata_["error"]
+    assert db.commits == 2
+
+
+@pytest.mark.asyncio
+async def test_reuploads_of_a_filename_get_their_own_objects(monkeypatch):
+    from app.core.config import settings
+    from app.services import knowledge_service
+
+    async def queued(db, docs):
+        pass
+
+    monkeypatch.setattr(settings, "INGESTION_ASYNC", True)
+    monkeypatch.setattr(knowledge_service, "put_stream", lambda *args: (24, "abc123"))
+    monkeypatch.setattr(knowledge_service, "schedule_ingestion", queued)
+    service = knowledge_service.KnowledgeService(FakeSession())
+
+    first, second = [
+        await service.upload_document(TEST_DEPT_ID, TEST_DEPT_ID, TEST_DEPT_ID, None, "notes.txt", "Notes", "text/plain")
+        for _ in range(2)
+    ]
+
+    assert first.file_path != second.file_path
+    assert first.file_path.endswith(f"doc-{first.id}/notes.txt")
+
+
+@pytest.mark.asyncio
+async def test_worker_rejects_a_download_that_is_not_the_upload(tmp_path):
+    from types import SimpleNamespace
+
+    from app.services.rag.extraction_cache import hash_file
+    from app.services.tasks import _matches_upload
+
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"the second upload")
+    doc = SimpleNamespace(id="doc", file_path="notes.txt", metadata_={"sha256": hash_file(str(path))})
+
+    assert await _matches_upload(doc, str(path))
+    path.write_bytes(b"the first upload")
+    assert not await _matches_upload(doc, str(path))
@@ -0,0 +1,22 @@
+"""Tests for the pooled LLM client registry."""
+
+from app.services.llm import registry
+from app.services.llm.ollama_client import OllamaClient
+from app.services.llm.openai_client import OpenAICompatibleClient
+
+
+async def test_clients_are_shared_per_provider_and_closed_once():
+    ollama = registry.get_llm()
+    assert ollama is registry.get_llm("ollama") and isinstance(ollama, OllamaClient)
+
+    groq = registry.get_llm("openai_compatible", "https://api.groq.com/openai/v1/", "key-a")
+    assert groq is registry.get_llm("openai_compatible", "https://api.groq.com/openai/v1", "key-a")
+    assert isinstance(groq, OpenAICompatibleClient)
+    # Another tenant's key for the same endpoint gets its own pool.
+    assert groq is not registry.get_llm("openai_compatible", "https://api.groq.com/openai/v1", "key-b")
+    assert all("key-a" not in part for part in registry.client_key("openai_compatible", "https://x", "key-a"))
+
+    await registry.close_llm_clients()
+    assert ollama.client.is_closed and groq.client.is_closed()
+    assert registry.get_llm() is not ollama
+    await registry.close_llm_clients()
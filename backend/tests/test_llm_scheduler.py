@@ -0,0 +1,52 @@
+"""Tests for LLM admission control and fair scheduling."""
+
+import asyncio
+
+import pytest
+
+from app.core.exceptions import LLMOverloadedError
+from app.services.llm.scheduler import LLMScheduler
+
+
+async def test_interactive_lane_first_then_tenants_by_plan_weight():
+    scheduler = LLMScheduler()
+    endpoint = ("http://ollama:11434", 1)
+    admitted = []
+
+    async def generate(name, tenant, tier, lane):
+        async with scheduler.slot(endpoint, tenant, tier, lane):
+            admitted.append(name)
+            await asyncio.sleep(0)
+
+    async with scheduler.slot(endpoint, "t-busy", "free"):
+        tasks = []
+        for name, tenant, tier, lane in [
+            ("batch-1", "t-batch", "enterprise", "background"),
+            ("free-1", "t-free", "free", "interactive"),
+            ("free-2", "t-free", "free", "interactive"),
+            ("ent-1", "t-ent", "enterprise", "interactive"),
+            ("ent-2", "t-ent", "enterprise", "interactive"),
+            ("ent-3", "t-ent", "enterprise", "interactive"),
+        ]:
+            tasks.append(asyncio.create_task(generate(name, tenant, tier, lane)))
+            await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    # The enterprise tenant gets 4 of every 5 turns; batch work waits for the interactive queue.
+    assert admitted == ["ent-1", "ent-2", "free-1", "ent-3", "free-2", "batch-1"]
+    lanes = scheduler.stats()["http://ollama:11434"]["lanes"]
+    assert lanes["interactive"]["admitted"] == 6 and lanes["background"]["admitted"] == 1
+
+
+async def test_generation_not_admitted_in_time_is_rejected():
+    scheduler = LLMScheduler()
+    endpoint = ("http://ollama:11434", 1)
+
+    async with scheduler.slot(endpoint, "t1"):
+        with pytest.raises(LLMOverloadedError):
+            async with scheduler.slot(endpoint, "t2", timeout=0.05):
+                pass
+
+    stats = scheduler.stats()["http://ollama:11434"]
+    assert stats["lanes"]["interactive"]["rejected"] == 1
+    assert stats["active"] == 0 and stats["lanes"]["interactive"]["queued"] == 0
@@ -0,0 +1,69 @@
+"""Tests for streaming from the LLM clients."""
+
+import json
+
+import httpx
+
+from app.services.llm.ollama_client import OllamaClient
+from app.services.llm.openai_client import OpenAICompatibleClient
+
+
+class RecordingBody(httpx.AsyncByteStream):
+    """A response body that records whether the client closed it."""
+
+    def __init__(self, lines: list[bytes]):
+        self.lines = lines
+        self.closed = False
+
+    async def __aiter__(self):
+        for line in self.lines:
+            yield line
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+async def test_ollama_stream_reports_usage_and_aborts_when_closed():
+    frames = [{"message": {"content": t}, "done": False} for t in ("Restart ", "the ", "worker.")]
+    frames.append({"message": {"content": ""}, "done": True, "prompt_eval_count": 42, "eval_count": 3})
+    bodies: list[RecordingBody] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(RecordingBody([json.dumps(f).encode() + b"\n" for f in frames]))
+        return httpx.Response(200, stream=bodies[-1])
+
+    llm = OllamaClient("http://ollama:11434")
+    llm.client = httpx.AsyncClient(base_url=llm.base_url, transport=httpx.MockTransport(handler))
+
+    stream = await llm.chat([{"role": "user", "content": "hi"}], stream=True)
+    assert [token async for token in stream] == ["Restart ", "the ", "worker."]
+    assert (stream.usage.prompt_tokens, stream.usage.completion_tokens) == (42, 3)
+
+    async with await llm.chat([{"role": "user", "content": "hi"}], stream=True) as stream:
+        assert await stream.__anext__() == "Restart "
+    # Abandoning the stream closed the upstream response.
+    assert bodies[-1].closed and stream.usage is None
+    await llm.close()
+
+
+async def test_openai_compatible_client_streams_with_usage():
+    chunk = {"id": "c1", "object": "chat.completion.chunk", "created": 0, "model": "llama-3"}
+    events = [
+        {**chunk, "choices": [{"index": 0, "delta": {"content": t}, "finish_reason": None}]} for t in ("Hi", " there")
+    ]
+    events.append({**chunk, "choices": [], "usage": {"prompt_tokens": 9, "completion_tokens": 2, "total_tokens": 11}})
+    requests: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    llm = OpenAICompatibleClient("https://api.example.com/v1", api_key="key")
+    llm.client = llm.client.with_options(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    stream = await llm.chat([{"role": "user", "content": "hi"}], model="llama-3", stream=True)
+    assert "".join([token async for token in stream]) == "Hi there"
+    assert (stream.usage.prompt_tokens, stream.usage.completion_tokens) == (9, 2)
+    assert requests[0]["stream"] is True and requests[0]["stream_options"] == {"include_usage": True}
+    await llm.close()
@@ -0,0 +1,91 @@
+"""Tests for load balancing across Ollama hosts."""
+
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.llm.ollama_pool import OllamaPool
+
+
+class FakeHost:
+    def __init__(self, url: str, down: bool = False):
+        self.base_url = url
+        self.down = down
+        self.calls = 0
+
+    async def chat(self, messages, model=None, stream=False, **kwargs):
+        self.calls += 1
+        if self.down:
+            raise httpx.ConnectError(f"{self.base_url} refused")
+        return f"answer from {self.base_url}"
+
+    async def close(self):
+        pass
+
+
+def _pool(*hosts: FakeHost) -> OllamaPool:
+    pool = OllamaPool([h.base_url for h in hosts])
+    for host, fake in zip(pool.hosts, hosts):
+        host.client = fake
+    pool._ensure_probing = lambda: None
+    return pool
+
+
+async def test_unreachable_host_is_retried_elsewhere_and_ejected(monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_EJECT_AFTER_FAILURES", 2)
+    down, up = FakeHost("http://a:11434", down=True), FakeHost("http://b:11434")
+    pool = _pool(down, up)
+
+    for _ in range(3):
+        pool.hosts[1].outstanding = 1  # make the down host look less busy
+        assert await pool.chat([{"role": "user", "content": "hi"}]) == "answer from http://b:11434"
+
+    assert down.calls == 2  # ejected after its second failure, then skipped
+    assert pool.status()[0]["ejected"] is True
+
+
+async def test_prefers_host_with_model_loaded():
+    cold, warm = FakeHost("http://a:11434"), FakeHost("http://b:11434")
+    pool = _pool(cold, warm)
+    pool.hosts[1].loaded = {"llama3"}
+    pool.hosts[1].outstanding = 2
+
+    assert await pool.chat([], model="llama3") == "answer from http://b:11434"
+    assert await pool.chat([], model="mistral") == "answer from http://a:11434"
+
+
+async def test_read_timeout_is_not_retried_or_counted(monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_EJECT_AFTER_FAILURES", 1)
+    slow, other = FakeHost("http://a:11434"), FakeHost("http://b:11434")
+
+    async def timeout(messages, model=None, stream=False, **kwargs):
+        slow.calls += 1
+        raise httpx.ReadTimeout("no response")
+
+    slow.chat = timeout
+    pool = _pool(slow, other)
+    pool.hosts[1].outstanding = 1
+
+    with pytest.raises(httpx.ReadTimeout):
+        await pool.chat([])
+    assert other.calls == 0
+    assert pool.status()[0]["ejected"] is False
+
+
+async def test_failed_probe_extends_ejection(monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_EJECT_AFTER_FAILURES", 1)
+    pool = _pool(FakeHost("http://a:11434", down=True))
+    host = pool.hosts[0]
+    host.failed("refused")
+    host.ejected_until = time.monotonic() - 1  # ejection period over: due for a probe
+
+    async def refused(*args, **kwargs):
+        raise httpx.ConnectError("refused")
+
+    host.client.client = SimpleNamespace(get=refused)
+    await pool.probe()
+
+    assert host.ejected and host.ejected_until > time.monotonic()
@@ -1,6 +1,15 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
 import pytest
 from httpx import AsyncClient
 
+from app.core.config import settings
+from app.models.approval import Approval
+from app.models.conversation import Message
+from app.services import query_service
+from app.services.llm.prompt_templates import build_rag_prompt
+from app.services.query_service import QueryService
 from tests.conftest import TEST_DEPT_ID
 
 
@@ -54,3 +63,88 @@ async def test_query_empty_text(client: AsyncClient, seeded_db, admin_headers):
         },
     )
     assert response.status_code == 422  # Validation error
+
+
+class RecordingSession:
+    """Counts the round trips QueryService makes; every SELECT is answered by *row*."""
+
+    def __init__(self, row):
+        self.row = row
+        self.executes = 0
+        self.flushes = 0
+        self.added = []
+
+    async def execute(self, stmt):
+        self.executes += 1
+        row = self.row
+
+        class Result:
+            def one_or_none(self):
+                return row
+
+            def all(self):
+                # Conversation memory: (summary, message) rows, newest first.
+                messages = list(reversed(row.messages)) or [None]
+                return [SimpleNamespace(summary=row.summary, Message=m) for m in messages]
+
+        return Result()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def add_all(self, objs):
+        self.added.extend(objs)
+
+    async def flush(self):
+        self.flushes += 1
+
+    async def scalar(self, stmt):
+        self.executes += 1
+        return "professional"
+
+
+def _department(summary=None, messages=()) -> SimpleNamespace:
+    """A department row, plus the conversation memory the fake session answers with."""
+    return SimpleNamespace(id=uuid4(), config={"confidence_threshold": 0.5}, summary=summary, messages=list(messages))
+
+
+async def test_repeat_query_is_served_from_caches_and_saved_in_one_flush(monkeypatch):
+    monkeypatch.setattr(query_service, "schedule_summary_refresh", lambda conversation_id: None)
+    tenant_id, user_id, conversation_id = uuid4(), uuid4(), uuid4()
+    db = RecordingSession(_department())
+    service = QueryService(db)
+
+    for _ in range(2):
+        conversation, state = await service.prepare_query(
+            tenant_id, db.row.id, user_id, "Is nginx down?", conversation_id=conversation_id
+        )
+    # Department and plan tier are looked up once, the conversation's memory per question; nothing is written yet.
+    assert db.executes == 4 and db.flushes == 0 and db.added == []
+    assert state["confidence_threshold"] == 0.5 and state["plan_tier"] == "professional"
+
+    result = await service._save_answer(conversation, {**state, "answer": "No.", "confidence": 0.9})
+
+    assert db.flushes == 1
+    user_msg, ai_msg, approval = [o for o in db.added if isinstance(o, (Message, Approval))]
+    assert (user_msg.role, ai_msg.role) == ("user", "assistant")
+    assert user_msg.conversation is conversation and approval.message is ai_msg
+    assert result["conversation_id"] == conversation_id
+
+
+async def test_follow_up_carries_summary_and_recent_turns_within_budget(monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_MEMORY_TOKEN_BUDGET", 30)
+    turns = [
+        SimpleNamespace(role="user", content="Which nginx version do we run? " * 5),
+        SimpleNamespace(role="assistant", content="1.24 on every edge node."),
+        SimpleNamespace(role="user", content="How do I reload it?"),
+        SimpleNamespace(role="assistant", content="Run nginx -s reload."),
+    ]
+    db = RecordingSession(_department(summary="User is debugging nginx on the edge nodes.", messages=turns))
+
+    _, state = await QueryService(db).prepare_query(uuid4(), db.row.id, uuid4(), "And restart?", conversation_id=uuid4())
+
+    # The oldest turn no longer fits the budget; it waits to be folded into the summary.
+    assert [t["content"] for t in state["history"]] == [t.content for t in turns[1:]]
+    prompt = build_rag_prompt("And restart?", "", "sys", history=state["history"], history_summary=state["history_summary"])
+    assert "User is debugging nginx" in prompt[1]["content"]
+    assert [m["role"] for m in prompt[2:]] == ["assistant", "user", "assistant", "user"]
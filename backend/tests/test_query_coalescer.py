@@ -0,0 +1,163 @@
+"""Tests for single-flight query coalescing."""
+
+import asyncio
+import json
+import time
+
+from app.services.query_coalescer import QueryCoalescer, coalesce_key, normalize_query
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+        return op
+
+    async def execute(self):
+        for name, args, kwargs in self.ops:
+            await getattr(self.redis, name)(*args, **kwargs)
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the leader path."""
+
+    def __init__(self):
+        self.data: dict = {}
+
+    def register_script(self, script):
+        async def release(keys, args):
+            return self.data.pop(keys[0], None) is not None
+        return release
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def mget(self, *keys):
+        return [self.data.get(k) for k in keys]
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def publish(self, channel, message):
+        return 0
+
+    async def hincrby(self, key, field, amount):
+        hash_ = self.data.setdefault(key, {})
+        hash_[field] = hash_.get(field, 0) + amount
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def hgetall(self, key):
+        return self.data.get(key, {})
+
+
+def _state(query: str) -> dict:
+    return {"tenant_id": "t1", "department_id": "d1", "query": query, "model_name": "llama3", "provider_base_url": None}
+
+
+def test_normalized_questions_share_a_key():
+    assert normalize_query("  How do I RESTART the   server? ") == "how do i restart the server"
+    assert coalesce_key(_state("How do I restart the server?"), "0:0") == coalesce_key(_state("how do i restart the server"), "0:0")
+    assert coalesce_key(_state("restart"), "0:0") != coalesce_key(_state("restart"), "0:1")
+
+
+async def test_identical_in_flight_queries_run_the_graph_once():
+    redis = FakeRedis()
+    coalescer = QueryCoalescer(redis, wait_seconds=5)
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {"answer": "Restart nginx."}
+
+    questions = ["Is nginx down?", "is nginx down", "IS NGINX DOWN?!", "Is  nginx down?"]
+    results = await asyncio.gather(*(coalescer.run(_state(q), compute) for q in questions))
+
+    assert runs == 1
+    assert [r["answer"] for r, _ in results] == ["Restart nginx."] * 4
+    assert sorted(role for _, role in results) == ["leader", "local", "local", "local"]
+
+    # New knowledge in the department: the next question is answered afresh.
+    redis.data["knowledge:version:d1"] = "1"
+    _, role = await coalescer.run(_state("Is nginx down?"), compute)
+    assert role == "leader" and runs == 2
+
+    stats = await coalescer.tenant_stats("t1")
+    assert stats["queries"] == 5
+    assert stats["coalesced"] == 3
+    assert stats["coalescing_ratio"] == 0.6
+
+
+async def test_published_result_carries_only_shared_fields():
+    redis = FakeRedis()
+    coalescer = QueryCoalescer(redis, wait_seconds=5)
+
+    async def compute():
+        return {
+            **_state("Is nginx down?"),
+            "answer": "Restart nginx.",
+            "sources": [{"title": "Runbook"}],
+            "provider_api_key": "sk-secret",
+            "context": "internal runbook text",
+        }
+
+    await coalescer.run(_state("Is nginx down?"), compute)
+
+    published = next(v for k, v in redis.data.items() if k.startswith("query:coalesce:result:"))
+    assert json.loads(published) == {"answer": "Restart nginx.", "sources": [{"title": "Runbook"}]}
+
+
+async def test_follower_stops_waiting_at_its_deadline():
+    redis = FakeRedis()
+    coalescer = QueryCoalescer(redis, wait_seconds=5)
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return {"answer": "Restart nginx."}
+
+    async def fallback():
+        return {"answer": "There was not enough time to generate an answer."}
+
+    leader = asyncio.create_task(coalescer.run(_state("Is nginx down?"), slow))
+    await asyncio.sleep(0)
+    follower = {**_state("Is nginx down?"), "deadline": time.time() + 0.05}
+
+    started = time.monotonic()
+    result, role = await coalescer.run(follower, fallback)
+
+    assert time.monotonic() - started < 0.2
+    assert result["answer"].startswith("There was not enough time") and role == "fallback"
+    assert (await leader)[0]["answer"] == "Restart nginx."
+
+
+async def test_failed_leader_is_not_shared():
+    redis = FakeRedis()
+    coalescer = QueryCoalescer(redis, wait_seconds=5)
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        return {"answer": "I apologize, but I encountered an error: boom", "error": "boom"}
+
+    async def compute():
+        return {"answer": "Restart nginx."}
+
+    (leader, _), (follower, role) = await asyncio.gather(
+        coalescer.run(_state("Is nginx down?"), failing),
+        coalescer.run(_state("Is nginx down?"), compute),
+    )
+
+    assert leader["error"] == "boom"
+    assert follower == {"answer": "Restart nginx."} and role == "fallback"
+    assert next(v for k, v in redis.data.items() if k.startswith("query:coalesce:result:")) == "null"
+    stats = await coalescer.tenant_stats("t1")
+    assert stats["fallback"] == 1 and stats["coalesced"] == 0
@@ -0,0 +1,159 @@
+"""Tests for the LangGraph query pipeline."""
+
+import asyncio
+import time
+
+from app.agents import graph
+from app.services.llm.streaming import LLMStream, TokenUsage
+
+
+class SlowLLM:
+    async def chat(self, messages, model=None, **kwargs):
+        await asyncio.sleep(0.2)
+        return "Restart the ingestion worker, then re-upload the document."
+
+    async def close(self):
+        pass
+
+
+class FakeRetriever:
+    built = 0
+
+    def __init__(self):
+        FakeRetriever.built += 1
+
+    def retrieve(self, query, tenant_id, department_id, top_k=5):
+        return [{"score": 0.9, "content": "Runbook", "title": "Ops"}]
+
+    def build_context(self, results, max_tokens=2000):
+        return "Runbook"
+
+
+def _state(query: str) -> dict:
+    return {
+        "query": query,
+        "department_id": "dept",
+        "tenant_id": "tenant",
+        "user_id": "user",
+        "image_path": None,
+        "department_config": {},
+        "model_name": "test-model",
+        "confidence_threshold": 0.85,
+        "system_prompt": "",
+        "provider_type": None,
+        "provider_base_url": None,
+        "provider_api_key": None,
+        "rag_results": [],
+        "context": "",
+        "answer": "",
+        "confidence": 0.0,
+        "sources": [],
+        "model_used": "",
+        "tokens_input": 0,
+        "tokens_output": 0,
+        "latency_ms": 0.0,
+        "has_verified_answers": False,
+        "needs_approval": False,
+        "error": None,
+    }
+
+
+async def test_llm_call_does_not_block_the_event_loop():
+    FakeRetriever.built = 0
+    config = {"configurable": {"deps": graph.QueryDeps(retriever=FakeRetriever(), ollama=SlowLLM())}}
+    compiled = graph.get_query_graph()
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    beat = asyncio.create_task(heartbeat())
+    results = await asyncio.gather(*(compiled.ainvoke(_state(f"question {i}"), config) for i in range(3)))
+    beat.cancel()
+
+    assert all(r["answer"].startswith("Restart") for r in results)
+    assert all(r["sources"][0]["title"] == "Ops" for r in results)
+    # Other work kept running while the answers were generated.
+    assert ticks >= 10
+    # One compiled graph and one set of clients served every run.
+    assert graph.get_query_graph() is compiled
+    assert FakeRetriever.built == 1
+
+
+class StreamingLLM:
+    async def chat(self, messages, model=None, stream=False, **kwargs):
+        assert stream
+
+        async def tokens():
+            for token in ("Restart ", "the ", "worker."):
+                yield token
+            yield TokenUsage(prompt_tokens=120, completion_tokens=4)
+
+        return LLMStream(tokens())
+
+    async def close(self):
+        pass
+
+
+async def test_emit_streams_sources_then_tokens():
+    events = []
+
+    async def emit(event, data):
+        events.append((event, data))
+
+    deps = graph.QueryDeps(retriever=FakeRetriever(), ollama=StreamingLLM())
+    final = await graph.get_query_graph().ainvoke(
+        _state("how do I fix ingestion?"), {"configurable": {"deps": deps, "emit": emit}}
+    )
+
+    assert [event for event, _ in events] == ["sources", "token", "token", "token"]
+    assert events[0][1]["sources"][0]["title"] == "Ops"
+    # The saved answer is exactly what was streamed.
+    assert "".join(data["content"] for event, data in events[1:]) == final["answer"] == "Restart the worker."
+    # Usage comes from the provider rather than the word-count estimate.
+    assert (final["tokens_input"], final["tokens_output"]) == (120, 4)
+
+
+async def test_vision_and_retrieval_run_concurrently():
+    class SlowVision:
+        async def analyze_screenshot(self, image_path, query):
+            await asyncio.sleep(0.2)
+            return "Error dialog: disk full"
+
+    class SlowRetriever(FakeRetriever):
+        def retrieve(self, query, tenant_id, department_id, top_k=5):
+            time.sleep(0.2)
+            return super().retrieve(query, tenant_id, department_id, top_k)
+
+    deps = graph.QueryDeps(retriever=SlowRetriever(), ollama=SlowLLM(), vision=SlowVision())
+    state = {**_state("what does this error mean?"), "image_path": "/tmp/screenshot.png"}
+
+    start = time.perf_counter()
+    result = await graph.gather_context(state, {"configurable": {"deps": deps}})
+    elapsed = time.perf_counter() - start
+
+    assert result["context"] == "Runbook\n\n[Image Analysis]\nError dialog: disk full"
+    assert result["sources"][0]["title"] == "Ops"
+    assert elapsed < 0.35
+
+
+async def test_deadline_degrades_instead_of_waiting(monkeypatch):
+    class StuckLLM(SlowLLM):
+        async def chat(self, messages, model=None, **kwargs):
+            await asyncio.sleep(30)
+
+    monkeypatch.setattr(graph.settings, "QUERY_DEADLINE_ANSWER_RESERVE_SECONDS", 0.2)
+    monkeypatch.setattr(graph.settings, "QUERY_DEADLINE_MIN_ANSWER_SECONDS", 0.05)
+    deps = graph.QueryDeps(retriever=FakeRetriever(), ollama=StuckLLM())
+    state = {**_state("what does this error mean?"), "image_path": "/tmp/screenshot.png", "deadline": time.time() + 0.5}
+
+    start = time.perf_counter()
+    final = await graph.run_query_pipeline(state, {"configurable": {"deps": deps}})
+
+    assert time.perf_counter() - start < 1.0
+    assert final["degradations"] == ["skipped_vision", "reduced_context", "reduced_max_tokens", "sources_only"]
+    # Retrieval made it in time, so its sources stand in for the answer.
+    assert final["sources"][0]["title"] == "Ops" and "- Ops" in final["answer"]
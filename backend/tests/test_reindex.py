@@ -0,0 +1,199 @@
+"""Tests for blue/green re-indexing."""
+
+import sys
+import types
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models.knowledge import KnowledgeChunk, KnowledgeDoc
+from app.models.reindex_job import ReindexJob
+from app.services import reindex_service
+from app.services.rag.embeddings import EmbeddingService
+from app.services.rag.ingestion import chunk_point_id
+from app.services.reindex_service import ReindexService
+
+
+class FakeVectorStore:
+    collections: dict[str, dict] = {}
+    alias: str | None = None
+
+    def __init__(self, url=None, collection=None):
+        self.collection = collection or "knowledge"
+
+    def _points(self) -> dict:
+        name = self.alias if self.collection == "knowledge" else self.collection
+        return self.collections[name]
+
+    def collection_exists(self, name):
+        return name in self.collections
+
+    def create_collection(self, name, embedding_model, vector_size):
+        self.collections[name] = {}
+
+    def alias_target(self):
+        return FakeVectorStore.alias
+
+    def swap_alias(self, collection):
+        previous, FakeVectorStore.alias = FakeVectorStore.alias, collection
+        return previous
+
+    def upsert_vectors(self, points):
+        self._points().update({p["id"]: p for p in points})
+
+    def delete_by_document(self, document_id):
+        points = self._points()
+        for point_id in [k for k, p in points.items() if p["document_id"] == document_id]:
+            del points[point_id]
+
+    def upsert_points(self, points):
+        self._points().update({p.id: {**p.payload, "id": p.id, "vector": p.vector} for p in points})
+
+    def scroll_source_type(self, source_type):
+        return iter([
+            SimpleNamespace(id=point_id, payload={k: v for k, v in p.items() if k not in ("id", "vector")})
+            for point_id, p in self._points().items()
+            if p.get("source_type") == source_type
+        ])
+
+    def profile(self):
+        return {"embedding_model": "old-model"}
+
+
+class FlakyEmbedder:
+    embedded = 0
+    batches = 0
+    fail_after: int | None = None  # batches
+
+    def __init__(self, model_name=None, allow_fallback=True):
+        assert not allow_fallback
+
+    def embed_batch(self, texts):
+        if FlakyEmbedder.fail_after is not None and FlakyEmbedder.batches >= FlakyEmbedder.fail_after:
+            raise RuntimeError("embedding worker lost")
+        FlakyEmbedder.batches += 1
+        FlakyEmbedder.embedded += len(texts)
+        return [[0.0, 1.0] for _ in texts]
+
+
+@pytest.mark.asyncio
+async def test_reindex_resumes_and_swaps_alias(monkeypatch, tmp_path):
+    monkeypatch.setattr(reindex_service, "VectorStore", FakeVectorStore)
+    monkeypatch.setattr(reindex_service, "EmbeddingService", FlakyEmbedder)
+    monkeypatch.setattr(settings, "REINDEX_BATCH_SIZE", 5)
+    monkeypatch.setattr(settings, "REINDEX_WINDOW_BATCHES", 2)
+    monkeypatch.setattr(settings, "VECTOR_PROFILE_CACHE_SECONDS", 0)
+    verified = {
+        "id": "verified-1", "vector": [1.0, 0.0], "tenant_id": "t", "department_id": "d", "document_id": "",
+        "source_type": "verified_answer", "approval_id": "a1", "content": "Q: How do I reset?\nA: " + "x" * 600,
+    }
+    FakeVectorStore.collections = {"knowledge_vectors": {"verified-1": verified}}
+    FakeVectorStore.alias = "knowledge_vectors"
+    FlakyEmbedder.embedded = FlakyEmbedder.batches = 0
+    # Fail in the second window, wherever the vectorless chunk's random ID sorts.
+    FlakyEmbedder.fail_after = 2
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/reindex.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: KnowledgeDoc.metadata.create_all(
+            c, tables=[KnowledgeDoc.__table__, KnowledgeChunk.__table__, ReindexJob.__table__]
+        ))
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    doc_id, tenant_id, dept_id = uuid4(), uuid4(), uuid4()
+    long_ago = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    async with session_factory() as db:
+        db.add(KnowledgeDoc(id=doc_id, tenant_id=tenant_id, department_id=dept_id, title="Handbook",
+                            status="indexed", metadata_={}, updated_at=long_ago))
+        for i in range(24):
+            db.add(KnowledgeChunk(
+                document_id=doc_id, tenant_id=tenant_id, department_id=dept_id, chunk_index=i,
+                content=f"chunk {i}", qdrant_point_id=chunk_point_id(doc_id, i),
+                # Link-mode near-duplicates have no vector of their own.
+                metadata_={"duplicate_of": chunk_point_id(doc_id, 0)} if i == 23 else {},
+            ))
+        job = ReindexJob(embedding_model="new-model", vector_size=2, target_collection="knowledge_vectors_green")
+        db.add(job)
+        await db.commit()
+        job_id = job.id
+
+    async with session_factory() as db:
+        with pytest.raises(RuntimeError):
+            await ReindexService(db).run(job_id)
+    async with session_factory() as db:
+        job = await db.get(ReindexJob, job_id)
+        assert job.status == "building"
+        assert job.processed_chunks == 10
+        assert job.error == "embedding worker lost"
+        progress = await ReindexService(db).get_progress(job_id)
+        assert progress["eta_seconds"] is not None
+        # Search never left the old collection.
+        assert FakeVectorStore.alias == "knowledge_vectors"
+
+    FlakyEmbedder.fail_after = None
+    async with session_factory() as db:
+        await ReindexService(db).run(job_id)
+        job = await db.get(ReindexJob, job_id)
+
+    assert job.status == "active"
+    assert job.processed_chunks == job.total_chunks == 24
+    assert job.source_collection == "knowledge_vectors"
+    assert FakeVectorStore.alias == "knowledge_vectors_green"
+    green = FakeVectorStore.collections["knowledge_vectors_green"]
+    assert set(green) == {chunk_point_id(doc_id, i) for i in range(23)} | {"verified-1"}
+    # Verified answers keep their whole payload, so retrieval still flags them.
+    assert {k: v for k, v in green["verified-1"].items() if k != "vector"} == {
+        k: v for k, v in verified.items() if k != "vector"
+    }
+    # The resumed run did not re-embed the window committed before the failure
+    # (the verified answer is copied before and again after the swap).
+    assert FlakyEmbedder.embedded == 23 + 2
+
+    async def no_enqueue(self, job):
+        pass
+
+    monkeypatch.setattr(ReindexService, "_enqueue", no_enqueue)
+    # Approved after the swap: rollback must carry it back.
+    green["verified-2"] = {**verified, "id": "verified-2", "approval_id": "a2"}
+    async with session_factory() as db:
+        await ReindexService(db).rollback(job_id)
+        await ReindexService(db).run(job_id)
+        job = await db.get(ReindexJob, job_id)
+
+    assert job.status == "rolled_back"
+    assert FakeVectorStore.alias == "knowledge_vectors"
+    assert FakeVectorStore.collections["knowledge_vectors"]["verified-2"]["approval_id"] == "a2"
+    await engine.dispose()
+
+
+def test_embedding_fallback_is_per_model_and_off_for_reindex(monkeypatch):
+    def load(name):
+        raise OSError(f"{name} not found")
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=load))
+    monkeypatch.setattr(EmbeddingService, "_fallback", set())
+
+    assert len(EmbeddingService("missing/model-a").embed_text("hi")) == 1024
+    assert EmbeddingService("missing/model-a").is_fallback
+    assert not EmbeddingService("missing/model-b").is_fallback
+    # A re-index job must not build a collection from random vectors.
+    with pytest.raises(RuntimeError):
+        EmbeddingService("missing/model-a", allow_fallback=False).embed_batch(["hi"])
+    with pytest.raises(RuntimeError):
+        EmbeddingService("missing/model-b", allow_fallback=False).embed_batch(["hi"])
+    assert not EmbeddingService("missing/model-b").is_fallback
+
+
+async def test_platform_admin_is_not_a_tenant_role(monkeypatch):
+    from app.api.deps import require_platform_admin
+    from app.core.exceptions import ForbiddenError
+
+    monkeypatch.setattr(settings, "PLATFORM_ADMIN_EMAILS", ["Ops@Example.com"])
+
+    assert (await require_platform_admin(SimpleNamespace(email="ops@example.com", role="member"))).email
+    with pytest.raises(ForbiddenError):
+        await require_platform_admin(SimpleNamespace(email="owner@tenant.com", role="owner"))
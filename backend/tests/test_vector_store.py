@@ -0,0 +1,19 @@
+"""Tests for the Qdrant vector store."""
+
+from qdrant_client import QdrantClient
+
+from app.services.rag import vector_store
+from app.services.rag.vector_store import COLLECTION_ALIAS, COLLECTION_NAME, VectorStore
+
+
+def test_first_store_creates_collection_behind_alias(monkeypatch):
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(vector_store, "QdrantClient", lambda url, timeout: client)
+
+    store = VectorStore()
+
+    assert store.collection == COLLECTION_ALIAS
+    assert store.alias_target() == COLLECTION_NAME
+    assert store.profile()["embedding_model"] == vector_store.EMBEDDING_MODEL
+    # A second store finds the alias and leaves it alone.
+    assert VectorStore().alias_target() == COLLECTION_NAME